@@ -1,28 +1,45 @@
+import asyncio
+from typing import Optional
 from fastapi import Depends
 from redis.asyncio import Redis
-from contextlib import asynccontextmanager
 from api.whatsapp import WhatsAppService
+from api.work_queue import MessageQueue, create_message_queue
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from repositories.message_repository import MessageRepository
-from config.config import settings
+from models.user_model import UserDB
+from config.database import db
+from config.redis_client import redis_manager
 
+# Servicio único por worker: los modelos se cargan una sola vez
+_whatsapp_service: Optional[WhatsAppService] = None
 
 
-@asynccontextmanager
-async def get_redis():
-    redis = Redis(
-        host=settings.REDIS_HOST,
-        port=settings.REDIS_PORT,
-        password=settings.REDIS_PASSWORD,
-        decode_responses=True
-    )
-    try:
-        yield redis
-    finally:
-        await redis.close()
+async def get_redis() -> Redis:
+    """Cliente Redis sobre el pool compartido (no abre conexiones nuevas por petición)"""
+    return await redis_manager.get_client()
 
-async def get_whatsapp_service(redis: Redis = Depends(get_redis)):
-    return WhatsAppService(redis=redis)
+async def get_whatsapp_service(redis: Redis = Depends(get_redis)) -> WhatsAppService:
+    global _whatsapp_service
+    if _whatsapp_service is None:
+        _whatsapp_service = WhatsAppService(redis=redis)
+    return _whatsapp_service
 
-# Elimina esta línea vieja:
-# whatsapp_service = WhatsAppService()lo las dependencias no asíncronas
-message_repository = MessageRepository()
\ No newline at end of file
+async def warm_up_whatsapp_service(redis: Redis) -> WhatsAppService:
+    """Crea el servicio (carga de modelos) en un hilo para no bloquear el event loop durante el arranque."""
+    global _whatsapp_service
+    if _whatsapp_service is None:
+        _whatsapp_service = await asyncio.to_thread(WhatsAppService, redis)
+    return _whatsapp_service
+
+async def get_message_queue(redis: Redis = Depends(get_redis)) -> MessageQueue:
+    return create_message_queue(redis)
+
+def get_database() -> AsyncIOMotorDatabase:
+    """Base de datos sobre el cliente de MongoDB compartido (creado en el arranque)"""
+    return db.get_database()
+
+def get_message_repository(database: AsyncIOMotorDatabase = Depends(get_database)) -> MessageRepository:
+    return MessageRepository(database)
+
+def get_user_db(database: AsyncIOMotorDatabase = Depends(get_database)) -> UserDB:
+    return UserDB(database)
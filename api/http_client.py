@@ -0,0 +1,88 @@
+import logging
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from config.config import settings
+from utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[httpx.AsyncClient] = None
+_counters = {"requests": 0, "errors": 0, "total_seconds": 0.0}
+
+
+async def _on_request(request: httpx.Request):
+    request.extensions["started_at"] = time.monotonic()
+
+
+async def _on_response(response: httpx.Response):
+    _counters["requests"] += 1
+    _counters["total_seconds"] += time.monotonic() - response.request.extensions.get("started_at", time.monotonic())
+    if response.status_code >= 400:
+        _counters["errors"] += 1
+
+
+def _build_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=settings.WHATSAPP_HTTP2,
+        limits=httpx.Limits(
+            max_connections=settings.WHATSAPP_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.WHATSAPP_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.WHATSAPP_HTTP_KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(
+            settings.WHATSAPP_HTTP_TIMEOUT,
+            connect=settings.WHATSAPP_HTTP_CONNECT_TIMEOUT
+        ),
+        event_hooks={"request": [_on_request], "response": [_on_response]}
+    )
+
+
+async def start_http_client():
+    """Crea el cliente HTTP compartido (evento de inicio de la aplicación)."""
+    get_http_client()
+
+
+async def close_http_client():
+    """Cierra el cliente HTTP compartido y sus conexiones (evento de cierre)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Cliente HTTP de larga duración con pool de conexiones keep-alive (HTTP/2
+    si está habilitado) para los envíos a graph.facebook.com.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+        register_metrics("whatsapp_http_pool", http_pool_stats)
+    return _client
+
+
+def http_pool_stats() -> Dict[str, Any]:
+    """Estado del pool de conexiones y contadores de peticiones."""
+    stats: Dict[str, Any] = {
+        "requests": _counters["requests"],
+        "errors": _counters["errors"],
+        "avg_latency_ms": 1000 * _counters["total_seconds"] / _counters["requests"] if _counters["requests"] else 0.0,
+        "max_connections": settings.WHATSAPP_HTTP_MAX_CONNECTIONS,
+        "max_keepalive_connections": settings.WHATSAPP_HTTP_MAX_KEEPALIVE,
+    }
+    # httpcore no expone estadísticas públicas; se inspecciona el pool de forma defensiva
+    pool = getattr(getattr(_client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", []) or [])
+    requests = list(getattr(pool, "_requests", []) or [])
+    stats.update({
+        "open_connections": len(connections),
+        "idle_connections": sum(1 for c in connections if c.is_idle()),
+        "http2_connections": sum(1 for c in connections if "HTTP/2" in repr(c)),
+        "in_flight_requests": len(requests),
+        "queued_requests": sum(1 for r in requests if getattr(r, "is_queued", lambda: False)()),
+    })
+    return stats
@@ -0,0 +1,95 @@
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from redis.asyncio import Redis
+
+# KEYS[1]: ventana del usuario (sorted set de timestamps en ms)
+# KEYS[2], KEYS[3] (opcionales): clave exacta y lista semántica de la caché de respuestas
+# ARGV: ahora (ms), ventana (ms), límite, miembro único, entradas semánticas a leer
+ADMIT_AND_PROBE = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[3]) then
+    return {0}
+end
+redis.call('ZADD', KEYS[1], now, ARGV[4])
+redis.call('PEXPIRE', KEYS[1], window)
+if #KEYS < 2 then
+    return {1, 0, ''}
+end
+local cached = redis.call('GET', KEYS[2])
+if cached then
+    return {1, 1, cached}
+end
+if #KEYS < 3 then
+    return {1, 0, ''}
+end
+return {1, 0, '', redis.call('LRANGE', KEYS[3], 0, tonumber(ARGV[5]) - 1)}
+"""
+
+
+@dataclass
+class AdmissionResult:
+    allowed: bool
+    cached_response: Optional[str] = None
+    semantic_entries: List[str] = field(default_factory=list)
+
+
+class SlidingWindowRateLimiter:
+    """
+    Límite de mensajes por usuario con ventana deslizante, evaluado en un
+    script Lua: el conteo y el registro son atómicos entre workers y la clave
+    nunca queda sin expiración.
+
+    En la misma ida y vuelta a Redis sondea la caché de respuestas (clave
+    exacta y, si no hay acierto, las entradas semánticas recientes).
+    """
+
+    def __init__(self, redis: Redis, limit: int = 15, window_seconds: float = 60):
+        self.redis = redis
+        self.limit = limit
+        self.window_ms = int(window_seconds * 1000)
+        self._script = redis.register_script(ADMIT_AND_PROBE)
+        self.allowed = 0
+        self.rejected = 0
+
+    @staticmethod
+    def key(user_id: str) -> str:
+        return f"rate_limit:{user_id}"
+
+    async def admit(self, user_id: str, exact_key: Optional[str] = None, semantic_key: Optional[str] = None,
+                    max_entries: int = 200) -> AdmissionResult:
+        """
+        Registra un mensaje del usuario si no supera el límite.
+        Args:
+            user_id (str): Número del remitente.
+            exact_key (str): Clave exacta de la caché de respuestas a sondear.
+            semantic_key (str): Lista semántica a leer si la clave exacta falla.
+            max_entries (int): Entradas semánticas a leer.
+        Returns:
+            AdmissionResult: Si se admite el mensaje y lo leído de la caché.
+        """
+        keys = [self.key(user_id)]
+        if exact_key:
+            keys.append(exact_key)
+            if semantic_key:
+                keys.append(semantic_key)
+        now_ms = int(time.time() * 1000)
+        result = await self._script(
+            keys=keys,
+            args=[now_ms, self.window_ms, self.limit, f"{now_ms}-{uuid.uuid4().hex[:8]}", max_entries]
+        )
+        if not int(result[0]):
+            self.rejected += 1
+            return AdmissionResult(allowed=False)
+
+        self.allowed += 1
+        if int(result[1]):
+            return AdmissionResult(allowed=True, cached_response=result[2])
+        return AdmissionResult(allowed=True, semantic_entries=list(result[3]) if len(result) > 3 else [])
+
+    def stats(self) -> dict:
+        return {"allowed": self.allowed, "rejected": self.rejected, "limit": self.limit}
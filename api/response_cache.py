@@ -0,0 +1,131 @@
+import base64
+import hashlib
+import json
+import logging
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+from redis.asyncio import Redis
+
+from models.embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class SemanticResponseCache:
+    """
+    Caché de respuestas en dos niveles, compartida entre workers vía Redis:
+
+    1. Clave exacta: hash estable del texto normalizado.
+    2. Vecino más cercano: embeddings de las preguntas respondidas
+       recientemente; se reutiliza la respuesta si la similitud coseno
+       supera `similarity_threshold`.
+
+    Ambos niveles se separan por ámbito (system prompt + usuario) y expiran
+    tras `ttl` segundos.
+    """
+
+    def __init__(self, redis: Redis, embedder, ttl: int = 300, similarity_threshold: float = 0.92,
+                 max_entries: int = 200):
+        self.redis = redis
+        self.embedder = embedder
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def scope(system_prompt: str, user_id: str) -> str:
+        return f"{_digest(system_prompt or '')}:{user_id}"
+
+    def exact_key(self, scope: str, text: str) -> str:
+        return f"response_cache:{scope}:{_digest(normalize_text(text))}"
+
+    @staticmethod
+    def semantic_key(scope: str) -> str:
+        return f"semantic_cache:{scope}"
+
+    async def get(self, text: str, system_prompt: str, user_id: str,
+                  prefetched: Optional[Tuple[Optional[str], List[str]]] = None) -> Optional[str]:
+        """
+        Busca una respuesta previa para `text`.
+        Args:
+            prefetched (tuple): Valor exacto y entradas semánticas ya leídos de Redis
+                (p. ej. por el script del rate limiter); evita volver a consultarlos.
+        Returns:
+            Optional[str]: Respuesta en caché o None.
+        """
+        scope = self.scope(system_prompt, user_id)
+        if prefetched is not None:
+            cached, entries = prefetched
+        else:
+            cached, entries = await self.redis.get(self.exact_key(scope, text)), None
+        if cached:
+            self.exact_hits += 1
+            return cached
+
+        response = await self._nearest(scope, text, entries)
+        if response is not None:
+            self.semantic_hits += 1
+            return response
+        self.misses += 1
+        return None
+
+    async def _nearest(self, scope: str, text: str, entries: Optional[List[str]] = None) -> Optional[str]:
+        if entries is None:
+            entries = await self.redis.lrange(self.semantic_key(scope), 0, self.max_entries - 1)
+        if not entries:
+            return None
+
+        now = time.time()
+        vectors, responses = [], []
+        for raw in entries:
+            entry = json.loads(raw)
+            if now - entry["t"] > self.ttl:
+                continue
+            vectors.append(np.frombuffer(base64.b64decode(entry["e"]), dtype=np.float16))
+            responses.append(entry["r"])
+        if not vectors:
+            return None
+
+        query = np.asarray(await self.embedder.aencode(text), dtype=np.float32)
+        # Los embeddings del servicio están normalizados: coseno = producto punto
+        similarities = np.stack(vectors).astype(np.float32) @ query
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.similarity_threshold:
+            return responses[best]
+        return None
+
+    async def set(self, text: str, system_prompt: str, user_id: str, response: str):
+        """Guarda la respuesta en ambos niveles."""
+        scope = self.scope(system_prompt, user_id)
+        embedding = np.asarray(await self.embedder.aencode(text), dtype=np.float16)
+        entry = json.dumps({
+            "e": base64.b64encode(embedding.tobytes()).decode("ascii"),
+            "r": response,
+            "t": time.time()
+        })
+        semantic_key = self.semantic_key(scope)
+
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.setex(self.exact_key(scope, text), self.ttl, response)
+        pipe.lpush(semantic_key, entry)
+        pipe.ltrim(semantic_key, 0, self.max_entries - 1)
+        pipe.expire(semantic_key, self.ttl)
+        await pipe.execute()
+
+    def stats(self) -> dict:
+        total = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.exact_hits + self.semantic_hits) / total if total else 0.0,
+        }
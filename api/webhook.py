@@ -2,7 +2,8 @@ from fastapi import APIRouter, Request, Response, HTTPException, Depends, status
 from typing import Dict, Any
 import logging
 from pydantic import BaseModel
-from api.dependencies import get_whatsapp_service, WhatsAppService
+from api.dependencies import get_message_queue
+from api.work_queue import MessageQueue
 from config.config import settings
 
 # Configurar logging
@@ -25,34 +26,36 @@ async def verify_webhook(request: Request):
         if not all([mode, token, challenge]):
             raise HTTPException(status_code=400, detail="Parámetros faltantes")
 
-        if mode == "subscribe" and token == settings.WHATSAPP_TOKEN:
+        if mode == "subscribe" and token == settings.VERIFY_TOKEN:
             logger.info("Webhook verificado exitosamente")
             return Response(content=challenge)
         
         logger.warning("Token de verificación inválido")
         raise HTTPException(status_code=403, detail="Token inválido")
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error en verificación: {str(e)}")
         raise HTTPException(status_code=500, detail="Error interno")
 
 @router.post("/webhook")
-async def process_webhook(self,request: Request, whatsapp_service: WhatsAppService = Depends(get_whatsapp_service)):
-    """Procesamiento de mensajes entrantes de Meta"""
+async def process_webhook(request: Request, queue: MessageQueue = Depends(get_message_queue)):
+    """Recepción de mensajes de Meta: valida, encola y responde 200 de inmediato.
+    La generación y el envío de la respuesta los realizan los workers (api/worker.py)."""
     try:
         data = await request.json()
-        print(data)
         event = WhatsAppEvent(**data)
         if "entry" not in data or not data["entry"]:
             raise ValueError("No entries found in the webhook payload.")
 
-        
+        queued = 0
         for entry in event.entry:
             for change in entry.get("changes", []):
-                if self._valid_change(change):
-                    await self._process_change(change, whatsapp_service)
+                if _valid_change(change):
+                    queued += await _enqueue_change(change, queue)
 
-        return {"status": "success"}
+        return {"status": "success", "queued": queued}
 
     except Exception as e:
         logger.error(f"Error procesando webhook: {str(e)}", exc_info=True)
@@ -76,39 +79,24 @@ def _valid_change(change: dict) -> bool:
         return False
     
     value = change["value"]
-    return all(
+    return all([
         value.get("messaging_product") == "whatsapp",
         isinstance(value.get("messages"), list),
         all(key in value.get("metadata", {}) for key in required["value"]["metadata"])
-    )
+    ])
 
-async def _process_change(change: dict, service: WhatsAppService):
-    """Procesa un cambio individual"""
-    try:
-        messages = change["value"].get("messages", [])
-        for msg in messages:
-            await self._handle_message(msg, service)
-    except Exception as e:
-        logger.error(f"Error procesando cambio: {str(e)}")
-        await service.log_error(change)
-
-async def _handle_message(msg: dict, service: WhatsAppService):
-    """Maneja un mensaje individual"""
-    try:
+async def _enqueue_change(change: dict, queue: MessageQueue) -> int:
+    """Encola los mensajes completos de un cambio. Devuelve cuántos se encolaron"""
+    queued = 0
+    for msg in change["value"].get("messages", []):
         from_number = msg.get("from")
         message_body = msg.get("text", {}).get("body", "")
-        
+
         if not from_number or not message_body:
             logger.warning("Mensaje incompleto: %s", msg)
-            return
+            continue
 
-        # Procesar y responder
-        response = await service.process_incoming_message(msg)
-        await service.send_message(to=from_number, message=response)
-        
-    except Exception as e:
-        logger.error(f"Error manejando mensaje: {str(e)}")
-        await service.send_message(
-            to=from_number,
-            message="⚠️ Error procesando tu mensaje. Intenta nuevamente."
-        )
\ No newline at end of file
+        # Los reintentos de Meta con el mismo id se descartan en la cola
+        if await queue.enqueue(msg):
+            queued += 1
+    return queued
@@ -1,11 +1,22 @@
-from typing import Dict, Any, Optional
-import httpx
+from typing import Awaitable, Callable, Dict, Any, List, Optional
+import logging
+import time
 from fastapi import status
 from pydantic import BaseModel
 from config.config import settings
-from models.language_model import EnhancedAIAssistant
+from models.embedding_model import get_embedding_model
+from models.generation_budget import QueryOutcome
+from api.response_cache import SemanticResponseCache
+from api.rate_limit import SlidingWindowRateLimiter
+from api.http_client import get_http_client
 from redis.asyncio import Redis
 from utils.retry import async_retry
+from utils.metrics import register_metrics
+from repositories.message_repository import MessageRepository
+from repositories.write_behind import get_message_write_buffer
+from utils.text_segmenter import SentenceSegmenter
+
+logger = logging.getLogger(__name__)
 
 class WhatsAppMessageRequest(BaseModel):
     messaging_product: str = "whatsapp"
@@ -16,19 +27,43 @@ class WhatsAppMessageRequest(BaseModel):
     
 class WhatsAppService:
     def __init__(self, redis: Redis):
+        # Import diferido: torch/transformers solo se cargan al crear el servicio
+        from models.language_model import EnhancedAIAssistant
+
         self.redis = redis
-        self.response_generator = EnhancedAIAssistant()
-        self.base_url = f"https://graph.facebook.com/v21.0/{settings.PHONE_NUMBER_ID}/messages"
+        # Historial de conversación con escritura diferida (no compite con la generación)
+        self.message_repository = MessageRepository(write_buffer=get_message_write_buffer())
+        self.response_generator = EnhancedAIAssistant(message_repository=self.message_repository)
+        self.response_cache = SemanticResponseCache(
+            redis,
+            get_embedding_model(),
+            ttl=settings.RESPONSE_CACHE_TTL,
+            similarity_threshold=settings.RESPONSE_CACHE_SIMILARITY,
+            max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES
+        )
+        register_metrics("response_cache", self.response_cache.stats)
+        self.rate_limiter = SlidingWindowRateLimiter(redis, limit=settings.WHATSAPP_RATE_LIMIT, window_seconds=60)
+        register_metrics("rate_limit", self.rate_limiter.stats)
+        self.base_url = f"{settings.WHATSAPP_API_BASE_URL}/{settings.PHONE_NUMBER_ID}/messages"
         self.headers = {
             "Authorization": f"Bearer {settings.WHATSAPP_TOKEN}",
             "Content-Type": "application/json"
         }
 
     @async_retry(retries=3, delay=1, backoff=2)
-    async def send_message(self, to: str, message: str) -> Dict[str, Any]:
-        """Envía mensajes con retry automático y caché de estado"""
-        cache_key = f"msg_status:{to}:{hash(message)}"
-        if await self.redis.get(cache_key):
+    async def send_message(self, to: str, message: str, reply_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Envía mensajes con retry automático.
+        Args:
+            to (str): Número de destino.
+            message (str): Texto a enviar.
+            reply_key (str): Identifica este envío dentro de la respuesta a un
+                mensaje entrante ("{id del mensaje}:{n.º de segmento}"). Si ya
+                se envió (p. ej. en una entrega anterior del mismo mensaje en la
+                cola) no se repite. Sin clave el envío no se deduplica.
+        """
+        cache_key = f"msg_status:{reply_key}" if reply_key else None
+        if cache_key and await self.redis.get(cache_key):
             return {"status": "already_sent"}
 
         payload = WhatsAppMessageRequest(
@@ -36,39 +71,152 @@ class WhatsAppService:
             text={"body": message}
         ).dict()
 
-        async with httpx.AsyncClient(timeout=10) as client:
-            response = await client.post(
-                self.base_url,
-                headers=self.headers,
-                json=payload
-            )
-            response.raise_for_status()
-            
+        # Cliente compartido: reutiliza conexiones TCP/TLS entre envíos y reintentos
+        response = await get_http_client().post(
+            self.base_url,
+            headers=self.headers,
+            json=payload
+        )
+        response.raise_for_status()
+
+        if cache_key:
             await self.redis.setex(cache_key, 3600, "sent")
-            return response.json()
+        return response.json()
+
+    async def reply(self, message_data: Dict[str, Any]) -> str:
+        """
+        Procesa el mensaje y envía la respuesta al remitente. Con
+        LLM_STREAMING_ENABLED cada frase se envía en cuanto está completa, así
+        la latencia percibida es la de la primera frase y no la de toda la
+        generación.
+        """
+        to = message_data.get("from")
+        message_id = message_data.get("id")
+        if not settings.LLM_STREAMING_ENABLED:
+            response = await self.process_incoming_message(message_data)
+            await self.send_message(to=to, message=response, reply_key=self._reply_key(message_id, 0))
+            return response
+
+        sent: List[str] = []
+
+        async def send_segment(segment: str):
+            await self.send_message(to=to, message=segment, reply_key=self._reply_key(message_id, len(sent)))
+            sent.append(segment)
+
+        try:
+            response = await self.process_incoming_message(message_data, on_segment=send_segment)
+        except Exception as e:
+            if not sent:
+                raise
+            # Reintentar duplicaría lo que el usuario ya recibió
+            logger.error(f"Respuesta a {to} interrumpida tras {len(sent)} mensajes: {str(e)}")
+            return " ".join(sent)
+        if not sent:
+            # Respuesta de caché, rate limit o generación vacía: un solo mensaje
+            await self.send_message(to=to, message=response, reply_key=self._reply_key(message_id, 0))
+        return response
 
-    async def process_incoming_message(self, message_data: Dict[str, Any]) -> str:
-        """Procesamiento con caché y rate limiting"""
+    @staticmethod
+    def _reply_key(message_id: Optional[str], segment: int) -> Optional[str]:
+        """Clave de idempotencia de un envío: mensaje entrante y posición del segmento en la respuesta"""
+        return f"{message_id}:{segment}" if message_id else None
+
+    async def process_incoming_message(self, message_data: Dict[str, Any],
+                                       on_segment: Optional[Callable[[str], Awaitable[None]]] = None) -> str:
+        """
+        Procesamiento con caché y rate limiting.
+        Args:
+            message_data (dict): Mensaje entrante de WhatsApp.
+            on_segment (callable): Si se indica, la respuesta se genera en streaming
+                y se le pasa cada frase completa (se espera su envío en orden).
+        Returns:
+            str: Respuesta completa.
+        """
         user_number = message_data.get("from")
         message_body = message_data.get("text", {}).get("body", "")
         print(message_body)
-        # Rate Limiting (15 mensajes/minuto)
-        rate_key = f"rate_limit:{user_number}"
-        current_count = await self.redis.incr(rate_key)
-        if current_count > 15:
+        # El prompt sale de la caché en memoria del worker (define el ámbito de la caché de respuestas)
+        system_prompt = await self.response_generator.resolve_system_prompt(user_number)
+        scope = self.response_cache.scope(system_prompt, user_number)
+
+        # Rate limiting (ventana deslizante de WHATSAPP_RATE_LIMIT mensajes/minuto) y
+        # sondeo de la caché de respuestas en una sola ida y vuelta a Redis
+        admission = await self.rate_limiter.admit(
+            user_number,
+            exact_key=self.response_cache.exact_key(scope, message_body),
+            semantic_key=self.response_cache.semantic_key(scope),
+            max_entries=self.response_cache.max_entries
+        )
+        if not admission.allowed:
             return "Demasiadas solicitudes. Por favor espere."
-        if current_count == 1:
-            await self.redis.expire(rate_key, 60)
 
-        # Cache de respuestas
-        cache_key = f"response_cache:{hash(message_body)}"
-        print(cache_key)
-        cached_response = await self.redis.get(cache_key)
+        # Cache de respuestas (texto exacto normalizado + vecino semántico)
+        cached_response = await self.response_cache.get(
+            message_body, system_prompt, user_number,
+            prefetched=(admission.cached_response, admission.semantic_entries)
+        )
         if cached_response:
+            await self._record_exchange(message_data, cached_response)
             return cached_response
 
-        # Generar y cachear nueva respuesta
-        response = await self.response_generator.generate_response(message_body)
-        await self.redis.setex(cache_key, 300, response)  # Cache por 5 minutos
-        
-        return response
\ No newline at end of file
+        # Generar y cachear nueva respuesta (solo si es válida y completa: un
+        # respaldo o una respuesta cortada por el plazo no se reutiliza)
+        outcome = QueryOutcome()
+        if on_segment is not None:
+            response = await self._stream_response(message_body, user_number, system_prompt, on_segment, outcome)
+        else:
+            response = await self.response_generator.process_query(
+                message_body, user_number, system_prompt, outcome=outcome
+            )
+        if outcome.complete:
+            await self.response_cache.set(message_body, system_prompt, user_number, response)
+
+        # Sin texto generado la respuesta es un aviso de error: no entra al historial como turno del asistente
+        await self._record_exchange(message_data, response if outcome.response else None)
+        return response
+
+    async def _stream_response(self, message_body: str, user_number: str, system_prompt: str,
+                               on_segment: Callable[[str], Awaitable[None]], outcome: QueryOutcome) -> str:
+        """
+        Genera en streaming y entrega cada frase o párrafo completo a
+        `on_segment`. `outcome` indica si el stream terminó completo y válido.
+        """
+        segmenter = SentenceSegmenter(
+            min_chars=settings.STREAM_SEGMENT_MIN_CHARS,
+            max_chars=settings.STREAM_SEGMENT_MAX_CHARS
+        )
+        segments = []
+        stream = self.response_generator.stream_query(message_body, user_number, system_prompt, outcome=outcome)
+        async for text in stream:
+            for segment in segmenter.feed(text):
+                segments.append(segment)
+                await on_segment(segment)
+        last = segmenter.flush()
+        if last:
+            segments.append(last)
+            await on_segment(last)
+        return "\n".join(segments) or "No se pudo generar respuesta"
+
+    async def _record_exchange(self, message_data: Dict[str, Any], response: Optional[str]):
+        """Guarda el mensaje entrante y la respuesta (si la hay) en el historial (escritura diferida)"""
+        user_number = message_data.get("from")
+        try:
+            await self.message_repository.add_message({
+                **message_data,
+                "from_number": user_number,
+                "role": "user"
+            })
+            if response is None:
+                return
+            await self.message_repository.add_message({
+                "id": f"reply:{message_data.get('id')}",
+                "from": settings.PHONE_NUMBER_ID,
+                "timestamp": str(int(time.time())),
+                "type": "text",
+                "text": {"body": response},
+                "from_number": user_number,
+                "role": "assistant"
+            })
+        except Exception as e:
+            # El historial no debe impedir responder al usuario
+            logger.error(f"Error guardando el historial de {user_number}: {str(e)}")
\ No newline at end of file
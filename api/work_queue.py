@@ -0,0 +1,162 @@
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+logger = logging.getLogger(__name__)
+
+STREAM_NAME = "whatsapp:incoming"
+GROUP_NAME = "responders"
+DEAD_LETTER_STREAM = "whatsapp:dead_letter"
+
+# KEYS[1]: marca del id de mensaje, KEYS[2]: stream
+# ARGV: ttl de la marca (s), longitud máxima aproximada del stream, payload
+# Redis no deshace un script a medias: si XADD falla se borra la marca para
+# que el reintento de Meta no se descarte como duplicado.
+ENQUEUE_ONCE = """
+if not redis.call('SET', KEYS[1], 1, 'NX', 'EX', ARGV[1]) then
+    return false
+end
+local entry_id = redis.pcall('XADD', KEYS[2], 'MAXLEN', '~', ARGV[2], '*', 'payload', ARGV[3])
+if type(entry_id) == 'table' and entry_id.err then
+    redis.call('DEL', KEYS[1])
+end
+return entry_id
+"""
+
+
+@dataclass
+class QueuedMessage:
+    entry_id: str
+    payload: Dict[str, Any]
+    deliveries: int
+
+
+class MessageQueue:
+    """
+    Cola durable de mensajes entrantes sobre Redis Streams con grupo de consumidores.
+
+    - `enqueue` descarta duplicados por id de mensaje (Meta reintenta webhooks);
+      la marca de duplicado y el XADD se aplican juntos en un script Lua.
+    - Un mensaje leído queda pendiente hasta `ack`; si el consumidor muere o
+      no confirma en `visibility_timeout_ms`, otro consumidor lo reclama.
+    - Tras `max_deliveries` entregas fallidas se mueve al stream de dead-letter.
+    """
+
+    def __init__(self, redis: Redis, stream: str = STREAM_NAME, group: str = GROUP_NAME,
+                 dead_letter_stream: str = DEAD_LETTER_STREAM, visibility_timeout_ms: int = 120000,
+                 max_deliveries: int = 3, max_length: int = 100000, dedupe_ttl: int = 86400):
+        self.redis = redis
+        self.stream = stream
+        self.group = group
+        self.dead_letter_stream = dead_letter_stream
+        self.visibility_timeout_ms = visibility_timeout_ms
+        self.max_deliveries = max_deliveries
+        self.max_length = max_length
+        self.dedupe_ttl = dedupe_ttl
+        self._enqueue_once = redis.register_script(ENQUEUE_ONCE)
+
+    async def ensure_group(self):
+        """Crea el stream y el grupo de consumidores si no existen."""
+        try:
+            await self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def enqueue(self, message: Dict[str, Any]) -> Optional[str]:
+        """
+        Añade un mensaje a la cola.
+        Args:
+            message (dict): Mensaje de WhatsApp tal como llega en el webhook.
+        Returns:
+            Optional[str]: Id de la entrada, o None si el mensaje ya se había encolado.
+        """
+        message_id = message.get("id")
+        if message_id:
+            entry_id = await self._enqueue_once(
+                keys=[f"whatsapp:seen:{message_id}", self.stream],
+                args=[self.dedupe_ttl, self.max_length, json.dumps(message)]
+            )
+            return entry_id or None
+        return await self.redis.xadd(
+            self.stream,
+            {"payload": json.dumps(message)},
+            maxlen=self.max_length,
+            approximate=True
+        )
+
+    async def read(self, consumer: str, count: int = 1, block_ms: int = 5000) -> List[QueuedMessage]:
+        """
+        Obtiene hasta `count` mensajes: primero reclama los que superaron el
+        tiempo de visibilidad y después lee entradas nuevas.
+        """
+        messages = await self._reclaim(consumer, count)
+        if len(messages) < count:
+            response = await self.redis.xreadgroup(
+                self.group, consumer, {self.stream: ">"}, count=count - len(messages), block=block_ms
+            )
+            for _, entries in response or []:
+                for entry_id, fields in entries:
+                    messages.append(QueuedMessage(entry_id, json.loads(fields["payload"]), 1))
+        return messages
+
+    async def _reclaim(self, consumer: str, count: int) -> List[QueuedMessage]:
+        result = await self.redis.xautoclaim(
+            self.stream, self.group, consumer, min_idle_time=self.visibility_timeout_ms, start_id="0-0", count=count
+        )
+        entries = result[1] if result else []
+        messages = []
+        for entry_id, fields in entries:
+            if not fields:  # La entrada fue recortada del stream
+                await self.redis.xack(self.stream, self.group, entry_id)
+                continue
+            pending = await self.redis.xpending_range(self.stream, self.group, min=entry_id, max=entry_id, count=1)
+            deliveries = pending[0]["times_delivered"] if pending else 1
+            messages.append(QueuedMessage(entry_id, json.loads(fields["payload"]), deliveries))
+        return messages
+
+    async def ack(self, message: QueuedMessage):
+        await self.redis.xack(self.stream, self.group, message.entry_id)
+
+    async def fail(self, message: QueuedMessage, error: str) -> bool:
+        """
+        Registra un fallo de procesamiento.
+        Returns:
+            bool: True si el mensaje se movió a dead-letter (no habrá más reintentos).
+        """
+        if message.deliveries < self.max_deliveries:
+            # Queda pendiente y se reintenta al vencer el tiempo de visibilidad
+            return False
+        await self.redis.xadd(self.dead_letter_stream, {
+            "payload": json.dumps(message.payload),
+            "error": error,
+            "deliveries": message.deliveries
+        })
+        await self.redis.xack(self.stream, self.group, message.entry_id)
+        logger.error(f"Mensaje {message.entry_id} movido a dead-letter tras {message.deliveries} intentos: {error}")
+        return True
+
+    async def stats(self) -> Dict[str, Any]:
+        pending = await self.redis.xpending(self.stream, self.group)
+        return {
+            "length": await self.redis.xlen(self.stream),
+            "pending": pending["pending"] if pending else 0,
+            "dead_letter": await self.redis.xlen(self.dead_letter_stream),
+        }
+
+
+def create_message_queue(redis: Redis) -> MessageQueue:
+    """Cola configurada con los valores de settings."""
+    from config.config import settings
+
+    return MessageQueue(
+        redis,
+        visibility_timeout_ms=settings.QUEUE_VISIBILITY_TIMEOUT_MS,
+        max_deliveries=settings.QUEUE_MAX_DELIVERIES,
+        max_length=settings.QUEUE_STREAM_MAXLEN,
+        dedupe_ttl=settings.QUEUE_DEDUPE_TTL
+    )
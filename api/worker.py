@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+
+from config.config import settings
+from api.work_queue import MessageQueue, QueuedMessage, create_message_queue
+from api.http_client import start_http_client, close_http_client
+from config.redis_client import redis_manager
+from config.database import db
+from models.user_cache import get_user_cache
+from repositories.write_behind import close_message_write_buffer
+
+logger = logging.getLogger(__name__)
+
+ERROR_MESSAGE = "⚠️ Error procesando tu mensaje. Intenta nuevamente."
+
+
+async def handle_message(message: QueuedMessage, queue: MessageQueue, service):
+    """Genera y envía la respuesta de un mensaje; confirma o reprograma según el resultado."""
+    msg = message.payload
+    from_number = msg.get("from")
+    try:
+        await service.reply(msg)
+        await queue.ack(message)
+    except Exception as e:
+        logger.error(f"Error manejando mensaje {message.entry_id}: {str(e)}")
+        if await queue.fail(message, str(e)):
+            try:
+                await service.send_message(to=from_number, message=ERROR_MESSAGE)
+            except Exception as send_error:
+                logger.error(f"No se pudo notificar el error a {from_number}: {str(send_error)}")
+
+
+async def run_worker(consumer: str, concurrency: int, stop: asyncio.Event = None, service=None,
+                     queue: MessageQueue = None):
+    """
+    Consume la cola con hasta `concurrency` mensajes en paralelo por proceso
+    (las generaciones concurrentes se agrupan en el planificador del LLM).
+    """
+    owns_pool = queue is None
+    if queue is None:
+        await db.connect_to_database()
+        queue = create_message_queue(await redis_manager.get_client())
+    if service is None:
+        from api.dependencies import warm_up_whatsapp_service
+
+        service = await warm_up_whatsapp_service(queue.redis)
+    await queue.ensure_group()
+    await start_http_client()
+    await get_user_cache().start(queue.redis)
+
+    stop = stop or asyncio.Event()
+    tasks = set()
+    logger.info(f"Worker {consumer} consumiendo {queue.stream} (concurrencia {concurrency})")
+    try:
+        while not stop.is_set():
+            free = concurrency - len(tasks)
+            if free == 0:
+                await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                continue
+            try:
+                messages = await queue.read(consumer, count=free, block_ms=1000)
+            except Exception as e:
+                logger.error(f"Error leyendo la cola: {str(e)}")
+                await asyncio.sleep(1)
+                continue
+            for message in messages:
+                task = asyncio.create_task(handle_message(message, queue, service))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+    finally:
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        await close_http_client()
+        await get_user_cache().stop()
+        await close_message_write_buffer()
+        if owns_pool:
+            await redis_manager.close()
+            await db.close_database_connection()
+
+
+def _worker_process(index: int):
+    consumer = f"{socket.gethostname()}-{os.getpid()}-{index}"
+    asyncio.run(run_worker(consumer, settings.WORKER_CONCURRENCY))
+
+
+def main():
+    """Lanza WORKER_PROCESSES procesos consumidores."""
+    logging.basicConfig(level=logging.INFO)
+    processes = [
+        multiprocessing.Process(target=_worker_process, args=(i,), name=f"whatsapp-worker-{i}")
+        for i in range(settings.WORKER_PROCESSES)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,75 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from backend.routes import router as api_router
-from config.config import settings
+from config.config import settings, validate_settings
 from config.database import db
+from config.redis_client import redis_manager
+from models.user_cache import get_user_cache
+from repositories.write_behind import close_message_write_buffer
+from utils.inference_executor import shutdown_executors
+from api.http_client import start_http_client, close_http_client
+from api.work_queue import create_message_queue
+from utils.metrics import register_metrics
 
-# Inicialización de la aplicación FastAPI
+logger = logging.getLogger(__name__)
+
+
+async def warm_up(app: FastAPI):
+    """Carga los recursos pesados (modelo de embeddings, índice de PDFs) fuera del arranque."""
+    from models.embedding_model import get_embedding_model
+    from pdf_processing.pdf_routes import get_pdf_pipeline
+
+    try:
+        await asyncio.to_thread(get_pdf_pipeline)
+        await asyncio.to_thread(lambda: get_embedding_model().model)
+        app.state.ready = True
+        print("✅ Calentamiento completado. Lista para recibir tráfico.")
+    except Exception as e:
+        logger.error(f"Error en el calentamiento: {str(e)}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Inicio: validar configuración y conectar a MongoDB, Redis y la Graph API
+    validate_settings()
+    app.title = settings.PROJECT_NAME
+    app.version = settings.PROJECT_VERSION
+    await db.connect_to_database()
+    await db.ensure_indexes()
+    await redis_manager.connect()
+    register_metrics("redis_pool", redis_manager.stats)
+    # Profundidad de la cola, pendientes y dead letter (los workers la consumen en otro proceso)
+    message_queue = create_message_queue(await redis_manager.get_client())
+    await message_queue.ensure_group()
+    register_metrics("message_queue", message_queue.stats)
+    await get_user_cache().start(await redis_manager.get_client())
+    await start_http_client()
+    warm_up_task = asyncio.create_task(warm_up(app))
+    print("🚀 Aplicación iniciada. Conectada a MongoDB y lista para recibir mensajes.")
+
+    yield
+
+    # Cierre
+    warm_up_task.cancel()
+    await close_http_client()
+    await get_user_cache().stop()
+    await close_message_write_buffer()
+    await redis_manager.close()
+    await db.close_database_connection()
+    shutdown_executors()
+    print("🛑 Aplicación detenida. Conexiones cerradas.")
+
+
+# Inicialización de la aplicación FastAPI (el título y la versión se toman de settings al arrancar)
 app = FastAPI(
-    title=settings.PROJECT_NAME,
-    version=settings.PROJECT_VERSION,
-    description="Backend para el chatbot de WhatsApp"
+    description="Backend para el chatbot de WhatsApp",
+    lifespan=lifespan
 )
+app.state.ready = False
 
 # Configuración de CORS
 app.add_middleware(
@@ -20,20 +80,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Evento de inicio: Conectar a la base de datos
-@app.on_event("startup")
-async def startup():
-    await db.connect_to_database()
-    
 # Incluir rutas
 app.include_router(api_router, prefix="/api")
 
-# Evento de inicio
-@app.on_event("startup")
-async def startup_event():
-    print("🚀 Aplicación iniciada. Conectada a MongoDB y lista para recibir mensajes.")
 
-# Evento de cierre
-@app.on_event("shutdown")
-async def shutdown_event():
-    print("🛑 Aplicación detenida. Conexiones cerradas.")
\ No newline at end of file
+@app.get("/ready", tags=["Health"])
+async def ready():
+    """Readiness: 200 solo cuando terminó el calentamiento de modelos e índices"""
+    if not app.state.ready:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    return {"status": "ready"}
@@ -2,6 +2,7 @@ from api.webhook import router as webhook_router
 from fastapi import APIRouter, File, UploadFile, HTTPException
 from pdf_processing.pdf_routes import router as  pdf_router
 from models.user_routes import router as user_router
+from utils.metrics import collect_metrics
 
 
 
@@ -15,6 +16,12 @@ router.include_router(pdf_router, tags=["Pdf Upload"])
 router.include_router(user_router, tags="User Admin")
 
 
+@router.get("/metrics", tags=["Metrics"])
+async def metrics():
+    """Métricas de rendimiento (cachés, colas, pools) del worker actual"""
+    return await collect_metrics()
+
+
 
 
 
@@ -0,0 +1,94 @@
+"""
+Latencia de embeddings de consulta (un texto, el caso del camino caliente)
+con PyTorch (SentenceTransformer) frente a ONNX Runtime fp32 e int8.
+
+Uso:
+    python -m benchmarks.embedding_backends --runs 200 --threads 4
+"""
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+QUERIES = [
+    "¿Cuál es el horario de atención?",
+    "Quiero saber el precio del curso de Python",
+    "Mi pedido no ha llegado, ¿qué hago?",
+    "¿Tienen sede en Bogotá?",
+]
+
+
+def _load(backend: str, args):
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(args.model)
+    from models.onnx_embedder import OnnxSentenceEncoder
+
+    return OnnxSentenceEncoder(args.model, export_dir=args.export_dir, quantize=backend == "onnx-int8",
+                               num_threads=args.threads)
+
+
+def _bench(encoder, runs: int) -> dict:
+    encode = lambda text: encoder.encode([text], batch_size=1, show_progress_bar=False,  # noqa: E731
+                                         convert_to_numpy=True, normalize_embeddings=True)
+    for text in QUERIES:
+        encode(text)  # Calentamiento
+    latencies = []
+    for i in range(runs):
+        start = time.perf_counter()
+        encode(QUERIES[i % len(QUERIES)])
+        latencies.append(1000 * (time.perf_counter() - start))
+    latencies.sort()
+    return {
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 3),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--export-dir", default="data/models/onnx")
+    parser.add_argument("--output", default=None, help="Ruta del informe JSON")
+    args = parser.parse_args()
+
+    if args.threads:
+        import torch
+
+        torch.set_num_threads(args.threads)
+
+    results, vectors = [], {}
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        try:
+            encoder = _load(backend, args)
+            result = {"backend": backend, **_bench(encoder, args.runs)}
+            vectors[backend] = encoder.encode(QUERIES, batch_size=len(QUERIES), show_progress_bar=False,
+                                              convert_to_numpy=True, normalize_embeddings=True)
+        except Exception as e:
+            result = {"backend": backend, "error": f"{type(e).__name__}: {e}"}
+        results.append(result)
+
+    # Deriva coseno mínima de cada backend frente a PyTorch
+    if "torch" in vectors:
+        for result in results:
+            if result["backend"] in vectors:
+                cosines = (vectors[result["backend"]] * vectors["torch"]).sum(axis=1)
+                result["min_cosine_vs_torch"] = round(float(np.min(cosines)), 6)
+
+    for result in results:
+        print(json.dumps(result, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump({"model": args.model, "results": results}, output, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark de los modos de precisión del LLM en CPU (settings.LLM_PRECISION).
+
+Cada modo se mide en un proceso aparte para que la memoria de uno no
+contamine al siguiente. Reporta tiempo de carga, latencia del primer token,
+tokens/s de decodificación y RSS.
+
+Uso:
+    python -m benchmarks.llm_precision --modes fp32,bf16,int8,4bit --max-new-tokens 64
+    python -m benchmarks.llm_precision --model ruta/modelo --tokenizer none --prompt-tokens 128
+"""
+import argparse
+import json
+import multiprocessing
+import resource
+import statistics
+import time
+
+DEFAULT_MODEL = "meta-llama/Llama-3.2-3B-Instruct"
+DEFAULT_PROMPT = "Explica en tres frases qué servicios ofrece la empresa y cómo contactar a soporte."
+
+
+def _rss_mb() -> float:
+    """RSS actual del proceso en MB."""
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss / 2 ** 20
+    except ImportError:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize() / 2 ** 20
+
+
+def _bench_mode(args: dict, mode: str) -> dict:
+    import torch
+    from models.llm_loader import load_causal_lm
+
+    baseline_rss = _rss_mb()
+    start = time.perf_counter()
+    model = load_causal_lm(args["model"], precision=mode, num_threads=args["threads"])
+    load_seconds = time.perf_counter() - start
+
+    if args["tokenizer"] == "none":
+        vocab_size = model.config.vocab_size
+        input_ids = torch.randint(3, vocab_size - 1, (1, args["prompt_tokens"]))
+    else:
+        from transformers import AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(args["tokenizer"] or args["model"])
+        input_ids = tokenizer(args["prompt"], return_tensors="pt")["input_ids"]
+    attention_mask = torch.ones_like(input_ids)
+
+    def generate(new_tokens: int) -> float:
+        begin = time.perf_counter()
+        with torch.inference_mode():
+            model.generate(
+                input_ids,
+                attention_mask=attention_mask,
+                max_new_tokens=new_tokens,
+                min_new_tokens=new_tokens,  # Longitud fija: tokens/s comparables entre modos
+                do_sample=False
+            )
+        return time.perf_counter() - begin
+
+    generate(2)  # Calentamiento
+    first_token = [generate(1) for _ in range(args["runs"])]
+    full = [generate(args["max_new_tokens"]) for _ in range(args["runs"])]
+    first_token_s = statistics.median(first_token)
+    full_s = statistics.median(full)
+    decode_tokens = args["max_new_tokens"] - 1
+
+    return {
+        "mode": mode,
+        "load_seconds": round(load_seconds, 3),
+        "prompt_tokens": int(input_ids.shape[1]),
+        "first_token_ms": round(1000 * first_token_s, 2),
+        "tokens_per_second": round(args["max_new_tokens"] / full_s, 2),
+        "decode_tokens_per_second": round(decode_tokens / max(full_s - first_token_s, 1e-9), 2),
+        "rss_mb": round(_rss_mb(), 1),
+        "model_rss_mb": round(_rss_mb() - baseline_rss, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def _worker(args: dict, mode: str, results):
+    try:
+        results.put(_bench_mode(args, mode))
+    except Exception as e:
+        results.put({"mode": mode, "error": f"{type(e).__name__}: {e}"})
+
+
+def run(args: dict) -> list:
+    context = multiprocessing.get_context("spawn")
+    report = []
+    for mode in args["modes"]:
+        results = context.Queue()
+        process = context.Process(target=_worker, args=(args, mode, results))
+        process.start()
+        report.append(results.get())
+        process.join()
+        print(json.dumps(report[-1], ensure_ascii=False))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--tokenizer", default=None, help="Por defecto el del modelo; 'none' usa ids aleatorios")
+    parser.add_argument("--modes", default="fp32,bf16,int8,4bit")
+    parser.add_argument("--prompt", default=DEFAULT_PROMPT)
+    parser.add_argument("--prompt-tokens", type=int, default=64, help="Longitud del prompt con --tokenizer none")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--output", default=None, help="Ruta del informe JSON")
+    parsed = parser.parse_args()
+
+    args = vars(parsed)
+    args["modes"] = [mode.strip() for mode in parsed.modes.split(",") if mode.strip()]
+    report = run(args)
+    if parsed.output:
+        with open(parsed.output, "w", encoding="utf-8") as output:
+            json.dump({"model": parsed.model, "results": report}, output, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
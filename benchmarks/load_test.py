@@ -0,0 +1,567 @@
+"""
+Prueba de carga de extremo a extremo: arranca `backend.main.app` y un worker
+de respuestas en este proceso contra sustitutos locales y envía mensajes a
+`POST /api/webhook` con usuarios virtuales concurrentes.
+
+Sustitutos:
+    - Graph API de Meta: servidor HTTP local con latencia configurable que
+      registra los envíos (settings.WHATSAPP_API_BASE_URL apunta a él).
+    - Redis: fakeredis en memoria, o uno real con --redis-url.
+    - MongoDB: mongomock-motor en memoria, o uno real con --mongo-url.
+    - Índice vectorial y BM25: índices locales en memoria con una pequeña base
+      de conocimiento y embeddings por hashing (sin descargar modelos).
+    - LLM: Llama diminuto con pesos fijos (semilla) y tokenizador de
+      caracteres, o un modelo real con --model.
+
+Cada usuario virtual envía un mensaje, espera a que el worker termine de
+responder y, tras --think-time, envía el siguiente (carga en bucle cerrado).
+Etapas medidas por mensaje:
+    webhook        POST /api/webhook hasta la respuesta 200 (validar y encolar)
+    dequeue        POST -> el worker toma el mensaje de la cola
+    first_message  POST -> primer mensaje entregado a la Graph API
+    processing     duración de `WhatsAppService.reply` en el worker
+    end_to_end     POST -> respuesta completa enviada
+    graph_send     cada envío a la Graph API (incluye reintentos)
+
+El informe JSON incluye throughput, percentiles p50/p95/p99 por etapa y una
+instantánea de /api/metrics; con --baseline se compara con un informe anterior.
+
+Uso:
+    python -m benchmarks.load_test --concurrency 16 --messages 400 --output carga.json
+    python -m benchmarks.load_test --redis-url redis://localhost:6379/0 --mongo-url mongodb://localhost:27017
+    python -m benchmarks.load_test --output carga.json --baseline carga-anterior.json
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import random
+import socket
+import string
+import subprocess
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+SAMPLE_MESSAGES = [
+    "¿Cuál es el horario de atención?",
+    "Quiero saber el precio del curso PY-101",
+    "¿Qué incluye el curso de ciencia de datos?",
+    "Mi pedido no ha llegado, ¿qué hago?",
+    "¿Tienen sede en Bogotá?",
+    "¿Cómo me inscribo en el curso de IA generativa?",
+    "¿Aceptan pagos a cuotas?",
+    "Necesito el certificado del curso ML-201",
+]
+KNOWLEDGE_BASE = [
+    "El curso PY-101 Introducción a Python cuesta 120 USD y dura 6 semanas.",
+    "El curso ML-201 Machine Learning aplicado requiere haber aprobado PY-101.",
+    "El curso de ciencia de datos incluye pandas, visualización y un proyecto final.",
+    "El curso de IA generativa cubre modelos de lenguaje, RAG y agentes.",
+    "La atención es de lunes a viernes de 8:00 a 18:00 (hora de Bogotá).",
+    "La sede principal está en Bogotá; también hay clases en línea en vivo.",
+    "Los pagos se pueden hacer con tarjeta, PSE o hasta en 3 cuotas sin interés.",
+    "Los certificados se envían por correo 5 días hábiles después de aprobar.",
+    "Si tu pedido no llega en 10 días hábiles escribe a soporte con tu número de orden.",
+]
+STAGES = ["webhook", "dequeue", "first_message", "processing", "end_to_end", "graph_send"]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except Exception:
+        return None
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """Percentiles (nearest-rank) de una lista de latencias en ms."""
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+
+    def percentile(q: float) -> float:
+        return round(values[min(len(values) - 1, int(q * len(values)))], 3)
+
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values), 3),
+        "p50_ms": percentile(0.5),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(values[-1], 3),
+    }
+
+
+# --- Sustitutos locales ---
+
+def build_tiny_llm(path: str, seed: int = 0, hidden_size: int = 64, num_hidden_layers: int = 2) -> str:
+    """
+    Guarda en `path` un Llama diminuto con pesos aleatorios fijos y un
+    tokenizador de caracteres: la generación cuesta lo mismo en cada ejecución
+    y el benchmark mide el resto del sistema, no el modelo.
+    """
+    import torch
+    import transformers
+    from tokenizers import Tokenizer, decoders, models
+
+    specials = ["<pad>", "<s>", "</s>", "<unk>"]
+    chars = sorted(set(string.printable) | set("áéíóúüñÁÉÍÓÚÜÑ¿¡"))
+    vocab = {token: i for i, token in enumerate(specials + chars)}
+    backend = Tokenizer(models.BPE(vocab=vocab, merges=[], unk_token="<unk>"))
+    backend.decoder = decoders.Fuse()
+    tokenizer = transformers.PreTrainedTokenizerFast(
+        tokenizer_object=backend, pad_token="<pad>", bos_token="<s>", eos_token="</s>", unk_token="<unk>"
+    )
+    tokenizer.save_pretrained(path)
+
+    torch.manual_seed(seed)
+    config = transformers.LlamaConfig(
+        vocab_size=len(vocab), hidden_size=hidden_size, intermediate_size=2 * hidden_size,
+        num_hidden_layers=num_hidden_layers, num_attention_heads=4, num_key_value_heads=2,
+        max_position_embeddings=4096, pad_token_id=0, bos_token_id=1, eos_token_id=2
+    )
+    transformers.LlamaForCausalLM(config).save_pretrained(path)
+    return path
+
+
+class HashingEncoder:
+    """Codificador determinista sin modelo: términos BM25 proyectados por hashing a `dimension` componentes."""
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+
+    def encode(self, texts, batch_size: Optional[int] = None, show_progress_bar: bool = False,
+               convert_to_numpy: bool = True, normalize_embeddings: bool = True) -> np.ndarray:
+        from vector_db.bm25_index import tokenize
+
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for term in tokenize(text):
+                digest = hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest()
+                vectors[row, int.from_bytes(digest, "little") % self.dimension] += 1.0
+        if normalize_embeddings:
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors
+
+
+def seed_knowledge_base(encoder: HashingEncoder):
+    """Carga KNOWLEDGE_BASE en los índices (vectorial y BM25) que escribe la ingesta de PDFs."""
+    from config.config import settings
+    from vector_db.backends import get_sparse_index, get_vector_index
+
+    vectors = encoder.encode(KNOWLEDGE_BASE)
+    get_vector_index(settings.KNOWLEDGE_INDEX_NAME, dimension=encoder.dimension).upsert(
+        vectors=[
+            {"id": f"kb-{i}", "values": vector.tolist(), "metadata": {"content": text}}
+            for i, (text, vector) in enumerate(zip(KNOWLEDGE_BASE, vectors))
+        ],
+        namespace=settings.KNOWLEDGE_NAMESPACE
+    )
+    get_sparse_index(settings.KNOWLEDGE_INDEX_NAME).upsert(
+        documents=[{"id": f"kb-{i}", "text": text, "metadata": {"content": text}} for i, text in enumerate(KNOWLEDGE_BASE)],
+        namespace=settings.KNOWLEDGE_NAMESPACE
+    )
+
+
+def create_graph_api(latency_ms: float, error_rate: float, deliveries: List[Dict[str, Any]]):
+    """
+    Graph API falsa: POST /{version}/{phone_number_id}/messages tarda
+    `latency_ms` (±50 %), falla con 500 en una fracción `error_rate` de los
+    envíos y anota cada entrega en `deliveries`.
+    """
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse
+
+    graph = FastAPI()
+
+    @graph.post("/{version}/{phone_number_id}/messages")
+    async def send(request: Request, version: str, phone_number_id: str):
+        payload = await request.json()
+        await asyncio.sleep(latency_ms / 1000 * random.uniform(0.5, 1.5))
+        if random.random() < error_rate:
+            return JSONResponse(status_code=500, content={"error": {"message": "Error simulado", "code": 1}})
+        message_id = f"wamid.{uuid.uuid4().hex}"
+        deliveries.append({"to": payload.get("to"), "id": message_id, "at": time.monotonic()})
+        return {
+            "messaging_product": "whatsapp",
+            "contacts": [{"input": payload.get("to"), "wa_id": payload.get("to")}],
+            "messages": [{"id": message_id}],
+        }
+
+    return graph
+
+
+def use_redis(url: Optional[str]):
+    """Deja preparado el pool de `redis_manager` (el arranque de la app lo reutiliza)."""
+    from redis.asyncio import ConnectionPool, Redis
+
+    from config.config import settings
+    from config.redis_client import redis_manager
+
+    if url:
+        redis_manager.pool = ConnectionPool.from_url(
+            url, decode_responses=True, max_connections=settings.REDIS_MAX_CONNECTIONS
+        )
+        redis_manager.client = Redis(connection_pool=redis_manager.pool)
+        return "redis"
+    try:
+        import fakeredis
+    except ImportError as e:
+        raise ImportError("Sin --redis-url se necesita fakeredis: pip install fakeredis") from e
+    redis_manager.client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    redis_manager.pool = redis_manager.client.connection_pool
+    return "fakeredis"
+
+
+def use_mongo(url: Optional[str]):
+    """Deja preparado el cliente de `db`; con --mongo-url la app se conecta como en producción."""
+    if url:
+        return "mongodb"
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError as e:
+        raise ImportError("Sin --mongo-url se necesita mongomock-motor: pip install mongomock-motor") from e
+    from config.config import settings
+    from config.database import db
+
+    db.client = AsyncMongoMockClient()
+    db.db = db.client[settings.DATABASE_NAME]
+    return "mongomock"
+
+
+def configure_environment(args, graph_url: str, model_path: str):
+    """Variables de entorno antes de que se cargue `settings` (la configuración se lee en el primer uso)."""
+    defaults = {
+        "MONGODB_URL": args.mongo_url or "mongodb://localhost:27017",
+        "DATABASE_NAME": "load_test",
+        "VERIFY_TOKEN": "load-test",
+        "WHATSAPP_TOKEN": "load-test",
+        "PHONE_NUMBER_ID": "100000000000001",
+        "HUGGINGFACE_API_TOKEN": "load-test",
+        "REDIS_HOST": "localhost",
+        "REDIS_PORT": "6379",
+        "REDIS_PASSWORD": "",
+    }
+    for name, value in defaults.items():
+        os.environ.setdefault(name, value)
+    os.environ.update({
+        "WHATSAPP_API_BASE_URL": graph_url,
+        "WHATSAPP_HTTP2": "false",  # El servidor local solo habla HTTP/1.1 sin TLS
+        "WHATSAPP_RATE_LIMIT": str(args.rate_limit),
+        "VECTOR_BACKEND": "local",
+        "LOCAL_INDEX_PATH": "",
+        "BM25_INDEX_PATH": "",
+        "EMBEDDING_CACHE_BACKEND": "memory",
+        "LLM_MODEL_NAME": model_path,
+        "LLM_MAX_NEW_TOKENS": str(args.max_new_tokens),
+        "LLM_MIN_NEW_TOKENS": str(min(args.max_new_tokens, 16)),
+        "LLM_DRAFT_MODEL_NAME": "",
+    })
+    if args.mongo_url:
+        os.environ["MONGODB_URL"] = args.mongo_url
+
+
+# --- Medición ---
+
+class StageRecorder:
+    """
+    Tiempos de cada etapa por mensaje. El worker se instrumenta envolviendo
+    `reply` y `send_message` del servicio; cada usuario virtual tiene como
+    mucho un mensaje en curso, así los envíos se asocian por número.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, List[float]] = defaultdict(list)
+        self.completed = 0
+        self.errors: Dict[str, int] = defaultdict(int)
+        self._inflight: Dict[str, Dict[str, Any]] = {}
+
+    def reset(self):
+        self.stages.clear()
+        self.completed = 0
+        self.errors.clear()
+
+    def record(self, stage: str, seconds: float):
+        self.stages[stage].append(1000 * seconds)
+
+    def post(self, phone: str, message_id: str) -> Dict[str, Any]:
+        timeline = {"id": message_id, "posted": time.monotonic(), "done": asyncio.Event()}
+        self._inflight[phone] = timeline
+        return timeline
+
+    def _current(self, message_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        timeline = self._inflight.get(message_data.get("from"))
+        # Redeliveries de mensajes ya abandonados por timeout no cuentan
+        return timeline if timeline and timeline["id"] == message_data.get("id") else None
+
+    def instrument(self, service):
+        reply, send_message = service.reply, service.send_message
+
+        async def timed_reply(message_data: Dict[str, Any]):
+            timeline = self._current(message_data)
+            started = time.monotonic()
+            if timeline is not None:
+                # Desde el POST: el worker puede leer el mensaje antes de que el webhook responda
+                self.record("dequeue", started - timeline["posted"])
+            try:
+                return await reply(message_data)
+            except Exception as e:
+                self.errors[type(e).__name__] += 1
+                raise
+            finally:
+                finished = time.monotonic()
+                self.record("processing", finished - started)
+                if timeline is not None:
+                    self.record("end_to_end", finished - timeline["posted"])
+                    self.completed += 1
+                    timeline["done"].set()
+
+        async def timed_send_message(to: str, message: str, reply_key: Optional[str] = None):
+            started = time.monotonic()
+            result = await send_message(to=to, message=message, reply_key=reply_key)
+            self.record("graph_send", time.monotonic() - started)
+            timeline = self._inflight.get(to)
+            if timeline is not None and "first_message" not in timeline:
+                timeline["first_message"] = time.monotonic()
+                self.record("first_message", timeline["first_message"] - timeline["posted"])
+            return result
+
+        service.reply = timed_reply
+        service.send_message = timed_send_message
+
+
+def webhook_payload(phone: str, body: str, message_id: str, phone_number_id: str) -> Dict[str, Any]:
+    """Notificación de mensaje de texto con la estructura que envía Meta."""
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [{
+            "id": "load-test",
+            "changes": [{
+                "field": "messages",
+                "value": {
+                    "messaging_product": "whatsapp",
+                    "metadata": {"display_phone_number": "15550000000", "phone_number_id": phone_number_id},
+                    "contacts": [{"profile": {"name": f"Usuario {phone[-4:]}"}, "wa_id": phone}],
+                    "messages": [{
+                        "from": phone,
+                        "id": message_id,
+                        "timestamp": str(int(time.time())),
+                        "type": "text",
+                        "text": {"body": body},
+                    }],
+                },
+            }],
+        }],
+    }
+
+
+async def virtual_user(index: int, client, recorder: StageRecorder, sequence, total: int, args,
+                       phone_number_id: str):
+    phone = f"573{index:09d}"
+    while next(sequence) < total:
+        body = random.choice(SAMPLE_MESSAGES)
+        if args.unique:
+            body = f"{body} ({uuid.uuid4().hex[:6]})"  # Evita la caché de respuestas
+        message_id = f"wamid.load.{uuid.uuid4().hex}"
+        timeline = recorder.post(phone, message_id)
+        try:
+            response = await client.post("/api/webhook", json=webhook_payload(phone, body, message_id, phone_number_id))
+            timeline["acked"] = time.monotonic()
+            recorder.record("webhook", timeline["acked"] - timeline["posted"])
+            response.raise_for_status()
+            await asyncio.wait_for(timeline["done"].wait(), timeout=args.timeout)
+        except asyncio.TimeoutError:
+            recorder.errors["timeout"] += 1
+        except Exception as e:
+            recorder.errors[type(e).__name__] += 1
+        if args.think_time:
+            await asyncio.sleep(random.uniform(0.5, 1.5) * args.think_time)
+
+
+async def _serve(app, port: int):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+            raise RuntimeError(f"El servidor del puerto {port} no arrancó")
+        await asyncio.sleep(0.05)
+    return server, task
+
+
+async def _wait_ready(client, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if (await client.get("/ready")).status_code == 200:
+            return
+        await asyncio.sleep(0.2)
+    raise TimeoutError(f"La aplicación no estuvo lista en {timeout} s")
+
+
+async def run(args) -> Dict[str, Any]:
+    import httpx
+
+    random.seed(args.seed)
+    workdir = tempfile.mkdtemp(prefix="load-test-")
+    model_path = args.model or build_tiny_llm(os.path.join(workdir, "tiny-llm"), seed=args.seed)
+    deliveries: List[Dict[str, Any]] = []
+    graph_port, app_port = _free_port(), _free_port()
+    configure_environment(args, f"http://127.0.0.1:{graph_port}/v21.0", model_path)
+
+    # Imports de la aplicación después de fijar el entorno
+    from api.dependencies import warm_up_whatsapp_service
+    from api.work_queue import create_message_queue
+    from api.worker import run_worker
+    from backend.main import app
+    from config.config import settings
+    from config.redis_client import redis_manager
+    from models.embedding_model import get_embedding_model
+
+    encoder = HashingEncoder()
+    get_embedding_model()._model = encoder
+    seed_knowledge_base(encoder)
+    backends = {"redis": use_redis(args.redis_url), "mongo": use_mongo(args.mongo_url)}
+
+    graph_server, graph_task = await _serve(create_graph_api(args.graph_latency_ms, args.graph_error_rate, deliveries),
+                                            graph_port)
+    app_server, app_task = await _serve(app, app_port)
+    recorder = StageRecorder()
+    stop = asyncio.Event()
+    worker_task = None
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{app_port}", limits=limits, timeout=30) as client:
+            await _wait_ready(client, args.startup_timeout)
+            queue = create_message_queue(await redis_manager.get_client())
+            service = await warm_up_whatsapp_service(queue.redis)
+            recorder.instrument(service)
+            worker_task = asyncio.create_task(
+                run_worker("load-test", args.worker_concurrency or settings.WORKER_CONCURRENCY, stop, service, queue)
+            )
+
+            if args.warmup:
+                await asyncio.gather(*(
+                    virtual_user(i, client, recorder, itertools.count(), 1, args, settings.PHONE_NUMBER_ID)
+                    for i in range(args.warmup)
+                ))
+                recorder.reset()
+
+            sequence = itertools.count()
+            started = time.monotonic()
+            await asyncio.gather(*(
+                virtual_user(args.warmup + i, client, recorder, sequence, args.messages, args, settings.PHONE_NUMBER_ID)
+                for i in range(args.concurrency)
+            ))
+            elapsed = time.monotonic() - started
+            metrics = (await client.get("/api/metrics")).json()
+    finally:
+        stop.set()
+        if worker_task is not None:
+            await worker_task
+        app_server.should_exit = True
+        await app_task
+        graph_server.should_exit = True
+        await graph_task
+
+    return {
+        "benchmark": "load_test",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "revision": _git_revision(),
+        "config": {
+            "concurrency": args.concurrency,
+            "messages": args.messages,
+            "worker_concurrency": args.worker_concurrency or settings.WORKER_CONCURRENCY,
+            "think_time": args.think_time,
+            "unique": args.unique,
+            "model": args.model or "tiny-llama",
+            "max_new_tokens": args.max_new_tokens,
+            "graph_latency_ms": args.graph_latency_ms,
+            "graph_error_rate": args.graph_error_rate,
+            "streaming": settings.LLM_STREAMING_ENABLED,
+            "batching": settings.LLM_BATCHING_ENABLED,
+            **backends,
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        "completed": recorder.completed,
+        "errors": dict(recorder.errors),
+        "throughput_msgs_per_second": round(recorder.completed / elapsed, 3) if elapsed else 0.0,
+        "graph_api_deliveries": len(deliveries),
+        "stages": {stage: summarize(recorder.stages.get(stage, [])) for stage in STAGES},
+        "metrics": metrics,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """Variación porcentual de throughput y de p50/p95/p99 por etapa frente a un informe anterior."""
+    def change(new, old):
+        return round(100 * (new - old) / old, 2) if old else None
+
+    comparison = {
+        "baseline_revision": baseline.get("revision"),
+        "throughput_change_pct": change(report["throughput_msgs_per_second"],
+                                        baseline.get("throughput_msgs_per_second", 0)),
+        "stages": {},
+    }
+    for stage, summary in report["stages"].items():
+        old = baseline.get("stages", {}).get(stage, {})
+        comparison["stages"][stage] = {
+            f"{key}_change_pct": change(summary[key], old[key])
+            for key in ("p50_ms", "p95_ms", "p99_ms") if key in summary and key in old
+        }
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8, help="Usuarios virtuales simultáneos")
+    parser.add_argument("--messages", type=int, default=200, help="Mensajes medidos en total")
+    parser.add_argument("--warmup", type=int, default=4, help="Mensajes de calentamiento (no se miden)")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Pausa media entre mensajes de un usuario (s)")
+    parser.add_argument("--unique", action=argparse.BooleanOptionalAction, default=True,
+                        help="Mensajes distintos en cada envío (--no-unique ejercita la caché de respuestas)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Espera máxima por respuesta (s)")
+    parser.add_argument("--worker-concurrency", type=int, default=None)
+    parser.add_argument("--model", default=None, help="Modelo real en lugar del Llama diminuto")
+    parser.add_argument("--max-new-tokens", type=int, default=48)
+    parser.add_argument("--graph-latency-ms", type=float, default=80.0)
+    parser.add_argument("--graph-error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=1000000, help="WHATSAPP_RATE_LIMIT durante la prueba")
+    parser.add_argument("--redis-url", default=None, help="Redis real (por defecto fakeredis)")
+    parser.add_argument("--mongo-url", default=None, help="MongoDB real (por defecto mongomock-motor)")
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Ruta del informe JSON")
+    parser.add_argument("--baseline", default=None, help="Informe JSON anterior con el que comparar")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["comparison"] = compare(report, json.load(f))
+
+    summary = {key: value for key, value in report.items() if key != "metrics"}
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark de decodificación especulativa (settings.LLM_DRAFT_MODEL_NAME):
+tokens/s del modelo principal solo frente a principal + borrador, y tasa de
+aceptación de los tokens propuestos por el borrador.
+
+La tasa de aceptación se obtiene contando pasadas de cada modelo: cada
+verificación del principal produce los tokens aceptados más uno propio, y
+cada pasada del borrador propone un token.
+
+Los prompts son los mensajes grabados en un .jsonl ({"prompt": ...} o
+{"text": {"body": ...}} como los guarda el historial) o un .txt con uno por
+línea; sin archivo se usan unos de ejemplo.
+
+Uso:
+    python -m benchmarks.speculative_decoding --draft meta-llama/Llama-3.2-1B-Instruct --prompts mensajes.jsonl
+    python -m benchmarks.speculative_decoding --draft-tokens 3,5,8 --max-new-tokens 128 --output spec.json
+"""
+import argparse
+import json
+import statistics
+import time
+
+DEFAULT_MODEL = "meta-llama/Llama-3.2-3B-Instruct"
+DEFAULT_DRAFT = "meta-llama/Llama-3.2-1B-Instruct"
+SAMPLE_PROMPTS = [
+    "¿Cuál es el horario de atención y cómo contacto a soporte?",
+    "Explica en tres frases qué incluye el curso de Python.",
+    "Mi pedido no ha llegado, ¿qué debo hacer?",
+    "Resume las políticas de devolución de la tienda.",
+]
+
+
+def load_prompts(path: str, limit: int) -> list:
+    if not path:
+        return SAMPLE_PROMPTS[:limit]
+    prompts = []
+    with open(path, encoding="utf-8") as source:
+        for line in source:
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                record = json.loads(line)
+                line = record.get("prompt") or record.get("text", {}).get("body", "")
+            if line:
+                prompts.append(line)
+    return prompts[:limit]
+
+
+class _ForwardCounter:
+    """Cuenta las pasadas forward de un modelo con un hook."""
+
+    def __init__(self, model):
+        self.calls = 0
+        self._handle = model.register_forward_hook(self._hook)
+
+    def _hook(self, module, inputs, output):
+        self.calls += 1
+
+    def reset(self):
+        self.calls = 0
+
+    def remove(self):
+        self._handle.remove()
+
+
+def _format(tokenizer, prompt: str) -> str:
+    if getattr(tokenizer, "chat_template", None):
+        return tokenizer.apply_chat_template([{"role": "user", "content": prompt}], tokenize=False,
+                                             add_generation_prompt=True)
+    return prompt
+
+
+def run(args) -> dict:
+    import torch
+    from transformers import AutoTokenizer
+    from models.llm_loader import load_causal_lm, load_draft_model
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = load_causal_lm(args.model, precision=args.precision, num_threads=args.threads)
+    draft = load_draft_model(model, args.draft, precision=args.draft_precision)
+    target_counter, draft_counter = _ForwardCounter(model), _ForwardCounter(draft)
+    prompts = load_prompts(args.prompts, args.limit)
+
+    def generate(input_ids, assistant=None) -> tuple:
+        target_counter.reset()
+        draft_counter.reset()
+        start = time.perf_counter()
+        with torch.inference_mode():
+            output = model.generate(
+                input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                max_new_tokens=args.max_new_tokens,
+                do_sample=False,  # Greedy: la salida especulativa debe coincidir con la del principal
+                assistant_model=assistant,
+                pad_token_id=tokenizer.pad_token_id or tokenizer.eos_token_id
+            )
+        return output[0, input_ids.shape[1]:].tolist(), time.perf_counter() - start
+
+    encoded = [tokenizer(_format(tokenizer, p), return_tensors="pt")["input_ids"] for p in prompts]
+    generate(encoded[0][:, :8])  # Calentamiento
+    baseline = [generate(ids) for ids in encoded]
+    baseline_tps = sum(len(tokens) for tokens, _ in baseline) / sum(seconds for _, seconds in baseline)
+
+    results = []
+    for num_tokens in args.draft_tokens:
+        draft.generation_config.num_assistant_tokens = num_tokens
+        draft.generation_config.num_assistant_tokens_schedule = args.schedule
+        tokens_total, seconds_total, accepted, proposed, matches, speedups = 0, 0.0, 0, 0, 0, []
+        for ids, (expected, base_seconds) in zip(encoded, baseline):
+            tokens, seconds = generate(ids, assistant=draft)
+            tokens_total += len(tokens)
+            seconds_total += seconds
+            accepted += max(0, len(tokens) - target_counter.calls)
+            proposed += draft_counter.calls
+            matches += tokens == expected
+            speedups.append(base_seconds / seconds if seconds else 0.0)
+        results.append({
+            "num_assistant_tokens": num_tokens,
+            "schedule": args.schedule,
+            "tokens_per_second": round(tokens_total / seconds_total, 2),
+            "speedup": round(tokens_total / seconds_total / baseline_tps, 3),
+            "median_prompt_speedup": round(statistics.median(speedups), 3),
+            "acceptance_rate": round(accepted / proposed, 3) if proposed else 0.0,
+            "outputs_match_baseline": f"{matches}/{len(encoded)}",
+        })
+        print(json.dumps(results[-1], ensure_ascii=False))
+
+    target_counter.remove()
+    draft_counter.remove()
+    return {
+        "model": args.model,
+        "draft": args.draft,
+        "prompts": len(prompts),
+        "max_new_tokens": args.max_new_tokens,
+        "baseline_tokens_per_second": round(baseline_tps, 2),
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--draft", default=DEFAULT_DRAFT)
+    parser.add_argument("--precision", default="fp32")
+    parser.add_argument("--draft-precision", default="fp32")
+    parser.add_argument("--prompts", default=None, help="Archivo .jsonl o .txt con los mensajes grabados")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--draft-tokens", default="5", help="Valores de num_assistant_tokens separados por comas")
+    parser.add_argument("--schedule", default="constant", choices=["constant", "heuristic"])
+    parser.add_argument("--max-new-tokens", type=int, default=96)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--output", default=None, help="Ruta del informe JSON")
+    args = parser.parse_args()
+    args.draft_tokens = [int(n) for n in args.draft_tokens.split(",") if n.strip()]
+
+    report = run(args)
+    print(json.dumps({k: v for k, v in report.items() if k != "results"}, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
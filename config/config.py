@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings
+from functools import lru_cache
 from typing import Optional
 
 class Settings(BaseSettings):
@@ -9,11 +10,19 @@ class Settings(BaseSettings):
     # Configuración de MongoDB
     MONGODB_URL: str  # URL de conexión a MongoDB (ejemplo: mongodb://localhost:27017)
     DATABASE_NAME: str  # Nombre de la base de datos (ejemplo: whatsapp_bot)
+    MONGODB_MAX_POOL_SIZE: int = 50  # Conexiones máximas por proceso
+    MONGODB_MIN_POOL_SIZE: int = 5  # Conexiones que se mantienen abiertas
+    MONGODB_MAX_IDLE_TIME_MS: int = 60000  # Cierra conexiones inactivas tras este tiempo
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MESSAGE_WRITE_BATCH_SIZE: int = 100  # Mensajes por insert_many
+    MESSAGE_WRITE_FLUSH_INTERVAL: float = 0.5  # Segundos máximos en el buffer
+    MESSAGE_WRITE_MAX_PENDING: int = 10000  # Por encima se escribe en línea
 
     # Configuración de la API de WhatsApp
     VERIFY_TOKEN: str  # Token de verificación para el webhook
     WHATSAPP_TOKEN: str  # Token de acceso para la API de WhatsApp
     PHONE_NUMBER_ID: str  # ID del número de teléfono registrado en WhatsApp Business
+    WHATSAPP_API_BASE_URL: str = "https://graph.facebook.com/v21.0"  # Graph API (o un servidor local en benchmarks)
 
     # Plantilla de mensajes (opcional)
     TEMPLATE: Optional[str] = None  # Plantilla de mensaje predeterminada (si aplica)
@@ -22,26 +31,123 @@ class Settings(BaseSettings):
     HUGGINGFACE_API_TOKEN: str  # Clave de API para acceder a modelos de Hugging Face
     
      # Clave de API Pinecone
-    PINECONE_API_KEY:  str  # Clave de API para acceder a Pinecone
+    PINECONE_API_KEY: Optional[str] = None  # Clave de API para acceder a Pinecone
     
-    PINECONE_ENV :str
+    PINECONE_ENV: Optional[str] = None
+
+    # Backend vectorial: "pinecone" (remoto) o "local" (índice embebido en proceso)
+    VECTOR_BACKEND: str = "pinecone"
+    LOCAL_INDEX_PATH: Optional[str] = "data/embeddings/local_index"  # None = solo en memoria
+    LOCAL_INDEX_MODE: str = "exact"  # "exact", "ivf" o "hnsw"
+    KNOWLEDGE_INDEX_NAME: str = "chatbot"  # Índice que escribe la ingesta de PDFs y consulta el asistente
+    KNOWLEDGE_NAMESPACE: str = "courses"  # Namespace de ese índice (vectorial y BM25)
+    HYBRID_SEARCH_ENABLED: bool = True  # Fusionar búsqueda densa con BM25 (códigos, nombres, números)
+    BM25_INDEX_PATH: Optional[str] = "data/embeddings/bm25"  # None = solo en memoria
+    RETRIEVAL_TOP_K: int = 3  # Fragmentos de contexto en el prompt
+    RETRIEVAL_CANDIDATES: int = 20  # Candidatos de cada búsqueda antes de la fusión
+    RRF_K: int = 60  # Constante de Reciprocal Rank Fusion
+
+    # Servicio de embeddings compartido (micro-batching)
+    EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_MAX_BATCH_SIZE: int = 64  # Textos máximos por lote
+    EMBEDDING_MAX_WAIT_MS: float = 5.0  # Espera máxima para agrupar solicitudes concurrentes
+    EMBEDDING_BACKEND: str = "torch"  # "torch" (SentenceTransformer) u "onnx" (ONNX Runtime en CPU)
+    EMBEDDING_ONNX_PATH: str = "data/models/onnx"  # Carpeta de los modelos exportados
+    EMBEDDING_ONNX_QUANTIZE: bool = False  # Cuantización int8 dinámica del modelo ONNX
+    EMBEDDING_ONNX_THREADS: Optional[int] = None  # Hilos intra-op de ONNX Runtime
+
+    # Caché de embeddings: "none", "memory" (LRU), "disk" (SQLite) o "redis"
+    EMBEDDING_CACHE_BACKEND: str = "memory"
+    EMBEDDING_CACHE_SIZE: int = 10000  # Entradas en el nivel LRU en memoria
+    EMBEDDING_CACHE_PATH: str = "data/embeddings/embedding_cache.sqlite"
+    EMBEDDING_CACHE_TTL: int = 7 * 24 * 3600  # Solo para el nivel Redis
+
+    # Modelo de lenguaje y planificador de inferencia
+    LLM_MODEL_NAME: str = "meta-llama/Llama-3.2-3B-Instruct"
+    LLM_MAX_INPUT_TOKENS: int = 2048
+    LLM_MAX_NEW_TOKENS: int = 512
+    LLM_PRECISION: str = "fp32"  # fp32 | bf16 | int8 (dinámica) | 4bit (bitsandbytes)
+    LLM_NUM_THREADS: Optional[int] = None  # Hilos de PyTorch (None = todos los núcleos)
+    LLM_BATCHING_ENABLED: bool = True  # Batching continuo de solicitudes concurrentes
+    LLM_MAX_BATCH_SIZE: int = 8  # Secuencias simultáneas en el lote activo
+    LLM_PREFIX_CACHE_ENABLED: bool = True  # Reutilizar el KV cache de los system prompts
+    LLM_PREFIX_CACHE_MAX_MB: int = 512  # Memoria máxima del cache de prefijos
+    LLM_PREFIX_CACHE_MAX_ENTRIES: int = 64
+    LLM_PREFIX_MIN_TOKENS: int = 32  # Prefijos más cortos no compensan guardarse
+    LLM_DRAFT_MODEL_NAME: Optional[str] = None  # Modelo borrador para decodificación especulativa (p. ej. meta-llama/Llama-3.2-1B-Instruct)
+    LLM_DRAFT_PRECISION: str = "fp32"  # Precisión del borrador (mismos modos que LLM_PRECISION)
+    LLM_DRAFT_NUM_TOKENS: int = 5  # Tokens propuestos por paso de verificación
+    LLM_RESPONSE_BUDGET_SECONDS: float = 60.0  # Plazo por mensaje (generación y reintentos); 0 = sin plazo
+    LLM_MAX_ATTEMPTS: int = 3  # Generaciones como máximo si la validación falla
+    LLM_MIN_ATTEMPT_SECONDS: float = 5.0  # No reintentar si queda menos tiempo que esto
+    LLM_MIN_NEW_TOKENS: int = 64  # Mínimo de tokens por intento aunque quede poco plazo
+    LLM_HISTORY_TURNS: int = 6  # Mensajes previos de la conversación en el prompt (0 = sin historial)
+    LLM_STREAMING_ENABLED: bool = True  # Enviar cada frase por WhatsApp mientras se genera el resto
+    STREAM_SEGMENT_MIN_CHARS: int = 60  # Frases más cortas se agrupan con la siguiente
+    STREAM_SEGMENT_MAX_CHARS: int = 1200  # Corte forzado si no aparece fin de frase
+
+    # Pool dedicado para llamadas de CPU (embeddings, búsquedas, generación)
+    INFERENCE_EXECUTOR_WORKERS: int = 2
+    GENERATION_EXECUTOR_WORKERS: int = 1  # Generaciones fuera del planificador (sin batching o especulativas)
+    VECTOR_IO_WORKERS: int = 8  # Consultas y upserts al índice vectorial (red con Pinecone), fuera del pool de CPU
+
+    # Pipeline de ingesta de PDFs
+    PDF_EXTRACTION_WORKERS: int = 4  # Procesos para extraer texto
+    PDF_PAGES_PER_TASK: int = 16  # Páginas por tarea de extracción
+    PDF_PIPELINE_QUEUE_SIZE: int = 256  # Páginas en cola entre extracción y embeddings
+    PDF_EMBED_BATCH_SIZE: int = 32
+    PDF_UPSERT_BATCH_SIZE: int = 32
+    PDF_UPSERT_CONCURRENCY: int = 4
     
     #Redis 
     REDIS_HOST: str
     REDIS_PORT: str
     REDIS_PASSWORD: str
+    REDIS_MAX_CONNECTIONS: int = 50  # Conexiones máximas del pool por worker
+    REDIS_SOCKET_TIMEOUT: float = 5.0  # Segundos
+    USER_CACHE_TTL: int = 300  # Segundos que un system prompt/usuario se sirve desde memoria
+    USER_CACHE_MAX_ENTRIES: int = 10000
     WHATSAPP_RATE_LIMIT: int = 15
     CACHE_TTL: int = 3600
+
+    # Caché semántica de respuestas
+    RESPONSE_CACHE_TTL: int = 300  # Segundos
+    RESPONSE_CACHE_SIMILARITY: float = 0.92  # Similitud coseno mínima para reutilizar una respuesta
+    RESPONSE_CACHE_MAX_ENTRIES: int = 200  # Preguntas recientes por ámbito (prompt + usuario)
+
+    # Cola de trabajo (Redis Streams) y workers de respuesta
+    QUEUE_VISIBILITY_TIMEOUT_MS: int = 120000  # Tiempo antes de reclamar un mensaje sin confirmar
+    QUEUE_MAX_DELIVERIES: int = 3  # Intentos antes de mover a dead-letter
+    QUEUE_STREAM_MAXLEN: int = 100000
+    QUEUE_DEDUPE_TTL: int = 86400  # Ventana para descartar reintentos de Meta
+    WORKER_PROCESSES: int = 2
+    WORKER_CONCURRENCY: int = 8  # Mensajes en paralelo por proceso
+
+    # Cliente HTTP compartido para la Graph API de WhatsApp
+    WHATSAPP_HTTP2: bool = True
+    WHATSAPP_HTTP_MAX_CONNECTIONS: int = 100
+    WHATSAPP_HTTP_MAX_KEEPALIVE: int = 20
+    WHATSAPP_HTTP_KEEPALIVE_EXPIRY: float = 30.0  # Segundos
+    WHATSAPP_HTTP_TIMEOUT: float = 10.0  # Segundos
+    WHATSAPP_HTTP_CONNECT_TIMEOUT: float = 5.0  # Segundos
     class Config:
         env_file = ".env"  # Cargar variables de entorno desde el archivo .env
         env_file_encoding = "utf-8"  # Codificación del archivo .env
         case_sensitive = True  # Las variables son sensibles a mayúsculas/minúsculas
 
-# Instancia de la configuración
-settings = Settings()
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """
+    Carga y valida la configuración la primera vez que se usa.
+    Importar este módulo no lee el entorno ni valida nada.
+    """
+    config = Settings()
+    validate_settings(config)
+    return config
 
 # Validación adicional para asegurar que las variables críticas estén configuradas
-def validate_settings():
+def validate_settings(config: Optional[Settings] = None):
+    config = config or get_settings()
     critical_vars = [
         "MONGODB_URL",
         "DATABASE_NAME",
@@ -49,11 +155,19 @@ def validate_settings():
         "WHATSAPP_TOKEN",
         "PHONE_NUMBER_ID",
         "HUGGINGFACE_API_TOKEN",
-        "PINECONE_API_KEY",
-        "PINECONE_ENV"
     ]
-    missing_vars = [var for var in critical_vars if not getattr(settings, var)]
+    # Pinecone solo es obligatorio cuando se usa como backend vectorial
+    if config.VECTOR_BACKEND == "pinecone":
+        critical_vars += ["PINECONE_API_KEY", "PINECONE_ENV"]
+    missing_vars = [var for var in critical_vars if not getattr(config, var)]
     if missing_vars:
         raise ValueError(f"Faltan las siguientes variables de entorno: {', '.join(missing_vars)}")
 
-validate_settings()
\ No newline at end of file
+class _LazySettings:
+    """Acceso diferido a la configuración: `settings.X` carga y valida en el primer uso."""
+
+    def __getattr__(self, name):
+        return getattr(get_settings(), name)
+
+# Instancia de la configuración
+settings = _LazySettings()
@@ -1,27 +1,59 @@
-from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo.database import Database
+from typing import Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from config.config import settings
 
 class MongoDB:
-    client: AsyncIOMotorClient = None
-    db: Database = None
+    client: Optional[AsyncIOMotorClient] = None
+    db: Optional[AsyncIOMotorDatabase] = None
 
     async def connect_to_database(self):
         """Conecta a la base de datos MongoDB utilizando la URL y el nombre de la base de datos de la configuración."""
+        if self.client is not None:
+            return
         try:
-            self.client = AsyncIOMotorClient(settings.MONGODB_URL)
-            self.db = self.client[settings.DATABASE_NAME]
+            self._create_client()
             print("Conexión a la base de datos establecida.")
         except Exception as e:
             print(f"Error al conectar a la base de datos: {str(e)}")
             raise
 
+    def _create_client(self):
+        # Un único cliente (y un único pool) por proceso, compartido por todos los repositorios
+        self.client = AsyncIOMotorClient(
+            settings.MONGODB_URL,
+            maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+            minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+            maxIdleTimeMS=settings.MONGODB_MAX_IDLE_TIME_MS,
+            serverSelectionTimeoutMS=settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS
+        )
+        self.db = self.client[settings.DATABASE_NAME]
+
+    def get_database(self) -> AsyncIOMotorDatabase:
+        """Base de datos sobre el cliente compartido; lo crea si aún no existe (p. ej. en los workers)."""
+        if self.db is None:
+            self._create_client()
+        return self.db
+
+    async def ensure_indexes(self):
+        """Crea los índices que usan los repositorios (evento de inicio)."""
+        from models.user_model import UserDB
+        from repositories.message_repository import MessageRepository
+
+        try:
+            await MessageRepository(self.get_database()).ensure_indexes()
+            await UserDB(self.get_database()).ensure_indexes()
+        except Exception as e:
+            print(f"Error al crear los índices: {str(e)}")
+            raise
+
     async def close_database_connection(self):
         """Cierra la conexión a la base de datos."""
         if self.client is not None:
             self.client.close()
+            self.client = None
+            self.db = None
             print("Conexión a la base de datos cerrada.")
 
 # Instancia de la clase MongoDB
 db = MongoDB()
-    
\ No newline at end of file
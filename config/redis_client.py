@@ -0,0 +1,60 @@
+from typing import Optional
+
+from redis.asyncio import ConnectionPool, Redis
+
+from config.config import settings
+
+
+class RedisManager:
+    pool: Optional[ConnectionPool] = None
+    client: Optional[Redis] = None
+
+    async def connect(self):
+        """Crea el pool de conexiones compartido por todas las peticiones del worker."""
+        if self.pool is not None:
+            return
+        try:
+            self.pool = ConnectionPool(
+                host=settings.REDIS_HOST,
+                port=int(settings.REDIS_PORT),
+                password=settings.REDIS_PASSWORD,
+                decode_responses=True,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                health_check_interval=30
+            )
+            self.client = Redis(connection_pool=self.pool)
+            print("Pool de conexiones a Redis creado.")
+        except Exception as e:
+            print(f"Error al crear el pool de Redis: {str(e)}")
+            raise
+
+    async def close(self):
+        """Cierra todas las conexiones del pool."""
+        if self.pool is not None:
+            await self.pool.disconnect()
+            self.pool = None
+            self.client = None
+            print("Pool de conexiones a Redis cerrado.")
+
+    async def get_client(self) -> Redis:
+        """Cliente que toma conexiones prestadas del pool compartido."""
+        if self.client is None:
+            await self.connect()
+        return self.client
+
+    def stats(self) -> dict:
+        if self.pool is None:
+            return {"connected": False}
+        stats = {"connected": True, "max_connections": self.pool.max_connections}
+        # Contadores internos de redis-py (no son API pública): si cambian, se informan como None
+        for name, attribute in (("available", "_available_connections"), ("in_use", "_in_use_connections")):
+            try:
+                stats[name] = len(getattr(self.pool, attribute))
+            except (AttributeError, TypeError):
+                stats[name] = None
+        return stats
+
+
+# Instancia compartida del pool de Redis
+redis_manager = RedisManager()
@@ -0,0 +1,191 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Normaliza unicode, espacios y mayúsculas (MiniLM es uncased)."""
+    return " ".join(unicodedata.normalize("NFC", text).split()).lower()
+
+
+def cache_key(model_name: str, text: str) -> str:
+    """Clave estable entre procesos: modelo + hash del texto normalizado."""
+    digest = hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=16).hexdigest()
+    return f"emb:{model_name}:{digest}"
+
+
+class DiskEmbeddingStore:
+    """Nivel persistente en SQLite; los vectores se guardan como float16."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        with self._lock:
+            placeholders = ",".join("?" * len(keys))
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", keys
+            ).fetchall()
+        return dict(rows)
+
+    def set_many(self, items: Dict[str, bytes]):
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?)", items.items())
+            self._conn.commit()
+
+
+class RedisEmbeddingStore:
+    """Nivel persistente compartido en Redis; los vectores se guardan como float16."""
+
+    def __init__(self, client, ttl: Optional[int] = None):
+        self.client = client  # Cliente redis síncrono (se usa desde hilos de inferencia)
+        self.ttl = ttl
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        values = self.client.mget(keys)
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    def set_many(self, items: Dict[str, bytes]):
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.set(key, value, ex=self.ttl)
+        pipe.execute()
+
+
+class EmbeddingCache:
+    """
+    Caché de embeddings con un nivel LRU en memoria y un nivel persistente
+    opcional (disco o Redis) que almacena vectores compactos en float16.
+    """
+
+    def __init__(self, model_name: str, max_entries: int = 10000, store=None):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.store = store
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def get_many(self, texts: List[str], memory_only: bool = False) -> List[Optional[np.ndarray]]:
+        """
+        Busca los embeddings de `texts` en la caché.
+        Args:
+            texts (list): Textos a buscar.
+            memory_only (bool): Consultar solo el nivel en memoria (sin I/O). En este
+                modo los fallos no se contabilizan porque se resolverán en otra consulta.
+        Returns:
+            list: Vector float32 por texto, o None si no está en caché.
+        """
+        keys = [cache_key(self.model_name, text) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._lru.get(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                    results[i] = vector
+                    self.memory_hits += 1
+                else:
+                    missing.append(i)
+
+        if memory_only or not missing:
+            return results
+
+        found = {}
+        if self.store is not None:
+            try:
+                found = self.store.get_many([keys[i] for i in missing])
+            except Exception as e:
+                logger.warning(f"Error leyendo caché persistente de embeddings: {str(e)}")
+
+        with self._lock:
+            for i in missing:
+                raw = found.get(keys[i])
+                if raw is None:
+                    self.misses += 1
+                    continue
+                vector = np.frombuffer(raw, dtype=np.float16).astype(np.float32)
+                self._remember(keys[i], vector)
+                results[i] = vector
+                self.persistent_hits += 1
+        return results
+
+    def set_many(self, texts: List[str], vectors: np.ndarray):
+        """Guarda embeddings en memoria y, si existe, en el nivel persistente."""
+        keys = [cache_key(self.model_name, text) for text in texts]
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+
+        if self.store is not None:
+            try:
+                self.store.set_many({
+                    key: vector.astype(np.float16).tobytes() for key, vector in zip(keys, vectors)
+                })
+            except Exception as e:
+                logger.warning(f"Error escribiendo caché persistente de embeddings: {str(e)}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.persistent_hits
+            total = hits + self.misses
+            return {
+                "entries": len(self._lru),
+                "memory_hits": self.memory_hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "hit_ratio": hits / total if total else 0.0,
+            }
+
+
+def build_embedding_cache(model_name: str) -> Optional[EmbeddingCache]:
+    """Construye la caché según EMBEDDING_CACHE_BACKEND ("none", "memory", "disk" o "redis")."""
+    from config.config import settings
+
+    backend = settings.EMBEDDING_CACHE_BACKEND
+    if backend == "none":
+        return None
+
+    store = None
+    if backend == "disk":
+        store = DiskEmbeddingStore(settings.EMBEDDING_CACHE_PATH)
+    elif backend == "redis":
+        from redis import Redis
+
+        store = RedisEmbeddingStore(
+            Redis(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                password=settings.REDIS_PASSWORD
+            ),
+            ttl=settings.EMBEDDING_CACHE_TTL
+        )
+    elif backend != "memory":
+        raise ValueError(f"Backend de caché de embeddings no soportado: {backend}")
+
+    return EmbeddingCache(model_name, max_entries=settings.EMBEDDING_CACHE_SIZE, store=store)
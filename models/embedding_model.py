@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import threading
+import time
+from functools import lru_cache
+from typing import List, Optional, Union
+
+import numpy as np
+
+from config.config import settings
+from models.embedding_cache import EmbeddingCache, build_embedding_cache
+from utils.inference_executor import get_inference_executor
+from utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def load_sentence_transformer(model_name: str):
+    """Carga un SentenceTransformer una sola vez por proceso y nombre de modelo."""
+    from sentence_transformers import SentenceTransformer
+
+    logger.info(f"Cargando modelo de embeddings {model_name}")
+    return SentenceTransformer(model_name)
+
+
+@lru_cache(maxsize=None)
+def load_encoder(model_name: str, backend: str = "torch"):
+    """
+    Codificador del backend configurado, una vez por proceso.
+    Args:
+        model_name (str): Nombre del modelo de embeddings.
+        backend (str): "torch" (SentenceTransformer) u "onnx" (ONNX Runtime).
+    """
+    if backend == "torch":
+        return load_sentence_transformer(model_name)
+    if backend == "onnx":
+        from models.onnx_embedder import OnnxSentenceEncoder
+
+        return OnnxSentenceEncoder(
+            model_name,
+            export_dir=settings.EMBEDDING_ONNX_PATH,
+            quantize=settings.EMBEDDING_ONNX_QUANTIZE,
+            num_threads=settings.EMBEDDING_ONNX_THREADS
+        )
+    raise ValueError(f"Backend de embeddings no soportado: {backend}")
+
+
+def encoder_id(model_name: str, backend: str) -> str:
+    """Identificador del codificador para la caché: los vectores int8 no se mezclan con los de PyTorch."""
+    if backend == "onnx" and settings.EMBEDDING_ONNX_QUANTIZE:
+        return f"{model_name}@onnx-int8"
+    return model_name
+
+
+class EmbeddingModel:
+    """
+    Servicio de embeddings compartido por todo el proceso.
+
+    Las llamadas concurrentes a `aencode` se agrupan en micro-lotes dinámicos:
+    el primer texto en cola abre una ventana de `max_wait_ms` y el lote se
+    cierra al llegar a `max_batch_size` textos o al vencer la ventana. La
+    codificación se ejecuta en el pool de inferencia, fuera del event loop.
+    """
+
+    def __init__(self, model_name: Optional[str] = None, max_batch_size: Optional[int] = None,
+                 max_wait_ms: Optional[float] = None, model=None, cache: Optional[EmbeddingCache] = None,
+                 backend: Optional[str] = None):
+        self.model_name = model_name or settings.EMBEDDING_MODEL
+        self.backend = backend or settings.EMBEDDING_BACKEND
+        self.max_batch_size = max_batch_size or settings.EMBEDDING_MAX_BATCH_SIZE
+        self.max_wait = (settings.EMBEDDING_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000
+        self._model = model
+        self.cache = cache
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = load_encoder(self.model_name, self.backend)
+        return self._model
+
+    def encode(self, texts: Union[str, List[str]], batch_size: Optional[int] = None) -> np.ndarray:
+        """
+        Codificación síncrona (para hilos de trabajo o scripts).
+        Args:
+            texts (str | list): Texto o lista de textos.
+            batch_size (int): Tamaño de lote interno del modelo.
+        Returns:
+            np.ndarray: Vector (dim,) para un texto o matriz (n, dim) para una lista.
+        """
+        single = isinstance(texts, str)
+        embeddings = self._encode_cached([texts] if single else list(texts), batch_size)
+        return embeddings[0] if single else embeddings
+
+    def generate_embeddings(self, text: str) -> List[float]:
+        """Embedding de un texto como lista de floats."""
+        return self.encode(text).tolist()
+
+    async def aencode(self, texts: Union[str, List[str]]) -> np.ndarray:
+        """
+        Codificación asíncrona con micro-batching entre llamadas concurrentes.
+        Args:
+            texts (str | list): Texto o lista de textos.
+        Returns:
+            np.ndarray: Vector (dim,) para un texto o matriz (n, dim) para una lista.
+        """
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        if not batch:
+            return np.empty((0, 0), dtype=np.float32)
+
+        # Los aciertos en memoria se resuelven sin pasar por la cola
+        cached = self.cache.get_many(batch, memory_only=True) if self.cache else [None] * len(batch)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            self._ensure_worker()
+            future = self._loop.create_future()
+            await self._queue.put(([batch[i] for i in missing], future))
+            for i, vector in zip(missing, await future):
+                cached[i] = vector
+
+        embeddings = np.stack(cached)
+        return embeddings[0] if single else embeddings
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._batch_loop())
+
+    async def _batch_loop(self):
+        while True:
+            pending = [await self._queue.get()]
+            total = len(pending[0][0])
+            deadline = time.monotonic() + self.max_wait
+
+            # Agrupar solicitudes hasta llenar el lote o vencer la ventana de espera
+            while total < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                total += len(item[0])
+
+            texts = [text for batch, _ in pending for text in batch]
+            try:
+                embeddings = await self._run_encode(texts)
+            except Exception as e:
+                logger.error(f"Error generando embeddings: {str(e)}")
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            offset = 0
+            for batch, future in pending:
+                if not future.done():
+                    future.set_result(embeddings[offset:offset + len(batch)])
+                offset += len(batch)
+
+    def _encode_cached(self, texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+        """Codifica solo los textos que no están en caché y guarda los nuevos vectores."""
+        if self.cache is None:
+            return self._encode_model(texts, batch_size)
+
+        cached = self.cache.get_many(texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            vectors = self._encode_model(missing_texts, batch_size)
+            self.cache.set_many(missing_texts, vectors)
+            for i, vector in zip(missing, vectors):
+                cached[i] = vector
+        return np.stack(cached)
+
+    def _encode_model(self, texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=batch_size or self.max_batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        ).astype(np.float32, copy=False)
+
+    async def _run_encode(self, texts: List[str]) -> np.ndarray:
+        return await get_inference_executor().run(self._encode_cached, texts)
+
+
+_default_model: Optional[EmbeddingModel] = None
+_default_lock = threading.Lock()
+
+
+def get_embedding_model() -> EmbeddingModel:
+    """Devuelve el servicio de embeddings compartido del proceso."""
+    global _default_model
+    with _default_lock:
+        if _default_model is None:
+            cache = build_embedding_cache(encoder_id(settings.EMBEDDING_MODEL, settings.EMBEDDING_BACKEND))
+            _default_model = EmbeddingModel(cache=cache)
+            if _default_model.cache is not None:
+                register_metrics("embedding_cache", _default_model.cache.stats)
+        return _default_model
@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+
+def remaining_seconds(deadline: Optional[float]) -> float:
+    """Segundos hasta `deadline` (reloj monotónico); infinito si no hay plazo."""
+    if deadline is None:
+        return float("inf")
+    return deadline - time.monotonic()
+
+
+def token_budget(remaining: float, budget: float, max_new_tokens: int, min_new_tokens: int) -> int:
+    """
+    Tokens nuevos permitidos para un intento: proporcionales a la fracción del
+    plazo que queda, nunca menos de `min_new_tokens` ni más de `max_new_tokens`.
+    """
+    if budget <= 0 or remaining == float("inf"):
+        return max_new_tokens
+    fraction = max(0.0, min(1.0, remaining / budget))
+    return max(min(min_new_tokens, max_new_tokens), int(max_new_tokens * fraction))
+
+
+@dataclass
+class QueryOutcome:
+    """
+    Cómo terminó una consulta al asistente. Solo una respuesta que pasó la
+    validación sin agotar el plazo es completa y se puede reutilizar (caché).
+    """
+    response: str = ""
+    valid: bool = False
+    timed_out: bool = False
+
+    @property
+    def complete(self) -> bool:
+        return self.valid and not self.timed_out and bool(self.response)
+
+
+class GenerationBudgetStats:
+    """
+    Métricas del bucle generar → validar: intentos por solicitud, plazos
+    agotados, respuestas de respaldo y uso del presupuesto de latencia
+    (percentiles sobre una ventana de las últimas `window` solicitudes).
+    """
+
+    def __init__(self, budget_seconds: float, window: int = 1000):
+        self.budget_seconds = budget_seconds
+        self.requests = 0
+        self.attempts = 0
+        self.retries = 0
+        self.deadline_exceeded = 0
+        self.fallbacks = 0
+        self.attempt_counts: Dict[int, int] = {}
+        self._elapsed = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record_attempt(self, deadline_exceeded: bool = False):
+        with self._lock:
+            self.attempts += 1
+            if deadline_exceeded:
+                self.deadline_exceeded += 1
+
+    def record_request(self, attempts: int, elapsed: float, fallback: bool = False):
+        with self._lock:
+            self.requests += 1
+            self.retries += max(0, attempts - 1)
+            self.attempt_counts[attempts] = self.attempt_counts.get(attempts, 0) + 1
+            if fallback:
+                self.fallbacks += 1
+            self._elapsed.append(elapsed)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = sorted(self._elapsed)
+            attempt_counts = {str(k): v for k, v in sorted(self.attempt_counts.items())}
+            requests = self.requests
+
+        def percentile(q: float) -> float:
+            return elapsed[min(len(elapsed) - 1, int(q * len(elapsed)))] if elapsed else 0.0
+
+        return {
+            "budget_seconds": self.budget_seconds,
+            "requests": requests,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "avg_attempts": self.attempts / requests if requests else 0.0,
+            "attempt_counts": attempt_counts,
+            "deadline_exceeded": self.deadline_exceeded,
+            "fallbacks": self.fallbacks,
+            "p50_seconds": percentile(0.5),
+            "p99_seconds": percentile(0.99),
+            "p99_budget_used": percentile(0.99) / self.budget_seconds if self.budget_seconds else 0.0,
+        }
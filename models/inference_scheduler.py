@@ -0,0 +1,446 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, List, Optional, Set
+
+import torch
+
+from models.prefix_cache import PrefixKVCache, compute_prefix_layers, prefix_key
+from models.streaming import AsyncTextStreamer
+from utils.inference_executor import get_inference_executor
+from utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+
+def cache_layers(cache) -> List[tuple]:
+    """Extrae los tensores (key, value) por capa de un cache de transformers."""
+    if hasattr(cache, "layers"):  # transformers >= 4.54
+        return [(layer.keys, layer.values) for layer in cache.layers]
+    if hasattr(cache, "key_cache"):
+        return list(zip(cache.key_cache, cache.value_cache))
+    return [tuple(layer[:2]) for layer in cache]  # Formato legacy (tuplas)
+
+
+def build_cache(layers: List[tuple]):
+    """Construye un DynamicCache a partir de tensores (key, value) por capa."""
+    from transformers import DynamicCache
+
+    if hasattr(DynamicCache, "from_legacy_cache"):
+        return DynamicCache.from_legacy_cache(tuple(layers))
+    return DynamicCache(layers)
+
+
+def _left_pad(tensor: torch.Tensor, length: int, dim: int) -> torch.Tensor:
+    """Rellena con ceros por la izquierda en la dimensión `dim` hasta `length`."""
+    missing = length - tensor.shape[dim]
+    if missing <= 0:
+        return tensor
+    shape = list(tensor.shape)
+    shape[dim] = missing
+    return torch.cat([tensor.new_zeros(shape), tensor], dim=dim)
+
+
+@dataclass
+class GenerationRequest:
+    prompt_ids: List[int]
+    max_new_tokens: int
+    temperature: float
+    top_p: float
+    do_sample: bool
+    future: asyncio.Future
+    loop: asyncio.AbstractEventLoop
+    generated: List[int] = field(default_factory=list)
+    submitted_at: float = field(default_factory=time.monotonic)
+    prefix_len: int = 0  # Tokens iniciales de `prompt_ids` que se pueden servir del cache de prefijos
+    prefix_key: Optional[str] = None
+    prefix_owner: Optional[str] = None
+    streamer: Optional[AsyncTextStreamer] = None  # Recibe cada token si la solicitud es en streaming
+
+    @property
+    def cancelled(self) -> bool:
+        return self.future.done()
+
+
+class ContinuousBatchScheduler:
+    """
+    Planificador de inferencia con batching continuo para modelos causales.
+
+    Un hilo dedicado mantiene un lote activo con su KV cache. En cada paso
+    de decodificación (frontera de token) se admiten solicitudes nuevas
+    (prefill con padding por la izquierda y fusión en el cache del lote) y
+    se retiran las secuencias que terminaron por EOS o por su propio
+    `max_new_tokens`. Cada solicitud recibe un future awaitable o, con
+    `submit_stream`, un iterador asíncrono del texto a medida que se genera.
+
+    Si se pasa `prefix` (el system prompt) y hay `prefix_cache`, el prefill
+    parte de los `past_key_values` guardados del prefijo y solo procesa el resto.
+    """
+
+    def __init__(self, model, tokenizer, max_batch_size: int = 8, max_input_tokens: int = 2048,
+                 prefix_cache: Optional[PrefixKVCache] = None, min_prefix_tokens: int = 32):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        self.max_input_tokens = max_input_tokens
+        self.prefix_cache = prefix_cache
+        self.min_prefix_tokens = min_prefix_tokens
+        self.eos_token_ids = self._eos_token_ids()
+        self.pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else min(self.eos_token_ids, default=0)
+
+        self._incoming: "queue.Queue[GenerationRequest]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+        # Estado del lote activo
+        self._active: List[GenerationRequest] = []
+        self._layers: List[tuple] = []
+        self._mask: Optional[torch.Tensor] = None
+        self._last_tokens: Optional[torch.Tensor] = None
+
+        # Métricas
+        self.completed = 0
+        self.tokens_generated = 0
+        self.steps = 0
+        self.batch_size_sum = 0
+        self.busy_seconds = 0.0
+
+    def _eos_token_ids(self) -> Set[int]:
+        eos = getattr(getattr(self.model, "generation_config", None), "eos_token_id", None)
+        if eos is None:
+            eos = self.tokenizer.eos_token_id
+        if eos is None:
+            return set()
+        return set(eos) if isinstance(eos, (list, tuple, set)) else {eos}
+
+    # --- API pública ----------------------------------------------------
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="llm-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    async def submit(self, prompt: str, max_new_tokens: int = 512, temperature: float = 0.7,
+                     top_p: float = 0.9, do_sample: bool = True, prefix: Optional[str] = None,
+                     prefix_owner: Optional[str] = None) -> str:
+        """
+        Encola un prompt y espera su generación.
+        Args:
+            prompt (str): Prompt ya formateado (sin `prefix` si se indica).
+            max_new_tokens (int): Límite de tokens nuevos para esta solicitud.
+            temperature (float): Temperatura de muestreo.
+            top_p (float): Nucleus sampling.
+            do_sample (bool): False para decodificación greedy.
+            prefix (str): Inicio compartido del prompt (system prompt) cuyo KV cache se reutiliza.
+            prefix_owner (str): Usuario dueño del prefijo, para invalidarlo si cambia.
+        Returns:
+            str: Texto generado (sin el prompt).
+        """
+        request = await self._enqueue(prompt, max_new_tokens, temperature, top_p, do_sample, prefix, prefix_owner)
+        return await request.future
+
+    async def submit_stream(self, prompt: str, max_new_tokens: int = 512, temperature: float = 0.7,
+                            top_p: float = 0.9, do_sample: bool = True, prefix: Optional[str] = None,
+                            prefix_owner: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Igual que `submit`, pero entrega el texto generado por fragmentos
+        (palabras completas) en cuanto el lote produce cada token. Si el
+        consumidor deja de iterar, la solicitud se retira del lote.
+        """
+        streamer = AsyncTextStreamer(self.tokenizer, skip_special_tokens=True)
+        request = await self._enqueue(prompt, max_new_tokens, temperature, top_p, do_sample, prefix, prefix_owner,
+                                      streamer=streamer)
+        try:
+            async for text in streamer:
+                yield text
+            await request.future
+        finally:
+            if not request.future.done():
+                request.future.cancel()
+
+    async def _enqueue(self, prompt: str, max_new_tokens: int, temperature: float, top_p: float, do_sample: bool,
+                       prefix: Optional[str], prefix_owner: Optional[str],
+                       streamer: Optional[AsyncTextStreamer] = None) -> GenerationRequest:
+        self.start()
+        loop = asyncio.get_running_loop()
+        if prefix is not None:
+            prompt_ids, prefix_len = await get_inference_executor().run(self._tokenize_parts, prefix, prompt)
+        else:
+            prompt_ids, prefix_len = await get_inference_executor().run(self._tokenize, prompt), 0
+        request = GenerationRequest(
+            prompt_ids=prompt_ids,
+            max_new_tokens=max(1, max_new_tokens),
+            temperature=temperature,
+            top_p=top_p,
+            do_sample=do_sample,
+            future=loop.create_future(),
+            loop=loop,
+            prefix_len=prefix_len,
+            prefix_key=prefix_key(prefix) if prefix_len else None,
+            prefix_owner=prefix_owner,
+            streamer=streamer
+        )
+        self._incoming.put(request)
+        return request
+
+    def _tokenize(self, prompt: str) -> List[int]:
+        return self.tokenizer(prompt, add_special_tokens=True)["input_ids"][: self.max_input_tokens]
+
+    def _tokenize_parts(self, prefix: str, rest: str) -> tuple:
+        """
+        Tokeniza prefijo y resto por separado (siempre igual, haya o no acierto
+        en el cache) y devuelve (ids, longitud del prefijo reutilizable).
+        """
+        prefix_ids = self.tokenizer(prefix, add_special_tokens=True)["input_ids"]
+        rest_ids = self.tokenizer(rest, add_special_tokens=False)["input_ids"]
+        ids = (prefix_ids + rest_ids)[: self.max_input_tokens]
+        usable = (
+            self.prefix_cache is not None
+            and len(prefix_ids) >= self.min_prefix_tokens
+            and len(ids) > len(prefix_ids)  # Debe quedar al menos un token por procesar
+        )
+        return ids, len(prefix_ids) if usable else 0
+
+    @property
+    def idle(self) -> bool:
+        """Sin secuencias en el lote ni solicitudes en cola."""
+        return not self._active and self._incoming.empty()
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self._active),
+            "queued": self._incoming.qsize(),
+            "completed": self.completed,
+            "tokens_generated": self.tokens_generated,
+            "tokens_per_second": self.tokens_generated / self.busy_seconds if self.busy_seconds else 0.0,
+            "avg_batch_size": self.batch_size_sum / self.steps if self.steps else 0.0,
+        }
+
+    # --- Bucle del hilo -------------------------------------------------
+    def _run(self):
+        while not self._stopped.is_set():
+            new_requests = self._admit()
+            if not new_requests and not self._active:
+                continue
+            started = time.monotonic()
+            try:
+                with torch.inference_mode():
+                    if new_requests:
+                        self._prefill(new_requests)
+                    if self._active:
+                        self._decode_step()
+            except Exception as e:
+                logger.error(f"Error en el planificador de inferencia: {str(e)}", exc_info=True)
+                for request in self._active + new_requests:
+                    self._finish(request, error=e)
+                self._reset_batch()
+            finally:
+                self.busy_seconds += time.monotonic() - started
+
+    def _admit(self) -> List[GenerationRequest]:
+        """Toma solicitudes nuevas sin superar `max_batch_size` (bloquea si no hay trabajo)."""
+        new_requests = []
+        if not self._active:
+            try:
+                new_requests.append(self._incoming.get(timeout=0.1))
+            except queue.Empty:
+                return []
+        while len(self._active) + len(new_requests) < self.max_batch_size:
+            try:
+                new_requests.append(self._incoming.get_nowait())
+            except queue.Empty:
+                break
+        return [request for request in new_requests if not request.cancelled]
+
+    def _prefill(self, requests: List[GenerationRequest]):
+        """Prefill de las solicitudes nuevas: las que tienen prefijo reutilizable parten de su KV cache."""
+        plain = [request for request in requests if not request.prefix_len]
+        if plain:
+            self._prefill_batch(plain)
+        for request in requests:
+            if request.prefix_len:
+                self._prefill_from_prefix(request)
+        self._collect_finished()
+
+    def _prefill_batch(self, requests: List[GenerationRequest]):
+        """Procesa los prompts nuevos en un lote con padding izquierdo y los fusiona al lote activo."""
+        length = max(len(request.prompt_ids) for request in requests)
+        input_ids = torch.full((len(requests), length), self.pad_token_id, dtype=torch.long)
+        mask = torch.zeros((len(requests), length), dtype=torch.long)
+        for i, request in enumerate(requests):
+            ids = request.prompt_ids
+            input_ids[i, length - len(ids):] = torch.tensor(ids, dtype=torch.long)
+            mask[i, length - len(ids):] = 1
+
+        device = self.model.device
+        outputs = self.model(
+            input_ids=input_ids.to(device),
+            attention_mask=mask.to(device),
+            position_ids=(mask.cumsum(-1) - 1).clamp(min=0).to(device),
+            use_cache=True
+        )
+        next_tokens = self._sample(outputs.logits[:, -1, :], requests)
+        self._merge(requests, cache_layers(outputs.past_key_values), mask.to(device), next_tokens)
+
+    def _prefill_from_prefix(self, request: GenerationRequest):
+        """Prefill de una solicitud reutilizando (o calculando y guardando) el KV cache de su prefijo."""
+        prefix_ids = request.prompt_ids[:request.prefix_len]
+        entry = self.prefix_cache.get(request.prefix_key, request.prefix_owner)
+        if entry is None:
+            layers = compute_prefix_layers(self.model, prefix_ids)
+            entry = self.prefix_cache.put(request.prefix_key, layers, request.prefix_owner)
+
+        device = self.model.device
+        rest = torch.tensor([request.prompt_ids[request.prefix_len:]], dtype=torch.long, device=device)
+        total = len(request.prompt_ids)
+        mask = torch.ones((1, total), dtype=torch.long, device=device)
+        outputs = self.model(
+            input_ids=rest,
+            attention_mask=mask,
+            position_ids=torch.arange(request.prefix_len, total, device=device).unsqueeze(0),
+            past_key_values=build_cache(entry.layers),
+            use_cache=True
+        )
+        next_tokens = self._sample(outputs.logits[:, -1, :], [request])
+        self._merge([request], cache_layers(outputs.past_key_values), mask, next_tokens)
+
+    def _decode_step(self):
+        """Genera un token para cada secuencia activa."""
+        mask = torch.cat([self._mask, self._mask.new_ones((self._mask.shape[0], 1))], dim=-1)
+        outputs = self.model(
+            input_ids=self._last_tokens.unsqueeze(-1),
+            attention_mask=mask,
+            position_ids=self._mask.sum(-1, keepdim=True),
+            past_key_values=build_cache(self._layers),
+            use_cache=True
+        )
+        self._layers = cache_layers(outputs.past_key_values)
+        self._mask = mask
+        self._last_tokens = self._sample(outputs.logits[:, -1, :], self._active)
+        for request, token in zip(self._active, self._last_tokens.tolist()):
+            self._record_token(request, token)
+        self.steps += 1
+        self.batch_size_sum += len(self._active)
+        self._collect_finished()
+
+    def _merge(self, requests: List[GenerationRequest], layers: List[tuple], mask: torch.Tensor,
+               next_tokens: torch.Tensor):
+        """Une el cache de las solicitudes nuevas al del lote activo alineando por la izquierda."""
+        for request, token in zip(requests, next_tokens.tolist()):
+            self._record_token(request, token)
+
+        if not self._active:
+            self._active, self._layers, self._mask, self._last_tokens = list(requests), layers, mask, next_tokens
+            return
+
+        length = max(self._mask.shape[1], mask.shape[1])
+        self._layers = [
+            (
+                torch.cat([_left_pad(k_old, length, 2), _left_pad(k_new, length, 2)], dim=0),
+                torch.cat([_left_pad(v_old, length, 2), _left_pad(v_new, length, 2)], dim=0),
+            )
+            for (k_old, v_old), (k_new, v_new) in zip(self._layers, layers)
+        ]
+        self._mask = torch.cat([_left_pad(self._mask, length, 1), _left_pad(mask, length, 1)], dim=0)
+        self._last_tokens = torch.cat([self._last_tokens, next_tokens])
+        self._active.extend(requests)
+
+    def _record_token(self, request: GenerationRequest, token: int):
+        request.generated.append(token)
+        self.tokens_generated += 1
+        if request.streamer is not None:
+            request.streamer.put(torch.tensor([token]))
+
+    def _collect_finished(self):
+        """Retira del lote las secuencias terminadas o canceladas."""
+        keep = []
+        for i, request in enumerate(self._active):
+            last = request.generated[-1] if request.generated else None
+            if request.cancelled:
+                continue
+            if last in self.eos_token_ids or len(request.generated) >= request.max_new_tokens:
+                self._finish(request)
+                continue
+            keep.append(i)
+
+        if len(keep) == len(self._active):
+            return
+        if not keep:
+            self._reset_batch()
+            return
+
+        index = torch.tensor(keep, device=self._mask.device)
+        self._active = [self._active[i] for i in keep]
+        self._layers = [(k.index_select(0, index), v.index_select(0, index)) for k, v in self._layers]
+        self._mask = self._mask.index_select(0, index)
+        self._last_tokens = self._last_tokens.index_select(0, index)
+
+        # Eliminar columnas de padding que ya no usa ninguna secuencia
+        used = self._mask.any(dim=0).nonzero()
+        start = int(used[0]) if len(used) else 0
+        if start > 0:
+            self._layers = [(k[:, :, start:], v[:, :, start:]) for k, v in self._layers]
+            self._mask = self._mask[:, start:]
+
+    def _sample(self, logits: torch.Tensor, requests: List[GenerationRequest]) -> torch.Tensor:
+        """Muestreo por fila con temperatura y top-p propios de cada solicitud."""
+        logits = logits.float()
+        tokens = logits.argmax(dim=-1)
+        sample_rows = [i for i, request in enumerate(requests) if request.do_sample and request.temperature > 0]
+        if sample_rows:
+            rows = torch.tensor(sample_rows, device=logits.device)
+            temperatures = torch.tensor([requests[i].temperature for i in sample_rows], device=logits.device)
+            top_ps = torch.tensor([requests[i].top_p for i in sample_rows], device=logits.device)
+            probs = torch.softmax(logits[rows] / temperatures.unsqueeze(-1), dim=-1)
+            sorted_probs, sorted_idx = probs.sort(dim=-1, descending=True)
+            # Conservar el menor conjunto de tokens cuya probabilidad acumulada alcanza top_p
+            outside = sorted_probs.cumsum(dim=-1) - sorted_probs > top_ps.unsqueeze(-1)
+            sorted_probs = sorted_probs.masked_fill(outside, 0.0)
+            choice = torch.multinomial(sorted_probs, num_samples=1)
+            tokens[rows] = sorted_idx.gather(-1, choice).squeeze(-1)
+        return tokens
+
+    def _finish(self, request: GenerationRequest, error: Optional[Exception] = None):
+        if request.cancelled:
+            return
+        if error is None:
+            self.completed += 1
+            text = self.tokenizer.decode(request.generated, skip_special_tokens=True)
+            if request.streamer is not None:
+                request.streamer.end()
+            request.loop.call_soon_threadsafe(self._resolve, request.future, text, None)
+        else:
+            if request.streamer is not None:
+                request.streamer.fail(error)
+            request.loop.call_soon_threadsafe(self._resolve, request.future, None, error)
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result, error):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _reset_batch(self):
+        self._active, self._layers, self._mask, self._last_tokens = [], [], None, None
+
+
+def create_scheduler(model, tokenizer, max_batch_size: int, max_input_tokens: int,
+                     prefix_cache: Optional[PrefixKVCache] = None, min_prefix_tokens: int = 32) -> ContinuousBatchScheduler:
+    """Crea el planificador y registra sus métricas."""
+    scheduler = ContinuousBatchScheduler(model, tokenizer, max_batch_size, max_input_tokens,
+                                         prefix_cache=prefix_cache, min_prefix_tokens=min_prefix_tokens)
+    register_metrics("llm_scheduler", scheduler.stats)
+    if prefix_cache is not None:
+        register_metrics("llm_prefix_cache", prefix_cache.stats)
+    return scheduler
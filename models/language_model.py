@@ -1,16 +1,29 @@
-from langgraph.graph import StateGraph, END
-from typing import TypedDict, Optional
+from langgraph.graph import StateGraph, START, END
+from typing import AsyncIterator, List, TypedDict, Optional
+import asyncio
 import operator
-from pinecone import Pinecone, ServerlessSpec
-from transformers import AutoTokenizer, AutoModelForCausalLM
+import threading
+import time
+from transformers import AutoTokenizer, StoppingCriteriaList
 import torch
-from models.user_model import UserDB
-from sentence_transformers import SentenceTransformer
+from models.user_cache import UserCache, get_user_cache
+from models.embedding_model import get_embedding_model
+from models.inference_scheduler import create_scheduler
+from models.llm_loader import load_causal_lm, load_draft_model
+from models.prefix_cache import PrefixKVCache
+from models.streaming import AsyncTextStreamer
+from models.stopping_criteria import DeadlineStoppingCriteria
+from models.generation_budget import GenerationBudgetStats, QueryOutcome, remaining_seconds, token_budget
+from utils.inference_executor import get_inference_executor, get_vector_io_executor
 from datetime import datetime
 import logging
 import os
 from dotenv import load_dotenv
 from config.config import settings
+from vector_db.backends import get_sparse_index, get_vector_index
+from vector_db.hybrid import HybridRetriever
+from utils.metrics import register_metrics
+from repositories.message_repository import MessageRepository
 
 # Configuración de logging
 logger = logging.getLogger(__name__)
@@ -21,54 +34,118 @@ class AgentState(TypedDict):
     input: str
     context: Optional[str]
     system_prompt: Optional[str]
+    history: Optional[List[dict]]  # Turnos previos de la conversación ({"role", "text"})
     response: Optional[str]
     user_id: str
     valid: Optional[bool]
+    deadline: Optional[float]  # time.monotonic() límite para responder
+    attempts: int  # Generaciones realizadas en esta solicitud
+    best_response: Optional[str]  # Mejor candidata hasta ahora (respaldo al agotar el plazo)
+    timed_out: bool  # El último intento agotó el plazo
 
 class EnhancedAIAssistant:
-    def __init__(self):
-        self.user_model = UserDB()  # Mantenemos MongoDB para system prompts
+    INVALID_PHRASES = ("no sé", "no tengo información")
+    LOOKUP_NODES = ("retrieve", "get_prompt", "load_history")
+
+    def __init__(self, user_cache: Optional[UserCache] = None, message_repository: Optional[MessageRepository] = None):
+        self.user_cache = user_cache or get_user_cache()  # System prompts en memoria con invalidación vía Redis
+        self._message_repository = message_repository  # Historial de conversación (se crea en el primer uso)
+        self.budget_stats = GenerationBudgetStats(settings.LLM_RESPONSE_BUDGET_SECONDS)
+        register_metrics("llm_generation", self.budget_stats.stats)
+        self.embedder = get_embedding_model()  # Servicio de embeddings compartido
+        self.index_executor = get_vector_io_executor()  # Consultas al índice (I/O con Pinecone)
+        # Generaciones sin planificador en su propio pool: no dejan sin hilos a los embeddings
+        self.generation_executor = get_inference_executor(
+            "generation", kind="thread", max_workers=settings.GENERATION_EXECUTOR_WORKERS
+        )
         self._setup_vector_db()
         self._setup_llm()
         self._setup_graph()
-        self.embedder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
 
     def _setup_vector_db(self):
-        """Configuración optimizada de Pinecone"""
-        self.pc = Pinecone(api_key=settings.PINECONE_API_KEY)
-        self.index_name = "chatbot"
-        
-        if self.index_name not in self.pc.list_indexes().names():
-            self.pc.create_index(
-                name=self.index_name,
-                dimension=384,  # Dimensión de all-MiniLM-L6-v2
-                metric="cosine",
-                spec=ServerlessSpec(cloud="aws", region="us-west-2")
+        """Índice vectorial (Pinecone o local según settings.VECTOR_BACKEND)"""
+        self.index_name = settings.KNOWLEDGE_INDEX_NAME
+        self.index = get_vector_index(self.index_name, region="us-west-2")
+        # Búsqueda híbrida: BM25 local (códigos, nombres, números) + vectores, fusionados con RRF
+        self.retriever = None
+        if settings.HYBRID_SEARCH_ENABLED:
+            self.retriever = HybridRetriever(
+                self.index,
+                get_sparse_index(self.index_name),
+                self.embedder,
+                self.index_executor,
+                candidates=settings.RETRIEVAL_CANDIDATES,
+                rrf_k=settings.RRF_K
             )
-        self.index = self.pc.Index(self.index_name)
+            register_metrics("hybrid_retrieval", self.retriever.stats)
 
     def _setup_llm(self):
-        """Configuración del modelo sin cuantización y con un modelo más pequeño"""
-        self.tokenizer = AutoTokenizer.from_pretrained("meta-llama/Llama-3.2-3B-Instruct")  # Modelo más pequeño
-        self.model = AutoModelForCausalLM.from_pretrained(
-            "meta-llama/Llama-3.2-3B-Instruct",
-            device_map="cpu",  # Usar CPU en lugar de GPU
-            offload_folder="./offload"
+        """Modelo en CPU con la precisión de settings.LLM_PRECISION (fp32, bf16, int8 o 4bit)"""
+        self.tokenizer = AutoTokenizer.from_pretrained(settings.LLM_MODEL_NAME)
+        self.model = load_causal_lm(
+            settings.LLM_MODEL_NAME,
+            precision=settings.LLM_PRECISION,
+            num_threads=settings.LLM_NUM_THREADS
         )
+        # KV cache de los system prompts: el prefill solo procesa contexto y pregunta
+        self.prefix_cache = None
+        if settings.LLM_PREFIX_CACHE_ENABLED:
+            self.prefix_cache = PrefixKVCache(
+                max_bytes=settings.LLM_PREFIX_CACHE_MAX_MB * 2 ** 20,
+                max_entries=settings.LLM_PREFIX_CACHE_MAX_ENTRIES
+            )
+            self.user_cache.add_listener(self._on_user_cache_invalidation)
+        # Planificador con batching continuo para atender usuarios concurrentes
+        self.scheduler = None
+        if settings.LLM_BATCHING_ENABLED:
+            self.scheduler = create_scheduler(
+                self.model,
+                self.tokenizer,
+                max_batch_size=settings.LLM_MAX_BATCH_SIZE,
+                max_input_tokens=settings.LLM_MAX_INPUT_TOKENS,
+                prefix_cache=self.prefix_cache,
+                min_prefix_tokens=settings.LLM_PREFIX_MIN_TOKENS
+            )
+        # Modelo borrador para decodificación especulativa (mismo tokenizador, mucho más pequeño)
+        self.draft_model = None
+        self._speculation_lock = threading.Lock()
+        self.speculative_requests = 0
+        self.speculative_tokens = 0
+        self.speculative_seconds = 0.0
+        if settings.LLM_DRAFT_MODEL_NAME:
+            self.draft_model = load_draft_model(
+                self.model,
+                settings.LLM_DRAFT_MODEL_NAME,
+                precision=settings.LLM_DRAFT_PRECISION,
+                num_assistant_tokens=settings.LLM_DRAFT_NUM_TOKENS
+            )
+            register_metrics("llm_speculative", self._speculative_stats)
+
+    def _on_user_cache_invalidation(self, key: str):
+        """Al cambiar un system prompt (/set-system-prompt) se descarta su KV cache"""
+        if key in ("*", UserCache.prompt_key("*")):
+            self.prefix_cache.clear()
+        elif key.startswith(UserCache.prompt_key("")):
+            self.prefix_cache.invalidate_owner(key[len(UserCache.prompt_key("")):])
 
     def _setup_graph(self):
-        """Grafo mejorado con manejo de errores"""
+        """
+        Grafo con manejo de errores. Las consultas independientes (contexto,
+        system prompt e historial) son ramas paralelas que se unen antes de
+        generar: la espera previa es la de la más lenta, no la suma.
+        """
         workflow = StateGraph(AgentState)
         
         workflow.add_node("retrieve", self.retrieve_context)
         workflow.add_node("get_prompt", self.get_system_prompt)
+        workflow.add_node("load_history", self.load_history)
         workflow.add_node("generate", self.generate_response)
         workflow.add_node("validate", self.validate_response)
         workflow.add_node("handle_error", self.handle_error)
         
-        workflow.set_entry_point("retrieve")
-        workflow.add_edge("retrieve", "get_prompt")
-        workflow.add_edge("get_prompt", "generate")
+        for branch in self.LOOKUP_NODES:
+            workflow.add_edge(START, branch)
+        workflow.add_edge(list(self.LOOKUP_NODES), "generate")  # Espera a las tres ramas
         workflow.add_edge("generate", "validate")
         
         workflow.add_conditional_edges(
@@ -80,88 +157,244 @@ class EnhancedAIAssistant:
         workflow.add_edge("handle_error", END)
         self.workflow = workflow.compile()
 
+    @property
+    def message_repository(self) -> MessageRepository:
+        if self._message_repository is None:
+            self._message_repository = MessageRepository()
+        return self._message_repository
+
+    # Las ramas paralelas devuelven solo las claves que escriben (actualizaciones parciales)
     async def retrieve_context(self, state: AgentState):
-        """Búsqueda semántica mejorada"""
+        """Búsqueda semántica (híbrida con BM25 si HYBRID_SEARCH_ENABLED)"""
         try:
             query = state["input"]
-            embedding = self.embedder.encode(query).tolist()
-            
-            results = self.index.query(
-                vector=embedding,
-                top_k=3,
-                include_metadata=True,
-                namespace="courses"
-            )
+            if self.retriever is not None:
+                results = await self.retriever.search(
+                    query, top_k=settings.RETRIEVAL_TOP_K, namespace=settings.KNOWLEDGE_NAMESPACE
+                )
+            else:
+                embedding = (await self.embedder.aencode(query)).tolist()
+                results = await self.index_executor.run(
+                    self.index.query,
+                    vector=embedding,
+                    top_k=settings.RETRIEVAL_TOP_K,
+                    include_metadata=True,
+                    namespace=settings.KNOWLEDGE_NAMESPACE
+                )
             
             matches = results.get("matches", [])
             if not matches:
                 logger.warning("No se encontraron resultados para la consulta.")
-                state["context"] = "Sin resultados encontrados"
-            else:
-                state["context"] = "\n".join(
-                    f"- {match['metadata']['content']}" for match in matches
-                )
+                return {"context": "Sin resultados encontrados"}
+            return {"context": "\n".join(f"- {match['metadata']['content']}" for match in matches)}
         except Exception as e:
             logger.error(f"Error en búsqueda: {str(e)}")
-            state["context"] = "Sin resultados encontrados"
-        return state
+            return {"context": "Sin resultados encontrados"}
 
     async def get_system_prompt(self, state: AgentState):
-        """Obtener prompt desde MongoDB"""
+        """Obtener prompt (caché de usuarios) si no llegó resuelto en el estado"""
+        if state.get("system_prompt"):
+            return {}
+        return {"system_prompt": await self.resolve_system_prompt(state["user_id"])}
+
+    async def load_history(self, state: AgentState):
+        """Últimos turnos de la conversación del usuario (MongoDB)"""
+        if settings.LLM_HISTORY_TURNS <= 0:
+            return {"history": []}
         try:
-            user_data = await self.user_model.get_user(state["user_id"])
-            state["system_prompt"] = user_data.get(
-                "custom_prompt",
-                self._default_prompt()
-            )
+            history = await self.message_repository.get_history(state["user_id"], limit=settings.LLM_HISTORY_TURNS)
         except Exception as e:
-            logger.error(f"Error obteniendo prompt: {str(e)}")
-            state["system_prompt"] = self._default_prompt()
+            logger.error(f"Error cargando historial: {str(e)}")
+            history = []
+        return {"history": history}
+
+    async def _lookup(self, state: AgentState) -> AgentState:
+        """Las tres consultas del grafo en paralelo fuera de él (camino de streaming)"""
+        updates = await asyncio.gather(
+            self.retrieve_context(state), self.get_system_prompt(state), self.load_history(state)
+        )
+        for update in updates:
+            state.update(update)
         return state
 
+    async def resolve_system_prompt(self, user_id: str) -> str:
+        """System prompt personalizado del usuario o el prompt por defecto"""
+        try:
+            system_prompt = await self.user_cache.get_system_prompt(user_id)
+            if system_prompt is not None:
+                return system_prompt.instruction
+        except Exception as e:
+            logger.error(f"Error obteniendo prompt: {str(e)}")
+        return self._default_prompt()
+
     async def generate_response(self, state: AgentState):
-        """Generación optimizada de respuestas"""
+        """Generación acotada por el plazo de la solicitud: menos tokens cuanto menos tiempo queda"""
+        state["attempts"] = state.get("attempts", 0) + 1
+        remaining = remaining_seconds(state.get("deadline"))
+        max_new_tokens = self._max_new_tokens(remaining)
+        timed_out = False
         try:
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
             prompt = self._format_prompt(state)
-            inputs = self.tokenizer(
-                prompt,
-                return_tensors="pt",
-                max_length=2048,
-                truncation=True
-            ).to(self.model.device)
-            
-            outputs = self.model.generate(
-                **inputs,
-                max_new_tokens=512,
-                temperature=0.7,
-                top_p=0.9,
-                do_sample=True
-            )
-            
-            state["response"] = self.tokenizer.decode(
-                outputs[0][inputs["input_ids"].shape[1]:], 
-                skip_special_tokens=True
-            )
+            if self._use_speculative():
+                generation = self.generation_executor.run(
+                    self._generate, prompt, max_new_tokens, None, True, state.get("deadline")
+                )
+            elif self.scheduler is not None:
+                prefix = self._prompt_prefix(state)
+                generation = self.scheduler.submit(
+                    prompt[len(prefix):],
+                    max_new_tokens=max_new_tokens,
+                    temperature=0.7,
+                    top_p=0.9,
+                    prefix=prefix,
+                    prefix_owner=state["user_id"]
+                )
+            else:
+                generation = self.generation_executor.run(
+                    self._generate, prompt, max_new_tokens, None, False, state.get("deadline")
+                )
+            # Al vencer el plazo se cancela el future y el planificador retira la secuencia del lote
+            state["response"] = await asyncio.wait_for(generation, timeout=self._timeout(remaining))
+        except asyncio.TimeoutError:
+            timed_out = True
+            logger.warning(f"Plazo de respuesta agotado para {state['user_id']} (intento {state['attempts']})")
+            state["response"] = None
         except Exception as e:
             logger.error(f"Error en generación: {str(e)}")
             state["response"] = None
+        state["timed_out"] = timed_out
+        self.budget_stats.record_attempt(deadline_exceeded=timed_out)
         return state
 
+    def _max_new_tokens(self, remaining: float) -> int:
+        return token_budget(
+            remaining,
+            settings.LLM_RESPONSE_BUDGET_SECONDS,
+            settings.LLM_MAX_NEW_TOKENS,
+            settings.LLM_MIN_NEW_TOKENS
+        )
+
+    @staticmethod
+    def _timeout(remaining: float) -> Optional[float]:
+        return None if remaining == float("inf") else remaining
+
+    def _use_speculative(self) -> bool:
+        """
+        Decodificación especulativa solo para una solicitud a la vez y con el
+        planificador ocioso: con un solo usuario reduce la latencia (la CPU
+        está limitada por ancho de memoria); con carga, el batching rinde más.
+        """
+        if self.draft_model is None or self._speculation_lock.locked():
+            return False
+        return self.scheduler is None or self.scheduler.idle
+
+    def _generate(self, prompt: str, max_new_tokens: int, streamer: Optional[AsyncTextStreamer] = None,
+                  speculative: bool = False, deadline: Optional[float] = None) -> str:
+        """
+        Generación de una sola solicitud con `model.generate` (opcionalmente en
+        streaming). Con `speculative` el modelo borrador propone los tokens y
+        el principal los verifica (si ya hay otra generación especulativa en
+        curso, se genera sin borrador). Con `deadline` la generación se corta
+        al vencer el plazo aunque nadie haya cancelado el hilo.
+        """
+        if speculative and self._speculation_lock.acquire(blocking=False):
+            started = time.monotonic()
+            try:
+                text, tokens = self._run_generate(
+                    prompt, max_new_tokens, streamer, assistant_model=self.draft_model, deadline=deadline
+                )
+            finally:
+                self._speculation_lock.release()
+            self.speculative_requests += 1
+            self.speculative_tokens += tokens
+            self.speculative_seconds += time.monotonic() - started
+            return text
+        return self._run_generate(prompt, max_new_tokens, streamer, deadline=deadline)[0]
+
+    def _run_generate(self, prompt: str, max_new_tokens: int, streamer: Optional[AsyncTextStreamer] = None,
+                      assistant_model=None, deadline: Optional[float] = None) -> tuple:
+        inputs = self.tokenizer(
+            prompt,
+            return_tensors="pt",
+            max_length=settings.LLM_MAX_INPUT_TOKENS,
+            truncation=True
+        ).to(self.model.device)
+        
+        outputs = self.model.generate(
+            **inputs,
+            max_new_tokens=max_new_tokens,
+            temperature=0.7,
+            top_p=0.9,
+            do_sample=True,
+            streamer=streamer,
+            assistant_model=assistant_model,
+            stopping_criteria=StoppingCriteriaList([DeadlineStoppingCriteria(deadline)]) if deadline is not None else None
+        )
+        
+        generated = outputs[0][inputs["input_ids"].shape[1]:]
+        return self.tokenizer.decode(generated, skip_special_tokens=True), len(generated)
+
+    def _speculative_stats(self) -> dict:
+        return {
+            "draft_model": settings.LLM_DRAFT_MODEL_NAME,
+            "active": self._speculation_lock.locked(),
+            "requests": self.speculative_requests,
+            "tokens_generated": self.speculative_tokens,
+            "tokens_per_second": self.speculative_tokens / self.speculative_seconds if self.speculative_seconds else 0.0,
+        }
+
+    async def _stream_generate(self, prompt: str, max_new_tokens: int, speculative: bool = False,
+                               deadline: Optional[float] = None) -> AsyncIterator[str]:
+        """`_generate` en el pool de generación entregando el texto con un streamer"""
+        streamer = AsyncTextStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        task = asyncio.ensure_future(
+            self.generation_executor.run(self._generate, prompt, max_new_tokens, streamer, speculative, deadline)
+        )
+
+        def stop_on_error(done: asyncio.Future):
+            # Si generate falla no llega a llamar a `end`: cortar la iteración con el error
+            if not done.cancelled() and done.exception() is not None:
+                streamer.fail(done.exception())
+
+        task.add_done_callback(stop_on_error)
+        async for text in streamer:
+            yield text
+        await task
+
     async def validate_response(self, state: AgentState):
-        """Validación de calidad de respuesta"""
+        """Validación de calidad de respuesta; si no quedan intentos se usa la mejor obtenida"""
         response = state.get("response", "")
-        invalid_phrases = ["no sé", "no tengo información"]
+        valid = self._is_valid(response)
 
-        valid = (
+        best = state.get("best_response")
+        if response and (not best or self._response_score(response) > self._response_score(best)):
+            best = response
+        validated = {**state, "valid": valid, "best_response": best}
+        if not valid and not self._can_retry(validated):
+            validated["response"] = best
+        return validated
+
+    def _is_valid(self, response: Optional[str]) -> bool:
+        return (
             bool(response) and
             len(response) >= 30 and
-            not any(phrase in response.lower() for phrase in invalid_phrases)
+            not any(phrase in response.lower() for phrase in self.INVALID_PHRASES)
         )
 
-        return {**state, "valid": valid}
+    def _response_score(self, response: str) -> tuple:
+        return (not any(phrase in response.lower() for phrase in self.INVALID_PHRASES), len(response))
+
+    def _can_retry(self, state: AgentState) -> bool:
+        """Otro intento solo si quedan intentos y tiempo para una generación mínima"""
+        return (
+            state.get("attempts", 0) < settings.LLM_MAX_ATTEMPTS
+            and remaining_seconds(state.get("deadline")) >= settings.LLM_MIN_ATTEMPT_SECONDS
+        )
 
     def needs_correction(self, state: AgentState):
-        return "REPEAT" if not state.get("valid") else "END"
+        return "REPEAT" if not state.get("valid") and self._can_retry(state) else "END"
 
     async def handle_error(self, state: AgentState):
         """Manejo centralizado de errores"""
@@ -170,11 +403,19 @@ class EnhancedAIAssistant:
             "status": "error"
         }
 
-    def _format_prompt(self, state: AgentState):
+    def _prompt_prefix(self, state: AgentState):
+        """Parte del prompt común a todos los mensajes de un usuario (su KV cache se reutiliza)"""
         return f"""<|system|>
 {state['system_prompt']}
-Contexto: {state.get('context', '')}
-<|user|>
+"""
+
+    def _format_prompt(self, state: AgentState):
+        # El historial va después del prefijo: no invalida el KV cache del system prompt
+        history = "".join(
+            f"<|{turn['role']}|>\n{turn['text']}\n" for turn in state.get("history") or [] if turn.get("text")
+        )
+        return self._prompt_prefix(state) + f"""Contexto: {state.get('context', '')}
+{history}<|user|>
 {state['input']}
 <|assistant|>"""
 
@@ -188,24 +429,100 @@ Contexto: {state.get('context', '')}
             "timestamp": datetime.now().isoformat()
         }
 
-    async def process_query(self, user_input: str, user_id: str):
-        """Flujo principal mejorado"""
+    async def process_query(self, user_input: str, user_id: str, system_prompt: Optional[str] = None,
+                            outcome: Optional[QueryOutcome] = None):
+        """
+        Flujo principal mejorado (`system_prompt` evita volver a resolverlo si ya se conoce).
+        Si se pasa `outcome`, se rellena con la respuesta y si es válida y
+        llegó a tiempo (las respuestas de respaldo no se deben cachear).
+        """
+        started = time.monotonic()
         try:
-            initial_state = AgentState(
-                input=user_input,
-                user_id=user_id,
-                context="",
-                system_prompt=self._default_prompt(),
-                response="",
-                valid=False
-            )
-            
-            async for state in self.workflow.astream(initial_state):
-                if END in state:
-                    return state[END].get("response", "No se pudo generar respuesta")
+            initial_state = self._initial_state(user_input, user_id, system_prompt)
             
-            return "No se pudo generar respuesta"
+            final_state = await self.workflow.ainvoke(initial_state)
+            self.budget_stats.record_request(
+                final_state.get("attempts", 0),
+                time.monotonic() - started,
+                fallback=not final_state.get("valid")
+            )
+            if outcome is not None:
+                outcome.response = final_state.get("response") or ""
+                outcome.valid = bool(final_state.get("valid"))
+                outcome.timed_out = bool(final_state.get("timed_out"))
+            return final_state.get("response") or "No se pudo generar respuesta"
         
         except Exception as e:
             logger.error(f"Error en proceso: {str(e)}")
-            return self._fallback_response()
\ No newline at end of file
+            return self._fallback_response()
+
+    async def stream_query(self, user_input: str, user_id: str, system_prompt: Optional[str] = None,
+                           outcome: Optional[QueryOutcome] = None) -> AsyncIterator[str]:
+        """
+        Como `process_query`, pero entrega la respuesta por fragmentos a medida
+        que se genera. No hay reintento (lo ya entregado puede estar enviado al
+        usuario), pero al terminar el stream `outcome` indica si el texto
+        completo pasa la validación y si se cortó por el plazo.
+        """
+        started = time.monotonic()
+        state = self._initial_state(user_input, user_id, system_prompt)
+        state = await self._lookup(state)
+        prompt = self._format_prompt(state)
+        remaining = remaining_seconds(state["deadline"])
+        max_new_tokens = self._max_new_tokens(remaining)
+        if self._use_speculative():
+            stream = self._stream_generate(prompt, max_new_tokens, speculative=True, deadline=state["deadline"])
+        elif self.scheduler is not None:
+            prefix = self._prompt_prefix(state)
+            stream = self.scheduler.submit_stream(
+                prompt[len(prefix):],
+                max_new_tokens=max_new_tokens,
+                temperature=0.7,
+                top_p=0.9,
+                prefix=prefix,
+                prefix_owner=user_id
+            )
+        else:
+            stream = self._stream_generate(prompt, max_new_tokens, deadline=state["deadline"])
+
+        # Al vencer el plazo se corta el stream: lo ya entregado es la respuesta
+        timed_out = False
+        chunks = []
+        try:
+            while True:
+                try:
+                    text = await asyncio.wait_for(
+                        stream.__anext__(), timeout=self._timeout(remaining_seconds(state["deadline"]))
+                    )
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    timed_out = True
+                    logger.warning(f"Plazo de respuesta agotado para {user_id} durante el streaming")
+                    break
+                chunks.append(text)
+                yield text
+        finally:
+            await stream.aclose()
+            response = "".join(chunks)
+            valid = not timed_out and self._is_valid(response)
+            if outcome is not None:
+                outcome.response, outcome.valid, outcome.timed_out = response, valid, timed_out
+            self.budget_stats.record_attempt(deadline_exceeded=timed_out)
+            self.budget_stats.record_request(1, time.monotonic() - started, fallback=not valid)
+
+    def _initial_state(self, user_input: str, user_id: str, system_prompt: Optional[str]) -> AgentState:
+        budget = settings.LLM_RESPONSE_BUDGET_SECONDS
+        return AgentState(
+            input=user_input,
+            user_id=user_id,
+            context="",
+            system_prompt=system_prompt,
+            history=None,
+            response="",
+            valid=False,
+            deadline=time.monotonic() + budget if budget > 0 else None,
+            attempts=0,
+            best_response=None,
+            timed_out=False
+        )
\ No newline at end of file
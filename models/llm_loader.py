@@ -0,0 +1,95 @@
+import logging
+from typing import Optional
+
+import torch
+from transformers import AutoModelForCausalLM
+
+logger = logging.getLogger(__name__)
+
+PRECISION_MODES = ("fp32", "bf16", "int8", "4bit")
+
+
+def _quantize_int8(model):
+    """Cuantización dinámica int8 de las capas lineales (pesos int8, activaciones cuantizadas al vuelo)."""
+    quantize_dynamic = getattr(torch.ao.quantization, "quantize_dynamic", None) or torch.quantization.quantize_dynamic
+    return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _four_bit_config():
+    try:
+        import bitsandbytes  # noqa: F401
+        from transformers import BitsAndBytesConfig
+    except ImportError as e:
+        raise ImportError(
+            "El modo de precisión '4bit' requiere bitsandbytes con soporte de CPU (pip install bitsandbytes)"
+        ) from e
+    return BitsAndBytesConfig(
+        load_in_4bit=True,
+        bnb_4bit_quant_type="nf4",
+        bnb_4bit_compute_dtype=torch.bfloat16,
+        bnb_4bit_use_double_quant=True
+    )
+
+
+def load_causal_lm(model_name: str, precision: str = "fp32", num_threads: Optional[int] = None):
+    """
+    Carga el modelo de lenguaje en CPU con la precisión indicada.
+
+    - fp32: pesos completos (referencia).
+    - bf16: pesos y activaciones en bfloat16 (mitad de memoria).
+    - int8: cuantización dinámica int8 de las capas lineales con PyTorch.
+    - 4bit: pesos NF4 con bitsandbytes, cómputo en bfloat16.
+
+    Args:
+        model_name (str): Nombre o ruta del modelo.
+        precision (str): Uno de PRECISION_MODES.
+        num_threads (int): Hilos de PyTorch para la inferencia (None = valor por defecto).
+    Returns:
+        PreTrainedModel: Modelo en modo evaluación.
+    """
+    if precision not in PRECISION_MODES:
+        raise ValueError(f"Modo de precisión no soportado: {precision}. Usa uno de {', '.join(PRECISION_MODES)}")
+    if num_threads:
+        torch.set_num_threads(num_threads)
+
+    kwargs = {"low_cpu_mem_usage": True}  # Sin device_map: todo queda en CPU
+    if precision == "bf16":
+        kwargs["torch_dtype"] = torch.bfloat16
+    elif precision == "4bit":
+        kwargs["quantization_config"] = _four_bit_config()
+    else:
+        kwargs["torch_dtype"] = torch.float32
+
+    logger.info(f"Cargando {model_name} en modo {precision}")
+    model = AutoModelForCausalLM.from_pretrained(model_name, **kwargs)
+    if precision == "int8":
+        model = _quantize_int8(model)
+    return model.eval()
+
+
+def load_draft_model(target, draft_name: str, precision: str = "fp32", num_assistant_tokens: int = 5):
+    """
+    Carga el modelo borrador para decodificación especulativa (assisted
+    generation): propone `num_assistant_tokens` tokens por paso y el modelo
+    principal los verifica en una sola pasada. Debe compartir tokenizador con
+    el principal (p. ej. Llama-3.2-1B para Llama-3.2-3B).
+
+    Args:
+        target (PreTrainedModel): Modelo principal ya cargado.
+        draft_name (str): Nombre o ruta del modelo borrador.
+        precision (str): Uno de PRECISION_MODES.
+        num_assistant_tokens (int): Tokens propuestos por paso (se ajusta solo según la tasa de aceptación).
+    Returns:
+        PreTrainedModel: Modelo borrador en modo evaluación.
+    Raises:
+        ValueError: Si el vocabulario no coincide con el del modelo principal.
+    """
+    draft = load_causal_lm(draft_name, precision=precision)
+    if draft.config.vocab_size != target.config.vocab_size:
+        raise ValueError(
+            f"El modelo borrador {draft_name} no comparte vocabulario con el principal "
+            f"({draft.config.vocab_size} != {target.config.vocab_size})"
+        )
+    draft.generation_config.num_assistant_tokens = num_assistant_tokens
+    draft.generation_config.num_assistant_tokens_schedule = "heuristic"
+    return draft
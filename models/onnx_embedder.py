@@ -0,0 +1,137 @@
+import logging
+import os
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _model_dir(export_dir: str, model_name: str) -> str:
+    return os.path.join(export_dir, model_name.strip("/").replace("/", "__"))
+
+
+def export_onnx(model_name: str, output_path: str, opset: int = 17):
+    """
+    Exporta el transformer (salida `last_hidden_state`) a ONNX con ejes dinámicos
+    de lote y secuencia. El pooling y la normalización se hacen en NumPy.
+    """
+    import torch
+    from transformers import AutoModel
+
+    model = AutoModel.from_pretrained(model_name).eval()
+    input_names = ["input_ids", "attention_mask"]
+    if getattr(model.config, "type_vocab_size", 0):
+        input_names.append("token_type_ids")
+
+    class _Encoder(torch.nn.Module):
+        def __init__(self, base):
+            super().__init__()
+            self.base = base
+
+        def forward(self, *inputs):
+            return self.base(**dict(zip(input_names, inputs))).last_hidden_state
+
+    dummy = tuple(torch.ones((2, 8), dtype=torch.long) for _ in input_names)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    export_kwargs = {}
+    if "dynamo" in torch.onnx.export.__code__.co_varnames:
+        export_kwargs["dynamo"] = False  # Exportador TorchScript: no requiere onnxscript
+    with torch.no_grad():
+        torch.onnx.export(
+            _Encoder(model),
+            dummy,
+            output_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            **export_kwargs
+        )
+    logger.info(f"Modelo {model_name} exportado a {output_path}")
+
+
+def quantize_onnx(input_path: str, output_path: str):
+    """Cuantización dinámica int8 de los pesos con ONNX Runtime."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(input_path, output_path, weight_type=QuantType.QInt8)
+    logger.info(f"Modelo ONNX cuantizado a int8 en {output_path}")
+
+
+class OnnxSentenceEncoder:
+    """
+    Codificador de frases sobre ONNX Runtime (CPU) compatible con la llamada
+    `encode` de SentenceTransformer que usa EmbeddingModel.
+
+    La primera vez exporta el modelo a `export_dir` (y lo cuantiza a int8 si
+    `quantize`); después solo carga el .onnx. El pooling es la media de los
+    tokens no enmascarados, como en all-MiniLM-L6-v2.
+    """
+
+    def __init__(self, model_name: str, export_dir: str = "data/models/onnx", quantize: bool = False,
+                 num_threads: Optional[int] = None, max_seq_length: int = 256):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("EMBEDDING_BACKEND=onnx requiere onnxruntime (pip install onnxruntime onnx)") from e
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.max_seq_length = max_seq_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+        model_dir = _model_dir(export_dir, model_name)
+        path = os.path.join(model_dir, "model.onnx")
+        if not os.path.exists(path):
+            export_onnx(model_name, path)
+        if quantize:
+            quantized_path = os.path.join(model_dir, "model.int8.onnx")
+            if not os.path.exists(quantized_path):
+                quantize_onnx(path, quantized_path)
+            path = quantized_path
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self._input_names = [i.name for i in self.session.get_inputs()]
+        self.path = path
+
+    def encode(self, texts: List[str], batch_size: int = 32, show_progress_bar: bool = False,
+               convert_to_numpy: bool = True, normalize_embeddings: bool = True) -> np.ndarray:
+        """
+        Args:
+            texts (list): Textos a codificar.
+            batch_size (int): Textos por ejecución del modelo.
+            normalize_embeddings (bool): Normaliza a norma 1 (coseno = producto punto).
+        Returns:
+            np.ndarray: Matriz (n, dim) float32.
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            encoded = self.tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np"
+            )
+            feeds = {name: encoded[name].astype(np.int64) for name in self._input_names if name in encoded}
+            if "token_type_ids" in self._input_names and "token_type_ids" not in feeds:
+                feeds["token_type_ids"] = np.zeros_like(feeds["input_ids"])
+            hidden = self.session.run(None, feeds)[0]
+
+            mask = feeds["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if normalize_embeddings:
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            outputs.append(pooled.astype(np.float32, copy=False))
+        return np.concatenate(outputs) if outputs else np.empty((0, 0), dtype=np.float32)
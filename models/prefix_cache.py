@@ -0,0 +1,129 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+import torch
+
+
+def prefix_key(prefix: str) -> str:
+    return hashlib.blake2b(prefix.encode("utf-8"), digest_size=16).hexdigest()
+
+
+@dataclass
+class PrefixEntry:
+    layers: List[tuple]  # (key, value) por capa, lote 1: (1, heads, tokens, head_dim)
+    length: int
+    nbytes: int
+
+
+def layers_nbytes(layers: List[tuple]) -> int:
+    return sum(k.numel() * k.element_size() + v.numel() * v.element_size() for k, v in layers)
+
+
+class PrefixKVCache:
+    """
+    LRU de `past_key_values` de prefijos de prompt (system prompts) con límite
+    de memoria. Los tensores guardados nunca se modifican: el cache dinámico
+    de transformers concatena en tensores nuevos al decodificar.
+
+    Cada entrada recuerda qué usuarios la usaron para poder descartarla cuando
+    uno de ellos cambia su system prompt. Es seguro entre hilos (lo lee el
+    hilo del planificador y lo invalida el event loop).
+    """
+
+    def __init__(self, max_bytes: int = 512 * 2 ** 20, max_entries: int = 64):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, PrefixEntry]" = OrderedDict()
+        self._owners: Dict[str, Set[str]] = {}
+        self._owner_keys: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.tokens_saved = 0
+
+    def get(self, key: str, owner: Optional[str] = None) -> Optional[PrefixEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._track_owner(key, owner)
+            self.hits += 1
+            self.tokens_saved += entry.length
+            return entry
+
+    def put(self, key: str, layers: List[tuple], owner: Optional[str] = None) -> PrefixEntry:
+        layers = [(k.detach(), v.detach()) for k, v in layers]
+        entry = PrefixEntry(layers=layers, length=int(layers[0][0].shape[2]) if layers else 0,
+                            nbytes=layers_nbytes(layers))
+        with self._lock:
+            if entry.nbytes > self.max_bytes:
+                return entry  # No cabe: se usa para esta solicitud sin guardarse
+            self._remove(key)
+            self._entries[key] = entry
+            self.bytes += entry.nbytes
+            self._track_owner(key, owner)
+            while self.bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return entry
+
+    def invalidate_owner(self, owner: str):
+        """Descarta el prefijo que usaba `owner` (p. ej. tras /set-system-prompt)."""
+        with self._lock:
+            key = self._owner_keys.pop(owner, None)
+            if key is not None:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._owners.clear()
+            self._owner_keys.clear()
+            self.bytes = 0
+
+    def _track_owner(self, key: str, owner: Optional[str]):
+        if owner is None:
+            return
+        previous = self._owner_keys.get(owner)
+        if previous is not None and previous != key:
+            self._owners.get(previous, set()).discard(owner)
+        self._owner_keys[owner] = key
+        self._owners.setdefault(key, set()).add(owner)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.nbytes
+        for owner in self._owners.pop(key, set()):
+            if self._owner_keys.get(owner) == key:
+                del self._owner_keys[owner]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "prefill_tokens_saved": self.tokens_saved,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+def compute_prefix_layers(model, prefix_ids: List[int]) -> List[tuple]:
+    """Prefill de un prefijo (lote 1) y sus tensores (key, value) por capa."""
+    from models.inference_scheduler import cache_layers
+
+    input_ids = torch.tensor([prefix_ids], dtype=torch.long, device=model.device)
+    with torch.inference_mode():
+        outputs = model(input_ids=input_ids, use_cache=True)
+    return cache_layers(outputs.past_key_values)
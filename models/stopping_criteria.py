@@ -0,0 +1,19 @@
+import time
+
+import torch
+from transformers import StoppingCriteria
+
+
+class DeadlineStoppingCriteria(StoppingCriteria):
+    """
+    Corta `model.generate` al vencer `deadline` (reloj monotónico). Cancelar el
+    future no detiene el hilo que genera: sin este criterio seguiría ocupando
+    el pool hasta `max_new_tokens` aunque ya nadie espere la respuesta.
+    """
+
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        expired = time.monotonic() >= self.deadline
+        return torch.full((input_ids.shape[0],), expired, dtype=torch.bool, device=input_ids.device)
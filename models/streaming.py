@@ -0,0 +1,41 @@
+import asyncio
+from typing import Optional
+
+from transformers import TextStreamer
+
+
+class AsyncTextStreamer(TextStreamer):
+    """
+    Equivalente a TextIteratorStreamer para asyncio: el hilo que genera llama a
+    `put`/`end` y el event loop consume el texto con `async for`. Se emiten
+    palabras completas (la heurística de TextStreamer) para no partir tokens
+    multibyte. `fail` corta la iteración con el error de la generación.
+    """
+
+    def __init__(self, tokenizer, loop: Optional[asyncio.AbstractEventLoop] = None, skip_prompt: bool = False,
+                 **decode_kwargs):
+        super().__init__(tokenizer, skip_prompt, **decode_kwargs)
+        self.loop = loop or asyncio.get_running_loop()
+        self.text_queue: asyncio.Queue = asyncio.Queue()
+        self._end = object()
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text:
+            self.loop.call_soon_threadsafe(self.text_queue.put_nowait, text)
+        if stream_end:
+            self.loop.call_soon_threadsafe(self.text_queue.put_nowait, self._end)
+
+    def fail(self, error: BaseException):
+        """Termina el stream con `error` (seguro desde cualquier hilo)."""
+        self.loop.call_soon_threadsafe(self.text_queue.put_nowait, error)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        value = await self.text_queue.get()
+        if value is self._end:
+            raise StopAsyncIteration
+        if isinstance(value, BaseException):
+            raise value
+        return value
@@ -0,0 +1,226 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from redis.asyncio import Redis
+
+from models.model import SystemPromptModel, UserModel
+from models.user_model import UserDB
+from utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "user_cache:invalidate"
+
+
+class UserCache:
+    """
+    Caché por worker de system prompts y usuarios con TTL.
+
+    - Un acierto se sirve desde memoria sin tocar MongoDB.
+    - Una entrada vencida se sigue sirviendo mientras se refresca en segundo
+      plano, así la consulta a Mongo no bloquea el mensaje.
+    - Las escrituras publican la clave en Redis (pub/sub) y todos los workers
+      suscritos descartan su copia.
+    """
+
+    def __init__(self, user_db: Optional[UserDB] = None, ttl: float = 300, max_entries: int = 10000,
+                 channel: str = INVALIDATION_CHANNEL):
+        self._user_db = user_db
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.channel = channel
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Future] = {}
+        # Generación por clave con consultas en curso: invalidar la incrementa y
+        # la consulta que empezó antes descarta su resultado en vez de cachearlo
+        self._generations: Dict[str, int] = {}
+        self._fetching: Dict[str, int] = {}
+        self._listener: Optional[asyncio.Task] = None
+        self._callbacks: List[Callable[[str], None]] = []
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def user_db(self) -> UserDB:
+        if self._user_db is None:
+            self._user_db = UserDB()
+        return self._user_db
+
+    @staticmethod
+    def prompt_key(user_id: str) -> str:
+        return f"system_prompt:{user_id}"
+
+    @staticmethod
+    def user_key(user_id: str) -> str:
+        return f"user:{user_id}"
+
+    async def get_system_prompt(self, user_id: str) -> Optional[SystemPromptModel]:
+        """System prompt del usuario (None si no tiene; también se cachea)."""
+        return await self._get(self.prompt_key(user_id), lambda: self.user_db.get_system_prompt(user_id))
+
+    async def get_user(self, user_id: str) -> UserModel:
+        """
+        Usuario por ID.
+        Raises:
+            ValueError: Si el usuario no existe (los fallos no se cachean).
+        """
+        return await self._get(self.user_key(user_id), lambda: self.user_db.get_user(user_id))
+
+    async def _get(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            self._entries.move_to_end(key)
+            if expires_at > time.monotonic():
+                self.hits += 1
+                return value
+            self.stale_hits += 1
+            if key not in self._loading:
+                self._load(key, loader).add_done_callback(self._consume_error)
+            return value
+
+        self.misses += 1
+        return await self._load(key, loader)
+
+    def _load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        # Las peticiones concurrentes de la misma clave comparten una sola consulta
+        future = self._loading.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(key, loader))
+            self._loading[key] = future
+        return asyncio.shield(future)
+
+    async def _fetch(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        task = asyncio.current_task()
+        generation = self._generations.get(key, 0)
+        self._fetching[key] = self._fetching.get(key, 0) + 1
+        try:
+            value = await loader()
+            # Si se invalidó durante la consulta, el valor puede ser anterior a la escritura
+            if self._generations.get(key, 0) == generation:
+                self._store(key, value)
+            return value
+        finally:
+            if self._loading.get(key) is task:
+                del self._loading[key]
+            self._fetching[key] -= 1
+            if not self._fetching[key]:
+                del self._fetching[key]
+                self._generations.pop(key, None)
+
+    def _discard_loads(self, matches: Callable[[str], bool]):
+        """Marca como obsoletas las consultas en curso; las siguientes peticiones consultan de nuevo."""
+        for key in [k for k in self._fetching if matches(k)]:
+            self._generations[key] = self._generations.get(key, 0) + 1
+        for key in [k for k in self._loading if matches(k)]:
+            del self._loading[key]
+
+    @staticmethod
+    def _consume_error(future: asyncio.Future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Error refrescando la caché de usuarios: {str(future.exception())}")
+
+    def _store(self, key: str, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def add_listener(self, callback: Callable[[str], None]):
+        """
+        Registra una función que recibe cada clave invalidada (p. ej. para
+        descartar cachés derivadas); `*` significa que se descartó todo.
+        """
+        self._callbacks.append(callback)
+
+    def invalidate(self, key: str):
+        """Descarta una clave local; `prefix:*` descarta todas las claves del prefijo y `*` todas."""
+        self.invalidations += 1
+        self._drop(key)
+
+    def _drop(self, key: str):
+        for callback in self._callbacks:
+            try:
+                callback(key)
+            except Exception as e:
+                logger.error(f"Error notificando la invalidación de {key}: {str(e)}")
+        if key.endswith("*"):
+            prefix = key[:-1]
+            for cached in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[cached]
+            self._discard_loads(lambda k: k.startswith(prefix))
+        else:
+            self._entries.pop(key, None)
+            self._discard_loads(lambda k: k == key)
+
+    async def publish_invalidation(self, redis: Redis, key: str):
+        """Invalida la clave en este worker y la anuncia al resto."""
+        self.invalidate(key)
+        try:
+            await redis.publish(self.channel, key)
+        except Exception as e:
+            logger.error(f"No se pudo publicar la invalidación de {key}: {str(e)}")
+
+    async def start(self, redis: Redis):
+        """Suscribe el worker al canal de invalidaciones (evento de inicio)."""
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen(redis))
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _listen(self, redis: Redis):
+        while True:
+            pubsub = redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                # Lo escrito mientras no había suscripción puede estar desactualizado:
+                # se descarta todo, también en las cachés derivadas
+                self._drop("*")
+                async for message in pubsub.listen():
+                    if message and message.get("type") == "message":
+                        self.invalidate(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Suscripción de invalidaciones interrumpida: {str(e)}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": (self.hits + self.stale_hits) / total if total else 0.0,
+            "subscribed": self._listener is not None and not self._listener.done(),
+        }
+
+
+_user_cache: Optional[UserCache] = None
+
+
+def get_user_cache() -> UserCache:
+    """Caché de usuarios compartida por el worker, configurada con settings."""
+    global _user_cache
+    if _user_cache is None:
+        from config.config import settings
+
+        _user_cache = UserCache(ttl=settings.USER_CACHE_TTL, max_entries=settings.USER_CACHE_MAX_ENTRIES)
+        register_metrics("user_cache", _user_cache.stats)
+    return _user_cache
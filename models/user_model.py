@@ -1,24 +1,28 @@
-from pydantic import BaseModel, Field, EmailStr
-from pymongo import MongoClient
-from bson import SON
-from datetime import datetime
-import os
-from models.model import UserModel 
+from typing import Optional
+from models.model import UserModel
 from models.model import SystemPromptModel
 from config.database import db
-from motor.motor_asyncio import AsyncIOMotorClient 
-from config.config import settings
+from motor.motor_asyncio import AsyncIOMotorDatabase
 
 
 
 class UserDB:
-    def __init__(self):
-        self.client = AsyncIOMotorClient(settings.MONGODB_URL)
-        self.db = self.client[settings.DATABASE_NAME]
-        self.collection = self.db["users"]
-        self.collection = self.db["system_promt"]
+    def __init__(self, database: Optional[AsyncIOMotorDatabase] = None):
+        """
+        Acceso a usuarios y system prompts sobre el cliente de MongoDB compartido.
+        Args:
+            database (AsyncIOMotorDatabase): Base de datos inyectada; por defecto la de `config.database.db`.
+        """
+        self.db = database if database is not None else db.get_database()
+        self.users = self.db["users"]
+        self.system_prompts = self.db["system_promt"]
 
-    def save_user(self, user_data: dict):
+    async def ensure_indexes(self):
+        """Índices de las búsquedas por email y por user_id (idempotente; se llama al arrancar)."""
+        await self.users.create_index("email", name="email")
+        await self.system_prompts.create_index("user_id", name="user_id")
+
+    async def save_user(self, user_data: dict):
         """
         Guarda o actualiza un usuario en MongoDB.
         Args:
@@ -30,7 +34,7 @@ class UserDB:
         user = UserModel(**user_data)
 
         # Guardar en MongoDB
-        self.collection.update_one(
+        await self.users.update_one(
             {"email": user.email},
             {
                 "$set": user.dict(exclude={"created_at"}),
@@ -40,7 +44,7 @@ class UserDB:
         )
         return {"message": "Usuario guardado exitosamente."}
 
-    def get_user(self, user_id: str) -> UserModel:
+    async def get_user(self, user_id: str) -> UserModel:
         """
         Recupera un usuario desde MongoDB.
         Args:
@@ -48,54 +52,48 @@ class UserDB:
         Returns:
             UserModel: Datos del usuario.
         """
-        user_data = self.collection.find_one({"_id": user_id})
+        user_data = await self.users.find_one({"_id": user_id})
         if user_data:
             return UserModel(**user_data)
         raise ValueError(f"No se encontró ningún usuario con el ID: {user_id}")
 
-    def save_system_prompt(self,  system_promt_data: dict):
+    async def save_system_prompt(self,  system_promt_data: dict):
         """
         Guarda o actualiza el system prompt del usuario en MongoDB.
         Args:
-            user_id (str): ID del usuario (como string).
-            instruction (str): Instrucción del system prompt.
+            system_promt_data (dict): Datos del system prompt (user_id e instruction).
         Returns:
             dict: Confirmación de la operación.
         """
- 
         # Validar el modelo Pydantic
-        
         system_prompt = SystemPromptModel(**system_promt_data)
-        
-      
+
         # Guardar en MongoDB
-        self.collection.update_one(
-             {"user_id": system_prompt.user_id}, 
+        await self.system_prompts.update_one(
+            {"user_id": system_prompt.user_id},
             {
-                
-                    "$set": system_prompt.dict(exclude={"created_at"}),
+                "$set": system_prompt.dict(exclude={"created_at"}),
                 "$setOnInsert": {"created_at": system_prompt.created_at}
-                },
-                upsert=True
-                        
+            },
+            upsert=True
         )
         return {"message": "System prompt guardado exitosamente."}
 
 
-    async def get_system_prompt(self, user_id: str) -> SystemPromptModel:
+    async def get_system_prompt(self, user_id: str) -> Optional[SystemPromptModel]:
         """
         Recupera el system prompt del usuario desde MongoDB.
-        
+
         Args:
             user_id (str): ID del usuario.
-        
+
         Returns:
             SystemPromptModel: System prompt del usuario si existe, de lo contrario, None.
         """
-        system_prompt_data = await self.collection.find_one({"user_id": user_id})
-        
+        system_prompt_data = await self.system_prompts.find_one({"user_id": user_id})
+
         if system_prompt_data:
-            
+
             return SystemPromptModel(**system_prompt_data)
         else:
             print("Por favor, crea tu System Prompt.")
@@ -1,14 +1,17 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from models.user_model import UserDB, UserModel , SystemPromptModel
+from redis.asyncio import Redis
+from api.dependencies import get_user_db, get_redis
+from models.user_cache import UserCache, get_user_cache
 
 
 # Crear un solo objeto router para todas las rutas
 router = APIRouter()
-user_db = UserDB()
 
 # Endpoint para guardar un usuario
 @router.post("/create-user", tags=["User"])
-async def create_user(user: UserModel):
+async def create_user(user: UserModel, user_db: UserDB = Depends(get_user_db),
+                      user_cache: UserCache = Depends(get_user_cache), redis: Redis = Depends(get_redis)):
     """
     Guarda un usuario en MongoDB.
     Args:
@@ -18,14 +21,16 @@ async def create_user(user: UserModel):
     """
     try:
         
-        result = user_db.save_user(user.dict())
+        result = await user_db.save_user(user.dict())
+        # La caché va por ID y el guardado por email: se descartan todos los usuarios cacheados
+        await user_cache.publish_invalidation(redis, user_cache.user_key("*"))
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al guardar el usuario: {str(e)}")
 
 # Endpoint para recuperar un usuario
 @router.get("/get-user/{user_id}", tags=["User"])
-async def get_user(user_id: str):
+async def get_user(user_id: str, user_cache: UserCache = Depends(get_user_cache)):
     """
     Recupera un usuario desde MongoDB.
     Args:
@@ -34,14 +39,15 @@ async def get_user(user_id: str):
         dict: Datos del usuario.
     """
     try:
-        user = user_db.get_user(user_id)
+        user = await user_cache.get_user(user_id)
         return user.dict()
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Usuario no encontrado: {str(e)}")
 
 # Endpoint para guardar el system prompt del usuario
 @router.post("/set-system-prompt", tags=["System Prompt"])
-async def set_system_prompt( system_promt:SystemPromptModel):
+async def set_system_prompt( system_promt:SystemPromptModel, user_db: UserDB = Depends(get_user_db),
+                             user_cache: UserCache = Depends(get_user_cache), redis: Redis = Depends(get_redis)):
     """
     Guarda el system prompt del usuario en MongoDB.
     Args:
@@ -51,14 +57,16 @@ async def set_system_prompt( system_promt:SystemPromptModel):
         dict: Confirmación de la operación.
     """
     try:
-        result = user_db.save_system_prompt(system_promt.dict())
+        result = await user_db.save_system_prompt(system_promt.dict())
+        # Todos los workers descartan el prompt anterior
+        await user_cache.publish_invalidation(redis, user_cache.prompt_key(system_promt.user_id))
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al guardar el system prompt: {str(e)}")
 
 # Endpoint para recuperar el system prompt del usuario
 @router.get("/get-system-prompt/{user_id}", tags=["System Prompt"])
-async def get_system_prompt(user_id: str):
+async def get_system_prompt(user_id: str, user_cache: UserCache = Depends(get_user_cache)):
     """
     Recupera el system prompt del usuario desde MongoDB.
     Args:
@@ -67,7 +75,9 @@ async def get_system_prompt(user_id: str):
         dict: System prompt del usuario.
     """
     try:
-        system_prompt = user_db.get_system_prompt(user_id)
+        system_prompt = await user_cache.get_system_prompt(user_id)
+        if system_prompt is None:
+            raise ValueError(f"No existe un system prompt para el usuario: {user_id}")
         return system_prompt.dict()
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"System prompt no encontrado: {str(e)}")
\ No newline at end of file
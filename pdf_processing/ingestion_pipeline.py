@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+from utils.inference_executor import get_inference_executor
+from utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+MIN_PAGE_CHARS = 50  # Páginas con menos texto se descartan
+_DONE = object()  # Marca de fin de etapa
+
+
+def count_pdf_pages(file_path: str) -> int:
+    """Número de páginas de un PDF (se ejecuta en el pool de procesos)."""
+    import pdfplumber
+
+    with pdfplumber.open(file_path) as pdf:
+        return len(pdf.pages)
+
+
+def extract_pdf_pages(file_path: str, filename: str, start: int, end: int) -> List[dict]:
+    """
+    Extrae el texto de las páginas [start, end) de un PDF (se ejecuta en el pool de procesos).
+    Returns:
+        list: Dicts {"id", "text", "metadata"} de las páginas con texto suficiente.
+    """
+    import pdfplumber
+
+    file_id = filename.split("_")[0]
+    pages = []
+    with pdfplumber.open(file_path) as pdf:
+        for page_num in range(start, min(end, len(pdf.pages))):
+            text = pdf.pages[page_num].extract_text()
+            if text and len(text) > MIN_PAGE_CHARS:
+                pages.append({
+                    "id": f"{file_id}_p{page_num + 1}",
+                    "text": text,
+                    "metadata": {
+                        "content": text,
+                        "source": filename,
+                        "page": page_num + 1,
+                        "file_id": file_id
+                    }
+                })
+    return pages
+
+
+class StageStats:
+    """Contadores de una etapa del pipeline."""
+
+    def __init__(self):
+        self.items = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+
+    def record(self, items: int, seconds: float):
+        self.items += items
+        self.batches += 1
+        self.busy_seconds += seconds
+
+    def as_dict(self, elapsed: float) -> dict:
+        return {
+            "items": self.items,
+            "batches": self.batches,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "items_per_second": self.items / elapsed if elapsed else 0.0,
+        }
+
+
+class IngestionPipeline:
+    """
+    Pipeline de ingesta de PDFs por etapas con colas acotadas:
+
+    1. Extracción de páginas en un pool de procesos (bloques de páginas en paralelo).
+    2. Embeddings por lotes con el servicio compartido.
+    3. Upserts por lotes concurrentes al índice vectorial (y al índice BM25
+       si se indica `sparse_index`, con el texto de cada página).
+
+    Las colas entre etapas tienen tamaño máximo, de modo que una etapa lenta
+    frena a la anterior (backpressure) sin acumular todo el corpus en memoria.
+    """
+
+    def __init__(self, index, embedder, upload_folder: str, extraction_workers: int = 4,
+                 pages_per_task: int = 16, queue_size: int = 256, embed_batch_size: int = 32,
+                 upsert_batch_size: int = 32, upsert_concurrency: int = 4, namespace: Optional[str] = None,
+                 sparse_index=None):
+        self.index = index
+        self.sparse_index = sparse_index
+        self.embedder = embedder
+        self.upload_folder = upload_folder
+        self.pages_per_task = pages_per_task
+        self.queue_size = queue_size
+        self.embed_batch_size = embed_batch_size
+        self.upsert_batch_size = upsert_batch_size
+        self.upsert_concurrency = upsert_concurrency
+        self.namespace = namespace
+        self.extractor = get_inference_executor("pdf_extraction", kind="process", max_workers=extraction_workers)
+        self.upserter = get_inference_executor("pdf_upsert", kind="thread", max_workers=upsert_concurrency)
+        self.last_run: dict = {}
+
+    async def run(self, filenames: List[str]) -> Dict[str, int]:
+        """
+        Procesa los PDFs indicados.
+        Args:
+            filenames (list): Nombres de archivo dentro de `upload_folder`.
+        Returns:
+            dict: Páginas indexadas por archivo (0 si el archivo falló).
+        """
+        pages_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        vectors_queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, self.queue_size // self.upsert_batch_size))
+        indexed = {filename: 0 for filename in filenames}
+        failed = set()
+        stats = {"extract": StageStats(), "embed": StageStats(), "upsert": StageStats()}
+        started = time.monotonic()
+
+        # Limita los bloques extraídos en vuelo para que la cola acote también al pool de procesos
+        extraction_slots = asyncio.Semaphore(2 * self.extractor.max_workers)
+
+        async def extract():
+            await asyncio.gather(*(
+                self._extract_file(filename, pages_queue, extraction_slots, stats["extract"], failed)
+                for filename in filenames
+            ))
+            await pages_queue.put(_DONE)
+
+        async def embed():
+            done = False
+            while not done:
+                batch = []
+                item = await pages_queue.get()
+                while item is not _DONE:
+                    batch.append(item)
+                    if len(batch) >= self.embed_batch_size or pages_queue.empty():
+                        break
+                    item = await pages_queue.get()
+                done = item is _DONE
+                if batch:
+                    await self._embed_batch(batch, vectors_queue, stats["embed"], failed)
+            for _ in range(self.upsert_concurrency):
+                await vectors_queue.put(_DONE)
+
+        async def upsert():
+            while True:
+                batch = await vectors_queue.get()
+                if batch is _DONE:
+                    return
+                if await self._upsert_batch(batch, stats["upsert"], failed):
+                    for vector in batch:
+                        indexed[vector["metadata"]["source"]] += 1
+
+        await asyncio.gather(extract(), embed(), *(upsert() for _ in range(self.upsert_concurrency)))
+
+        for filename in filenames:
+            if filename in failed:
+                indexed[filename] = 0
+            else:
+                os.remove(os.path.join(self.upload_folder, filename))
+
+        elapsed = time.monotonic() - started
+        self.last_run = {
+            "files": len(filenames),
+            "failed_files": len(failed),
+            "elapsed_seconds": round(elapsed, 3),
+            "stages": {name: stage.as_dict(elapsed) for name, stage in stats.items()},
+        }
+        logger.info(f"Ingesta completada: {self.last_run}")
+        return indexed
+
+    async def _extract_file(self, filename: str, pages_queue: asyncio.Queue, slots: asyncio.Semaphore,
+                            stats: StageStats, failed: set):
+        file_path = os.path.join(self.upload_folder, filename)
+
+        async def extract_chunk(start: int):
+            async with slots:
+                chunk_started = time.monotonic()
+                pages = await self.extractor.run(
+                    extract_pdf_pages, file_path, filename, start, start + self.pages_per_task
+                )
+                stats.record(len(pages), time.monotonic() - chunk_started)
+                for page in pages:
+                    await pages_queue.put(page)  # Bloquea si la etapa de embeddings va atrasada
+
+        try:
+            num_pages = await self.extractor.run(count_pdf_pages, file_path)
+            await asyncio.gather(*(
+                extract_chunk(start) for start in range(0, num_pages, self.pages_per_task)
+            ))
+        except Exception as e:
+            logger.error(f"Error extrayendo {filename}: {str(e)}")
+            failed.add(filename)
+
+    async def _embed_batch(self, batch: List[dict], vectors_queue: asyncio.Queue, stats: StageStats, failed: set):
+        batch_started = time.monotonic()
+        try:
+            embeddings = await self.embedder.aencode([page["text"] for page in batch])
+        except Exception as e:
+            logger.error(f"Error generando embeddings: {str(e)}")
+            failed.update(page["metadata"]["source"] for page in batch)
+            return
+        stats.record(len(batch), time.monotonic() - batch_started)
+
+        vectors = [
+            {"id": page["id"], "values": embedding.tolist(), "metadata": page["metadata"]}
+            for page, embedding in zip(batch, embeddings)
+        ]
+        for i in range(0, len(vectors), self.upsert_batch_size):
+            await vectors_queue.put(vectors[i:i + self.upsert_batch_size])
+
+    async def _upsert_batch(self, batch: List[dict], stats: StageStats, failed: set) -> bool:
+        batch_started = time.monotonic()
+        kwargs = {"namespace": self.namespace} if self.namespace is not None else {}
+        try:
+            await self.upserter.run(self.index.upsert, vectors=batch, **kwargs)
+            if self.sparse_index is not None:
+                documents = [
+                    {"id": vector["id"], "text": vector["metadata"]["content"], "metadata": vector["metadata"]}
+                    for vector in batch
+                ]
+                await self.upserter.run(self.sparse_index.upsert, documents=documents, **kwargs)
+        except Exception as e:
+            logger.error(f"Error en upsert: {str(e)}")
+            failed.update(vector["metadata"]["source"] for vector in batch)
+            return False
+        stats.record(len(batch), time.monotonic() - batch_started)
+        return True
+
+
+def create_pipeline(index, embedder, upload_folder: str, sparse_index=None) -> IngestionPipeline:
+    """Crea el pipeline con la configuración de settings y registra sus métricas."""
+    from config.config import settings
+
+    pipeline = IngestionPipeline(
+        index,
+        embedder,
+        upload_folder,
+        extraction_workers=settings.PDF_EXTRACTION_WORKERS,
+        pages_per_task=settings.PDF_PAGES_PER_TASK,
+        queue_size=settings.PDF_PIPELINE_QUEUE_SIZE,
+        embed_batch_size=settings.PDF_EMBED_BATCH_SIZE,
+        upsert_batch_size=settings.PDF_UPSERT_BATCH_SIZE,
+        upsert_concurrency=settings.PDF_UPSERT_CONCURRENCY,
+        namespace=settings.KNOWLEDGE_NAMESPACE,
+        sparse_index=sparse_index
+    )
+    register_metrics("pdf_ingestion", lambda: pipeline.last_run)
+    return pipeline
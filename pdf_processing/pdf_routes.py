@@ -1,47 +1,34 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File
 import os
-import pdfplumber
 import uuid
-import numpy as np
+from functools import lru_cache
 from typing import List
 from pydantic import BaseModel
-import asyncio
-from pinecone import Pinecone, ServerlessSpec
-from sentence_transformers import SentenceTransformer
+from config.config import settings
+from models.embedding_model import get_embedding_model
+from vector_db.backends import get_sparse_index, get_vector_index
+from pdf_processing.ingestion_pipeline import IngestionPipeline, create_pipeline
 
 router = APIRouter()
 
-# Configuración Pinecone
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-INDEX_NAME = "pdf-documents"
-EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
-BATCH_SIZE = 32
+# Dimensión del índice vectorial (settings.KNOWLEDGE_INDEX_NAME, el mismo que consulta el asistente)
 EMBEDDING_DIM = 384  # Dimensión del modelo all-MiniLM-L6-v2
 
-# Inicializar cliente Pinecone
-pc = Pinecone(api_key=PINECONE_API_KEY)
-
-# Crear índice si no existe
-if INDEX_NAME not in pc.list_indexes().names():
-    pc.create_index(
-        name=INDEX_NAME,
-        dimension=EMBEDDING_DIM,
-        metric="cosine",
-        spec=ServerlessSpec(
-            cloud="aws",
-            region="us-east-1"
-        )
-    )
-
-# Obtener referencia al índice
-index = pc.Index(INDEX_NAME)
-
-# Modelo de embeddings
-embedder = SentenceTransformer(EMBEDDING_MODEL)
-
 # Configuración de directorios
 UPLOAD_FOLDER = "data/pdfs/user_uploaded/"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+@lru_cache(maxsize=None)
+def get_pdf_pipeline() -> IngestionPipeline:
+    """
+    Pipeline de ingesta por etapas (extracción -> embeddings -> upserts).
+    Se crea en el primer uso o en el calentamiento del arranque, no al importar.
+    """
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    # Índice Pinecone o local (se crea si no existe) y servicio de embeddings compartido
+    index = get_vector_index(settings.KNOWLEDGE_INDEX_NAME, dimension=EMBEDDING_DIM, region="us-west-2")
+    # Índice BM25 junto a los vectores para la búsqueda híbrida
+    sparse_index = get_sparse_index(settings.KNOWLEDGE_INDEX_NAME) if settings.HYBRID_SEARCH_ENABLED else None
+    return create_pipeline(index, get_embedding_model(), UPLOAD_FOLDER, sparse_index=sparse_index)
 
 class PDFContent(BaseModel):
     text: str
@@ -57,6 +44,7 @@ async def upload_pdf(file: UploadFile = File(...)):
         file_id = uuid.uuid4().hex
         safe_filename = f"{file_id}_{file.filename}"
         file_path = os.path.join(UPLOAD_FOLDER, safe_filename)
+        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
         
         contents = await file.read()
         if len(contents) > 50 * 1024 * 1024:
@@ -80,6 +68,7 @@ async def upload_pdf(file: UploadFile = File(...)):
 async def process_pdfs():
     """Pipeline de procesamiento optimizado para Pinecone"""
     try:
+        pipeline = get_pdf_pipeline()
         pdf_files = [
             f for f in os.listdir(UPLOAD_FOLDER) 
             if f.endswith(".pdf") and os.path.isfile(os.path.join(UPLOAD_FOLDER, f))
@@ -88,10 +77,9 @@ async def process_pdfs():
         if not pdf_files:
             raise HTTPException(400, "No hay PDFs para procesar")
 
-        tasks = [process_single_pdf(filename) for filename in pdf_files]
-        results = await asyncio.gather(*tasks)
+        results = await pipeline.run(pdf_files)
 
-        total_pages = sum(results)
+        total_pages = sum(results.values())
         if total_pages == 0:
             raise HTTPException(400, "No se encontró texto válido")
 
@@ -108,53 +96,5 @@ async def process_pdfs():
 
 async def process_single_pdf(filename: str) -> int:
     """Procesamiento individual de PDF con manejo de errores"""
-    file_path = os.path.join(UPLOAD_FOLDER, filename)
-    processed_pages = 0
-    
-    try:
-        with pdfplumber.open(file_path) as pdf:
-            texts = []
-            metadatas = []
-            
-            for page_num, page in enumerate(pdf.pages):
-                text = page.extract_text()
-                if text and len(text) > 50:
-                    texts.append(text)
-                    metadatas.append({
-                        "source": filename,
-                        "page": page_num + 1,
-                        "file_id": filename.split("_")[0]
-                    })
-                    processed_pages += 1
-
-            if texts:
-                # Generar embeddings por lotes
-                embeddings = embedder.encode(
-                    texts,
-                    batch_size=BATCH_SIZE,
-                    show_progress_bar=False,
-                    convert_to_numpy=True,
-                    normalize_embeddings=True
-                )
-                
-                # Preparar vectores para Pinecone
-                vectors = []
-                for idx, (text, metadata) in enumerate(zip(texts, metadatas)):
-                    vector_id = f"{metadata['file_id']}_p{metadata['page']}"
-                    vectors.append({
-                        "id": vector_id,
-                        "values": embeddings[idx].tolist(),
-                        "metadata": metadata
-                    })
-                
-                # Upsert en batches
-                for i in range(0, len(vectors), BATCH_SIZE):
-                    batch = vectors[i:i+BATCH_SIZE]
-                    index.upsert(vectors=batch)
-                
-        os.remove(file_path)
-        return processed_pages
-
-    except Exception as e:
-        print(f"Error procesando {filename}: {str(e)}")
-        return 0
\ No newline at end of file
+    results = await get_pdf_pipeline().run([filename])
+    return results.get(filename, 0)
@@ -1,21 +1,44 @@
-from typing import List, Optional
+from typing import List, Optional, Union
 from bson import ObjectId  # Para manejar IDs de MongoDB
 from models.model import Message  # Modelo de mensaje
-from motor.motor_asyncio import AsyncIOMotorClient
-from config.config import settings
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING
+from config.database import db
+from repositories.write_behind import WriteBehindBuffer
+
+HISTORY_INDEX = "from_number_timestamp_id"
+# Campos que necesita el historial del prompt (y la paginación)
+HISTORY_PROJECTION = {"_id": 1, "role": 1, "text.body": 1, "timestamp": 1}
 
 class MessageRepository:
-    def __init__(self):
+    def __init__(self, database: Optional[AsyncIOMotorDatabase] = None,
+                 write_buffer: Optional[WriteBehindBuffer] = None):
         """
-        Inicializa el repositorio conectándose a MongoDB.
+        Inicializa el repositorio sobre el cliente de MongoDB compartido.
+        Args:
+            database (AsyncIOMotorDatabase): Base de datos inyectada; por defecto la de `config.database.db`.
+            write_buffer (WriteBehindBuffer): Buffer para `add_message`; sin él se escribe en línea.
         """
-        self.client = AsyncIOMotorClient(settings.MONGODB_URL)
-        self.db = self.client[settings.DATABASE_NAME]
+        self.db = database if database is not None else db.get_database()
         self.collection = self.db["messages"]
+        self.write_buffer = write_buffer
+
+    async def add_message(self, message: dict) -> str:
+        """
+        Guarda un mensaje con escritura diferida (insert_many por lotes).
+        Usa `create_message` si se necesita el documento escrito antes de continuar.
+        Args:
+            message (dict): Datos del mensaje a insertar.
+        Returns:
+            str: ID que tendrá el mensaje (asignado en el cliente).
+        """
+        if self.write_buffer is None:
+            return await self.create_message(message)
+        return await self.write_buffer.add(message)
 
     async def create_message(self, message: dict) -> str:
         """
-        Inserta un nuevo mensaje en la base de datos.
+        Inserta un nuevo mensaje en la base de datos de forma síncrona.
         Args:
             message (dict): Datos del mensaje a insertar.
         Returns:
@@ -30,26 +53,71 @@ class MessageRepository:
             print(f"Error al insertar en MongoDB: {str(e)}")
             raise
 
-    async def get_messages_by_number(self, phone_number: str, limit: int = 50) -> List[Message]:
+    async def ensure_indexes(self):
+        """
+        Crea los índices de la colección (idempotente; se llama al arrancar).
+        El índice compuesto cubre el filtro por número y el orden de la paginación.
+        """
+        await self.collection.create_index(
+            [("from_number", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+            name=HISTORY_INDEX
+        )
+
+    @staticmethod
+    def page_cursor(message: dict) -> str:
+        """Cursor de paginación (`timestamp:_id`) a partir del último mensaje de una página."""
+        return f"{message['timestamp']}:{message['_id']}"
+
+    @staticmethod
+    def _keyset_filter(phone_number: str, before: Optional[str]) -> dict:
+        query = {"from_number": phone_number}
+        if before:
+            timestamp, message_id = before.rsplit(":", 1)
+            # Keyset: continúa justo después del último mensaje entregado, sin saltar documentos
+            query["$or"] = [
+                {"timestamp": {"$lt": timestamp}},
+                {"timestamp": timestamp, "_id": {"$lt": ObjectId(message_id)}}
+            ]
+        return query
+
+    async def get_messages_by_number(self, phone_number: str, limit: int = 50, before: Optional[str] = None,
+                                     raw: bool = False) -> Union[List[Message], List[dict]]:
         """
         Obtiene los mensajes más recientes de un número de teléfono específico.
         Args:
             phone_number (str): Número de teléfono del remitente.
             limit (int): Número máximo de mensajes a recuperar.
+            before (str): Cursor (`page_cursor`) del último mensaje de la página anterior.
+            raw (bool): Devuelve dicts con solo los campos del historial, sin construir modelos.
         Returns:
-            List[Message]: Lista de mensajes encontrados.
+            List[Message] | List[dict]: Mensajes del más reciente al más antiguo.
         """
         try:
             messages_cursor = self.collection.find(
-                {"from_number": phone_number}
-            ).sort("timestamp", -1).limit(limit)
+                self._keyset_filter(phone_number, before),
+                HISTORY_PROJECTION if raw else None
+            ).sort([("timestamp", DESCENDING), ("_id", DESCENDING)]).limit(limit)
 
             messages = await messages_cursor.to_list(length=limit)
+            if raw:
+                return messages
             return [Message(**msg) for msg in messages]  # Convertimos cada documento en un objeto Message
         except Exception as e:
             print(f"Error al obtener mensajes de MongoDB: {str(e)}")
             raise
 
+    async def get_history(self, phone_number: str, limit: int = 10) -> List[dict]:
+        """
+        Últimos turnos de la conversación en orden cronológico, para el prompt.
+        Returns:
+            List[dict]: Dicts con `role` y `text` (cuerpo del mensaje).
+        """
+        messages = await self.get_messages_by_number(phone_number, limit=limit, raw=True)
+        return [
+            {"role": msg.get("role", "user"), "text": (msg.get("text") or {}).get("body", "")}
+            for msg in reversed(messages)
+        ]
+
     async def update_message(self, message_id: str, new_data: dict) -> bool:
         """
         Actualiza un mensaje existente en la base de datos.
@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import BulkWriteError
+
+from utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    Buffer de escritura diferida para una colección de MongoDB.
+
+    Los documentos se acumulan en memoria y se escriben con `insert_many`
+    (no ordenado) cuando hay `max_batch_size` pendientes o pasan
+    `flush_interval` segundos. `close()` vacía el buffer antes de salir.
+
+    Mientras un documento está en el buffer solo vive en memoria: si el proceso
+    muere se pierde. `stats()` expone cuántos hay pendientes y su antigüedad.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection, max_batch_size: int = 100,
+                 flush_interval: float = 0.5, max_pending: int = 10000):
+        self.collection = collection
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Deque[Tuple[float, Dict[str, Any]]] = deque()
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_lag_ms = 0.0
+        self.max_flush_lag_ms = 0.0
+
+    async def add(self, document: Dict[str, Any]) -> str:
+        """
+        Encola un documento para escritura diferida.
+        Args:
+            document (dict): Documento a insertar (se le asigna `_id` si no lo tiene).
+        Returns:
+            str: ID que tendrá el documento una vez escrito.
+        """
+        document.setdefault("_id", ObjectId())
+        if len(self._pending) >= self.max_pending:
+            # Contrapresión: si Mongo no da abasto se escribe en línea en lugar de crecer sin límite
+            await self.flush()
+        self._pending.append((time.monotonic(), document))
+        if self._task is None:
+            await self.start()
+        if len(self._pending) >= self.max_batch_size:
+            self._wakeup.set()
+        return str(document["_id"])
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error en la escritura diferida de mensajes: {str(e)}")
+
+    async def flush(self):
+        """Escribe todo lo pendiente en lotes de `max_batch_size`."""
+        async with self._flush_lock:
+            while self._pending:
+                batch = [self._pending.popleft() for _ in range(min(self.max_batch_size, len(self._pending)))]
+                lag_ms = 1000 * (time.monotonic() - batch[0][0])
+                try:
+                    await self.collection.insert_many([document for _, document in batch], ordered=False)
+                    self.written += len(batch)
+                except BulkWriteError as e:
+                    # Con ordered=False Mongo escribe el resto del lote; se descartan solo los erróneos
+                    errors = len(e.details.get("writeErrors", []))
+                    self.written += len(batch) - errors
+                    self.failed += errors
+                    logger.error(f"{errors} mensajes no se pudieron escribir: {str(e)}")
+                except Exception:
+                    # Error de conexión: se devuelven al buffer para el siguiente intento
+                    self._pending.extendleft(reversed(batch))
+                    raise
+                self.flushes += 1
+                self.last_flush_lag_ms = lag_ms
+                self.max_flush_lag_ms = max(self.max_flush_lag_ms, lag_ms)
+
+    async def close(self):
+        """Detiene el flush periódico y escribe lo pendiente (evento de cierre)."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Se pierden {len(self._pending)} mensajes sin escribir al cerrar: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        oldest = self._pending[0][0] if self._pending else None
+        return {
+            "pending": len(self._pending),
+            "oldest_pending_ms": 1000 * (time.monotonic() - oldest) if oldest is not None else 0.0,
+            "written": self.written,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "last_flush_lag_ms": self.last_flush_lag_ms,
+            "max_flush_lag_ms": self.max_flush_lag_ms,
+        }
+
+
+_message_buffer: Optional[WriteBehindBuffer] = None
+
+
+def get_message_write_buffer() -> WriteBehindBuffer:
+    """Buffer de escritura diferida de la colección `messages`, compartido por el worker."""
+    global _message_buffer
+    if _message_buffer is None:
+        from config.config import settings
+        from config.database import db
+
+        _message_buffer = WriteBehindBuffer(
+            db.get_database()["messages"],
+            max_batch_size=settings.MESSAGE_WRITE_BATCH_SIZE,
+            flush_interval=settings.MESSAGE_WRITE_FLUSH_INTERVAL,
+            max_pending=settings.MESSAGE_WRITE_MAX_PENDING
+        )
+        register_metrics("message_writes", _message_buffer.stats)
+    return _message_buffer
+
+
+async def close_message_write_buffer():
+    """Vacía y libera el buffer compartido, si se llegó a crear."""
+    global _message_buffer
+    if _message_buffer is not None:
+        await _message_buffer.close()
+        _message_buffer = None
@@ -0,0 +1,23 @@
+import os
+
+# Configuración mínima para que `settings` valide sin un .env real. Se fija al
+# cargar conftest, antes de que los tests importen nada que lea la
+# configuración; las variables ya definidas en el entorno tienen prioridad.
+TEST_ENV = {
+    "MONGODB_URL": "mongodb://localhost:27017",
+    "DATABASE_NAME": "test",
+    "VERIFY_TOKEN": "test",
+    "WHATSAPP_TOKEN": "test",
+    "PHONE_NUMBER_ID": "100000000000001",
+    "HUGGINGFACE_API_TOKEN": "test",
+    "REDIS_HOST": "localhost",
+    "REDIS_PORT": "6379",
+    "REDIS_PASSWORD": "",
+    # Índices locales en memoria: sin Pinecone ni escrituras en data/
+    "VECTOR_BACKEND": "local",
+    "LOCAL_INDEX_PATH": "",
+    "BM25_INDEX_PATH": "",
+}
+
+for name, value in TEST_ENV.items():
+    os.environ.setdefault(name, value)
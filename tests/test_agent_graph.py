@@ -0,0 +1,89 @@
+import asyncio
+import time
+import pytest
+
+pytest.importorskip("langgraph")
+pytest.importorskip("transformers")
+
+from models.generation_budget import GenerationBudgetStats
+
+LOOKUP_SECONDS = 0.2
+
+
+class RecordingScheduler:
+    idle = True
+
+    def __init__(self):
+        self.prompts = []
+        self.started_at = None
+
+    async def submit(self, prompt, **kwargs):
+        self.started_at = time.monotonic()
+        self.prompts.append(kwargs.get("prefix", "") + prompt)
+        return "El curso PY-101 dura 40 horas y cuesta 200 USD."
+
+
+def _assistant(monkeypatch):
+    from config.config import settings
+    from models.language_model import EnhancedAIAssistant
+
+    monkeypatch.setattr(settings, "LLM_RESPONSE_BUDGET_SECONDS", 30, raising=False)
+    monkeypatch.setattr(settings, "LLM_HISTORY_TURNS", 6, raising=False)
+
+    class SlowUserCache:
+        async def get_system_prompt(self, user_id):
+            await asyncio.sleep(LOOKUP_SECONDS)
+            return None
+
+    class SlowHistory:
+        async def get_history(self, user_id, limit):
+            await asyncio.sleep(LOOKUP_SECONDS)
+            return [{"role": "user", "text": "hola"}, {"role": "assistant", "text": "¡Hola! ¿En qué te ayudo?"}]
+
+    async def slow_retrieve(state):
+        await asyncio.sleep(LOOKUP_SECONDS)
+        return {"context": "- PY-101: 40 horas"}
+
+    assistant = object.__new__(EnhancedAIAssistant)
+    assistant.scheduler = RecordingScheduler()
+    assistant.draft_model = None
+    assistant.budget_stats = GenerationBudgetStats(30)
+    assistant.user_cache = SlowUserCache()
+    assistant._message_repository = SlowHistory()
+    assistant.retrieve_context = slow_retrieve
+    assistant._setup_graph()
+    return assistant
+
+
+def test_lookups_run_in_parallel_and_join_before_generation(monkeypatch):
+    assistant = _assistant(monkeypatch)
+
+    started = time.monotonic()
+    response = asyncio.run(assistant.process_query("¿Cuánto dura el PY-101?", "573001"))
+    waited = assistant.scheduler.started_at - started
+
+    assert response.startswith("El curso PY-101")
+    assert LOOKUP_SECONDS <= waited < 2 * LOOKUP_SECONDS  # La más lenta, no la suma de las tres
+    prompt = assistant.scheduler.prompts[0]
+    assert assistant._default_prompt() in prompt
+    assert "- PY-101: 40 horas" in prompt
+    assert prompt.index("<|assistant|>\n¡Hola!") < prompt.index("<|user|>\n¿Cuánto dura")
+
+
+def test_streaming_path_also_fans_out(monkeypatch):
+    assistant = _assistant(monkeypatch)
+
+    async def fake_stream(prompt, **kwargs):
+        assistant.scheduler.started_at = time.monotonic()
+        yield "Dura 40 horas."
+
+    assistant.scheduler.submit_stream = fake_stream
+
+    async def run():
+        started = time.monotonic()
+        chunks = [text async for text in assistant.stream_query("¿Cuánto dura?", "573001")]
+        return chunks, assistant.scheduler.started_at - started
+
+    chunks, waited = asyncio.run(run())
+    assert chunks == ["Dura 40 horas."]
+    assert waited < 2 * LOOKUP_SECONDS
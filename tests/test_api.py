@@ -1,6 +1,7 @@
 import pytest
 from fastapi.testclient import TestClient
 from backend.main import app  # Importa la instancia de FastAPI
+from config.config import settings
 
 client = TestClient(app)
 
@@ -8,14 +9,26 @@ client = TestClient(app)
 def test_webhook_verification():
     response = client.get("/api/webhook", params={
         "hub.mode": "subscribe",
-        "hub.verify_token": "tu_verify_token",
+        "hub.verify_token": settings.VERIFY_TOKEN,
         "hub.challenge": "test_challenge"
     })
     assert response.status_code == 200
     assert response.text == "test_challenge"
 
+
+def test_webhook_verification_rejects_wrong_token():
+    response = client.get("/api/webhook", params={
+        "hub.mode": "subscribe",
+        "hub.verify_token": "otro_token",
+        "hub.challenge": "test_challenge"
+    })
+    assert response.status_code == 403
+
 # Prueba para cargar un PDF
-def test_upload_pdf(tmp_path):
+def test_upload_pdf(tmp_path, monkeypatch):
+    # Las subidas van al directorio temporal, no a data/pdfs/user_uploaded/
+    upload_folder = tmp_path / "uploads"
+    monkeypatch.setattr("pdf_processing.pdf_routes.UPLOAD_FOLDER", str(upload_folder))
     # Crear un archivo PDF temporal
     pdf_file = tmp_path / "test.pdf"
     pdf_file.write_text("Test PDF content")
@@ -26,4 +39,5 @@ def test_upload_pdf(tmp_path):
             files={"file": ("test.pdf", file, "application/pdf")}
         )
     assert response.status_code == 200
-    assert response.json()["message"] == "PDF cargado y procesado exitosamente."
\ No newline at end of file
+    assert response.json()["message"] == "PDF almacenado exitosamente"
+    assert (upload_folder / response.json()["filename"]).read_text() == "Test PDF content"
\ No newline at end of file
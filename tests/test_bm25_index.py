@@ -0,0 +1,76 @@
+import asyncio
+import numpy as np
+
+from utils.inference_executor import InferenceExecutor
+from vector_db.bm25_index import BM25Index, tokenize
+from vector_db.hybrid import HybridRetriever, reciprocal_rank_fusion
+from vector_db.local_index import LocalVectorIndex
+
+DOCS = [
+    {"id": "c1", "text": "Curso PY-101: introducción a Python, 40 horas.", "metadata": {"content": "PY-101"}},
+    {"id": "c2", "text": "Curso de análisis de datos con Python y pandas.", "metadata": {"content": "datos"}},
+    {"id": "c3", "text": "Taller JS-220 de JavaScript para la web, 24 horas.", "metadata": {"content": "JS-220"}},
+]
+
+
+def test_tokenize_keeps_codes_and_numbers_without_accents():
+    assert tokenize("¿Cuánto cuesta el PY-101? Son 3.5 millones") == [
+        "cuanto", "cuesta", "py-101", "py", "101", "son", "3.5", "3", "5", "millones"
+    ]
+
+
+def test_bm25_ranks_exact_codes_and_updates_incrementally(tmp_path):
+    index = BM25Index(path=str(tmp_path))
+    index.upsert(DOCS, namespace="courses")
+
+    matches = index.query("información del js-220", top_k=2, namespace="courses", include_metadata=True)["matches"]
+    assert matches[0]["id"] == "c3" and matches[0]["metadata"] == {"content": "JS-220"}
+    assert {m["id"] for m in index.query("python", namespace="courses")["matches"]} == {"c1", "c2"}
+
+    # Reemplazar un documento actualiza sus términos sin reconstruir el índice
+    index.upsert([{"id": "c3", "text": "Taller de Go", "metadata": {}}], namespace="courses")
+    assert index.query("js-220", namespace="courses")["matches"] == []
+    index.delete(ids=["c1"], namespace="courses")
+    assert [m["id"] for m in index.query("python", namespace="courses")["matches"]] == ["c2"]
+
+    # Cada lote anexa solo sus registros al log del namespace
+    assert len((tmp_path / "courses.bm25.jsonl").read_text().splitlines()) == len(DOCS) + 2
+
+    reloaded = BM25Index(path=str(tmp_path))
+    assert reloaded.describe_index_stats()["total_document_count"] == 2
+    assert reloaded.query("go", namespace="courses")["matches"][0]["id"] == "c3"
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    dense = [{"id": "a", "metadata": {"n": 1}}, {"id": "b"}, {"id": "c"}]
+    sparse = [{"id": "c", "metadata": {"n": 3}}, {"id": "d"}]
+    fused = reciprocal_rank_fusion([dense, sparse], top_k=3)
+    assert [m["id"] for m in fused] == ["c", "a", "b"]
+    assert fused[1]["metadata"] == {"n": 1}
+
+
+def test_hybrid_retriever_finds_codes_dense_search_misses():
+    class FakeEmbedder:
+        async def aencode(self, text):
+            await asyncio.sleep(0.01)
+            return np.array([1.0, 0.0], dtype=np.float32)
+
+    dense = LocalVectorIndex(dimension=2)
+    # Los embeddings no distinguen el código: el taller JS queda último en la búsqueda densa
+    dense.upsert([
+        {"id": "c1", "values": [1.0, 0.0], "metadata": DOCS[0]["metadata"]},
+        {"id": "c2", "values": [0.9, 0.1], "metadata": DOCS[1]["metadata"]},
+        {"id": "c3", "values": [0.1, 0.9], "metadata": DOCS[2]["metadata"]},
+    ], namespace="courses")
+    sparse = BM25Index()
+    sparse.upsert(DOCS, namespace="courses")
+
+    # Con 2 candidatos la búsqueda densa sola no devuelve el taller
+    assert "c3" not in [m["id"] for m in dense.query([1.0, 0.0], top_k=2, namespace="courses")["matches"]]
+
+    retriever = HybridRetriever(dense, sparse, FakeEmbedder(), InferenceExecutor("test_hybrid", max_workers=2),
+                                candidates=2)
+    results = asyncio.run(retriever.search("horario del JS-220", top_k=2, namespace="courses"))
+
+    assert "c3" in [m["id"] for m in results["matches"]]
+    assert retriever.stats()["queries"] == 1 and retriever.stats()["sparse_only_hits"] == 1
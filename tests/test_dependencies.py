@@ -0,0 +1,76 @@
+import asyncio
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from redis.asyncio import Redis
+
+from api import dependencies
+from config.redis_client import RedisManager
+
+
+def test_requests_borrow_from_one_connection_pool(monkeypatch):
+    manager = RedisManager()
+    monkeypatch.setattr(dependencies, "redis_manager", manager)
+    app = FastAPI()
+
+    @app.get("/pool")
+    async def pool(redis: Redis = Depends(dependencies.get_redis)):
+        return {"client": id(redis), "pool": id(redis.connection_pool)}
+
+    client = TestClient(app)
+    first, second = client.get("/pool").json(), client.get("/pool").json()
+
+    assert first == second
+    assert first["pool"] == id(manager.pool)
+
+
+def test_whatsapp_service_is_created_once_per_worker(monkeypatch):
+    created = []
+
+    class FakeWhatsAppService:
+        def __init__(self, redis):
+            created.append(redis)
+
+    monkeypatch.setattr(dependencies, "WhatsAppService", FakeWhatsAppService)
+    monkeypatch.setattr(dependencies, "_whatsapp_service", None)
+
+    async def run():
+        first = await dependencies.get_whatsapp_service(redis="redis")
+        second = await dependencies.get_whatsapp_service(redis="redis")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first is second
+    assert len(created) == 1
+
+
+def test_close_disconnects_the_pool():
+    manager = RedisManager()
+    disconnected = []
+
+    async def run():
+        await manager.connect()
+        pool = manager.pool
+
+        async def disconnect(inuse_connections=True):
+            disconnected.append(inuse_connections)
+
+        pool.disconnect = disconnect
+        await manager.close()
+
+    asyncio.run(run())
+    assert disconnected == [True]
+    assert manager.pool is None and manager.client is None
+    assert manager.stats() == {"connected": False}
+
+
+def test_stats_survive_pool_internals_changing():
+    manager = RedisManager()
+    asyncio.run(manager.connect())
+    assert manager.stats()["available"] == 0 and manager.stats()["in_use"] == 0
+
+    # Otra versión de redis-py podría no tener estos atributos privados
+    del manager.pool._available_connections
+    manager.pool._in_use_connections = None
+    stats = manager.stats()
+    assert stats["connected"] and stats["available"] is None and stats["in_use"] is None
@@ -0,0 +1,51 @@
+import numpy as np
+from models.embedding_cache import DiskEmbeddingStore, EmbeddingCache, cache_key
+from models.embedding_model import EmbeddingModel
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, **kwargs):
+        self.encoded.extend(texts)
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+def test_key_ignores_case_and_whitespace():
+    assert cache_key("m", "¿Qué es  la IA?\n") == cache_key("m", "¿qué es la ia?")
+    assert cache_key("m", "hola") != cache_key("otro", "hola")
+
+
+def test_only_misses_are_encoded():
+    encoder = CountingEncoder()
+    service = EmbeddingModel(model=encoder, cache=EmbeddingCache("m", max_entries=10))
+
+    service.encode(["hola", "adiós"])
+    service.encode(["HOLA", "nuevo"])
+
+    assert encoder.encoded == ["hola", "adiós", "nuevo"]
+    stats = service.cache.stats()
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 3
+    assert stats["hit_ratio"] == 0.25
+
+
+def test_lru_evicts_oldest_entry():
+    cache = EmbeddingCache("m", max_entries=2)
+    cache.set_many(["a", "b", "c"], np.ones((3, 2)))
+
+    assert cache.get_many(["a", "c"])[0] is None
+    assert cache.stats()["entries"] == 2
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    EmbeddingCache("m", store=DiskEmbeddingStore(path)).set_many(["hola"], np.array([[0.5, 0.25]]))
+
+    cache = EmbeddingCache("m", store=DiskEmbeddingStore(path))
+    vector = cache.get_many(["hola"])[0]
+
+    assert vector.dtype == np.float32
+    assert np.allclose(vector, [0.5, 0.25])
+    assert cache.stats()["persistent_hits"] == 1
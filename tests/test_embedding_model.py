@@ -0,0 +1,44 @@
+import asyncio
+import numpy as np
+from models.embedding_model import EmbeddingModel
+
+
+class FakeEncoder:
+    """Encoder determinista que registra el tamaño de cada lote."""
+
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, **kwargs):
+        single = isinstance(texts, str)
+        batch = [texts] if single else texts
+        self.batches.append(len(batch))
+        vectors = np.array([[len(text), 1.0] for text in batch], dtype=np.float32)
+        return vectors[0] if single else vectors
+
+
+def test_concurrent_requests_are_coalesced():
+    fake = FakeEncoder()
+    service = EmbeddingModel(max_batch_size=64, max_wait_ms=20, model=fake)
+
+    async def run():
+        return await asyncio.gather(*(service.aencode("x" * i) for i in range(1, 11)))
+
+    results = asyncio.run(run())
+
+    assert sum(fake.batches) == 10
+    assert len(fake.batches) < 10
+    assert [int(r[0]) for r in results] == list(range(1, 11))
+
+
+def test_batches_respect_max_batch_size():
+    fake = FakeEncoder()
+    service = EmbeddingModel(max_batch_size=4, max_wait_ms=20, model=fake)
+
+    async def run():
+        return await asyncio.gather(*(service.aencode(["a", "bb"]) for _ in range(4)))
+
+    results = asyncio.run(run())
+
+    assert all(r.shape == (2, 2) for r in results)
+    assert max(fake.batches) <= 4
@@ -0,0 +1,154 @@
+import asyncio
+import time
+import pytest
+
+from models.generation_budget import GenerationBudgetStats, QueryOutcome, token_budget
+
+
+def test_token_budget_shrinks_with_remaining_time():
+    assert token_budget(float("inf"), 60, 512, 64) == 512
+    assert token_budget(60, 60, 512, 64) == 512
+    assert token_budget(30, 60, 512, 64) == 256
+    assert token_budget(1, 60, 512, 64) == 64
+    assert token_budget(-5, 60, 512, 64) == 64
+
+
+def test_budget_stats_percentiles_and_attempt_counts():
+    stats = GenerationBudgetStats(budget_seconds=10)
+    for elapsed in range(1, 101):
+        stats.record_attempt()
+        stats.record_request(1, elapsed / 10)
+    stats.record_attempt(deadline_exceeded=True)
+    stats.record_attempt()
+    stats.record_request(2, 9.9, fallback=True)
+
+    result = stats.stats()
+    assert result["attempt_counts"] == {"1": 100, "2": 1}
+    assert result["retries"] == 1 and result["deadline_exceeded"] == 1 and result["fallbacks"] == 1
+    assert result["p99_seconds"] <= 10 and result["p99_budget_used"] <= 1.0
+
+
+class SlowRefusingScheduler:
+    """Planificador falso: siempre responde "no sé" y tarda `delay` segundos."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.max_new_tokens = []
+        self.cancelled = 0
+
+    async def submit(self, prompt, max_new_tokens, **kwargs):
+        self.max_new_tokens.append(max_new_tokens)
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return "no sé" + " la respuesta" * len(self.max_new_tokens)
+
+
+def _assistant(scheduler, monkeypatch, budget, max_attempts=5):
+    pytest.importorskip("langgraph")
+    pytest.importorskip("transformers")
+    from config.config import settings
+    from models.language_model import EnhancedAIAssistant
+
+    for name, value in {
+        "LLM_RESPONSE_BUDGET_SECONDS": budget, "LLM_MAX_ATTEMPTS": max_attempts,
+        "LLM_MIN_ATTEMPT_SECONDS": 0.05, "LLM_MIN_NEW_TOKENS": 16, "LLM_MAX_NEW_TOKENS": 512,
+    }.items():
+        monkeypatch.setattr(settings, name, value, raising=False)
+
+    assistant = object.__new__(EnhancedAIAssistant)
+    assistant.scheduler = scheduler
+    assistant.draft_model = None
+    assistant.budget_stats = GenerationBudgetStats(budget)
+
+    async def no_context(state):
+        return {"context": ""}
+
+    class NoHistory:
+        async def get_history(self, user_id, limit):
+            return []
+
+    assistant.retrieve_context = no_context
+    assistant._message_repository = NoHistory()
+    assistant._setup_graph()
+    return assistant
+
+
+def test_regeneration_stops_at_max_attempts_with_best_answer(monkeypatch):
+    scheduler = SlowRefusingScheduler(delay=0)
+    assistant = _assistant(scheduler, monkeypatch, budget=30, max_attempts=3)
+
+    response = asyncio.run(assistant.process_query("¿precio?", "573001", system_prompt="Eres un asistente"))
+
+    assert len(scheduler.max_new_tokens) == 3
+    assert response == "no sé la respuesta la respuesta la respuesta"  # La más completa de las tres
+    assert assistant.budget_stats.stats()["attempt_counts"] == {"3": 1}
+
+
+def test_deadline_cancels_generation_and_bounds_latency(monkeypatch):
+    scheduler = SlowRefusingScheduler(delay=0.15)
+    assistant = _assistant(scheduler, monkeypatch, budget=0.4)
+
+    started = time.monotonic()
+    response = asyncio.run(assistant.process_query("¿precio?", "573001", system_prompt="Eres un asistente"))
+    elapsed = time.monotonic() - started
+
+    assert elapsed < 0.6
+    assert response.startswith("no sé")
+    assert scheduler.max_new_tokens == sorted(scheduler.max_new_tokens, reverse=True)
+    assert scheduler.max_new_tokens[-1] < 512
+    stats = assistant.budget_stats.stats()
+    assert stats["fallbacks"] == 1 and stats["requests"] == 1
+
+
+def test_stream_cut_by_deadline_reports_partial_answer(monkeypatch):
+    scheduler = SlowRefusingScheduler(delay=0)
+
+    async def stalled_stream(prompt, **kwargs):
+        yield "El curso de Python dura "
+        await asyncio.sleep(5)
+        yield "40 horas."
+
+    scheduler.submit_stream = stalled_stream
+    assistant = _assistant(scheduler, monkeypatch, budget=0.2)
+    outcome = QueryOutcome()
+
+    async def run():
+        stream = assistant.stream_query("¿Cuánto dura?", "573001", system_prompt="Eres un asistente", outcome=outcome)
+        return [text async for text in stream]
+
+    started = time.monotonic()
+    chunks = asyncio.run(run())
+
+    assert time.monotonic() - started < 1
+    assert chunks == ["El curso de Python dura "]
+    assert outcome.response == "El curso de Python dura " and outcome.timed_out
+    assert not outcome.valid and not outcome.complete
+    assert assistant.budget_stats.stats()["fallbacks"] == 1
+
+
+def test_deadline_criteria_stops_model_generate():
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+    from models.stopping_criteria import DeadlineStoppingCriteria
+
+    torch.manual_seed(0)
+    config = transformers.LlamaConfig(
+        vocab_size=100, hidden_size=32, intermediate_size=64, num_hidden_layers=2,
+        num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=512
+    )
+    model = transformers.LlamaForCausalLM(config).eval()
+    input_ids = torch.tensor([[1, 5, 6, 7]])
+
+    def generate(deadline, **kwargs):
+        criteria = transformers.StoppingCriteriaList([DeadlineStoppingCriteria(deadline)])
+        return model.generate(input_ids, max_new_tokens=200, do_sample=False, eos_token_id=None, pad_token_id=0,
+                              stopping_criteria=criteria, **kwargs)
+
+    # Con el plazo vencido solo sale el paso que ya se estaba calculando
+    assert generate(time.monotonic()).shape[1] == input_ids.shape[1] + 1
+    assert generate(time.monotonic() + 60).shape[1] == input_ids.shape[1] + 200
+    # Decodificación asistida: se corta tras la primera verificación del borrador
+    assert generate(time.monotonic(), assistant_model=model).shape[1] < input_ids.shape[1] + 200
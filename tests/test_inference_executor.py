@@ -0,0 +1,44 @@
+import asyncio
+import math
+import time
+
+from utils.inference_executor import InferenceExecutor
+
+
+def test_blocking_calls_do_not_stall_event_loop():
+    executor = InferenceExecutor("test", kind="thread", max_workers=1)
+
+    async def run():
+        ticks = 0
+
+        async def heartbeat():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(heartbeat())
+        results = await asyncio.gather(*(executor.run(time.sleep, 0.1) for _ in range(3)))
+        task.cancel()
+        return ticks, results
+
+    ticks, results = asyncio.run(run())
+    executor.shutdown()
+
+    assert results == [None, None, None]
+    assert ticks >= 10
+    stats = executor.stats()
+    assert stats["completed"] == 3
+    assert stats["in_flight"] == 0
+    # Con un solo worker, la tercera llamada espera a las dos anteriores
+    assert stats["max_wait_ms"] >= 150
+
+
+def test_process_pool_runs_picklable_functions():
+    # Uso de la extracción de PDFs: funciones de módulo y argumentos serializables
+    executor = InferenceExecutor("test_process", kind="process", max_workers=1)
+    try:
+        assert asyncio.run(executor.run(math.sqrt, 16)) == 4.0
+    finally:
+        executor.shutdown()
+    assert executor.stats()["kind"] == "process" and executor.stats()["completed"] == 1
@@ -0,0 +1,160 @@
+import asyncio
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from models.inference_scheduler import ContinuousBatchScheduler
+from models.prefix_cache import PrefixKVCache
+
+EOS = 99
+
+
+class CharTokenizer:
+    """Tokenizador mínimo determinista para un modelo Llama aleatorio."""
+    pad_token_id = None
+    eos_token_id = EOS
+
+    def __call__(self, text, add_special_tokens=True):
+        return {"input_ids": ([1] if add_special_tokens else []) + [(ord(c) % 90) + 2 for c in text]}
+
+    def decode(self, ids, skip_special_tokens=True):
+        return ",".join(str(i) for i in ids)
+
+
+@pytest.fixture(scope="module")
+def tiny_model():
+    torch.manual_seed(0)
+    config = transformers.LlamaConfig(
+        vocab_size=100, hidden_size=32, intermediate_size=64, num_hidden_layers=2,
+        num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=256,
+        bos_token_id=1, eos_token_id=EOS, pad_token_id=0
+    )
+    return transformers.LlamaForCausalLM(config).eval()
+
+
+def test_batched_greedy_matches_single_generate(tiny_model):
+    tokenizer = CharTokenizer()
+    prompts = ["hola mundo", "a", "una pregunta bastante más larga que las otras", "xyz"]
+    max_new_tokens = [12, 5, 20, 9]
+
+    expected = []
+    for prompt, limit in zip(prompts, max_new_tokens):
+        ids = torch.tensor([tokenizer(prompt)["input_ids"]])
+        output = tiny_model.generate(
+            ids, attention_mask=torch.ones_like(ids), max_new_tokens=limit,
+            do_sample=False, eos_token_id=EOS, pad_token_id=0
+        )
+        expected.append(tokenizer.decode(output[0, ids.shape[1]:].tolist()))
+
+    scheduler = ContinuousBatchScheduler(tiny_model, tokenizer, max_batch_size=3)
+
+    async def run():
+        async def submit(prompt, limit, delay):
+            # Las solicitudes llegan escalonadas y se unen al lote en curso
+            await asyncio.sleep(delay)
+            return await scheduler.submit(prompt, max_new_tokens=limit, do_sample=False)
+
+        return await asyncio.gather(*(
+            submit(prompt, limit, i * 0.005) for i, (prompt, limit) in enumerate(zip(prompts, max_new_tokens))
+        ))
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        scheduler.stop()
+
+    assert results == expected
+    assert all(len(r.split(",")) <= limit for r, limit in zip(results, max_new_tokens))
+
+
+
+def _greedy(model, ids, limit):
+    ids = torch.tensor([ids])
+    output = model.generate(
+        ids, attention_mask=torch.ones_like(ids), max_new_tokens=limit,
+        do_sample=False, eos_token_id=EOS, pad_token_id=0
+    )
+    return output[0, ids.shape[1]:].tolist()
+
+
+def test_prefix_cache_reuses_system_prompt_kv(tiny_model):
+    tokenizer = CharTokenizer()
+    prefix = "<|system|>\nEres el asistente de la tienda, responde breve y en español.\n"
+    questions = ["hola", "precio del curso", "horario"]
+    expected = [
+        tokenizer.decode(_greedy(tiny_model, tokenizer(prefix)["input_ids"] + tokenizer(q, False)["input_ids"], 8))
+        for q in questions
+    ]
+    plain_expected = tokenizer.decode(_greedy(tiny_model, tokenizer("sin prefijo")["input_ids"], 8))
+
+    cache = PrefixKVCache(max_bytes=2 ** 20)
+    scheduler = ContinuousBatchScheduler(tiny_model, tokenizer, max_batch_size=4, prefix_cache=cache,
+                                         min_prefix_tokens=8)
+
+    async def run():
+        first = await asyncio.gather(
+            scheduler.submit(questions[0], max_new_tokens=8, do_sample=False, prefix=prefix, prefix_owner="573001"),
+            scheduler.submit("sin prefijo", max_new_tokens=8, do_sample=False)
+        )
+        rest = await asyncio.gather(*(
+            scheduler.submit(q, max_new_tokens=8, do_sample=False, prefix=prefix, prefix_owner="573002")
+            for q in questions[1:]
+        ))
+        return first, rest
+
+    try:
+        (with_prefix, plain), rest = asyncio.run(run())
+    finally:
+        scheduler.stop()
+
+    assert [with_prefix] + rest == expected
+    assert plain == plain_expected
+    assert cache.stats()["hits"] == 2 and cache.stats()["entries"] == 1
+
+    cache.invalidate_owner("573002")  # /set-system-prompt de un usuario que usa el prefijo
+    assert cache.stats()["entries"] == 0 and cache.bytes == 0
+
+
+def test_prefix_cache_respects_memory_limit():
+    def layers(tokens):
+        return [(torch.zeros(1, 2, tokens, 8), torch.zeros(1, 2, tokens, 8))]
+
+    entry_bytes = 2 * 2 * 10 * 8 * 4
+    cache = PrefixKVCache(max_bytes=2 * entry_bytes)
+    cache.put("a", layers(10), owner="u1")
+    cache.put("b", layers(10), owner="u2")
+    assert cache.get("a") is not None  # "b" pasa a ser el menos reciente
+    cache.put("c", layers(10), owner="u3")
+
+    assert cache.get("b") is None and cache.get("a") is not None
+    assert cache.bytes == 2 * entry_bytes and cache.evictions == 1
+    cache.invalidate_owner("u2")  # Ya expulsada: no falla
+    cache.put("huge", layers(100))
+    assert cache.get("huge") is None
+
+
+def test_submit_stream_yields_text_while_batch_generates(tiny_model):
+    class SpacedTokenizer(CharTokenizer):
+        def decode(self, ids, skip_special_tokens=True):
+            return " ".join(str(i) for i in ids)
+
+    tokenizer = SpacedTokenizer()
+    scheduler = ContinuousBatchScheduler(tiny_model, tokenizer, max_batch_size=2)
+
+    async def run():
+        chunks = []
+        batched = asyncio.ensure_future(scheduler.submit("otro usuario", max_new_tokens=10, do_sample=False))
+        async for text in scheduler.submit_stream("hola mundo", max_new_tokens=10, do_sample=False):
+            chunks.append(text)
+        full = await scheduler.submit("hola mundo", max_new_tokens=10, do_sample=False)
+        return chunks, full, await batched
+
+    try:
+        chunks, full, other = asyncio.run(run())
+    finally:
+        scheduler.stop()
+
+    assert "".join(chunks) == full
+    assert len(chunks) > 1
+    assert other == tokenizer.decode(_greedy(tiny_model, tokenizer("otro usuario")["input_ids"], 10))
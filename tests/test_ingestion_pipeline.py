@@ -0,0 +1,108 @@
+import asyncio
+import zlib
+
+import numpy as np
+import pytest
+from pdf_processing import ingestion_pipeline
+from pdf_processing.ingestion_pipeline import IngestionPipeline
+from utils.inference_executor import InferenceExecutor
+from vector_db.bm25_index import BM25Index
+from vector_db.local_index import LocalVectorIndex
+
+
+def fake_count_pages(file_path):
+    return 40
+
+
+def fake_extract_pages(file_path, filename, start, end):
+    return [
+        {
+            "id": f"{filename}_p{page + 1}",
+            "text": f"página {page + 1} de {filename}",
+            "metadata": {"content": f"página {page + 1} de {filename}", "source": filename, "page": page + 1}
+        }
+        for page in range(start, min(end, 40))
+    ]
+
+
+class FakeEmbedder:
+    async def aencode(self, texts):
+        await asyncio.sleep(0.001)
+        return np.ones((len(texts), 8), dtype=np.float32)
+
+
+def test_pipeline_indexes_every_page(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion_pipeline, "count_pdf_pages", fake_count_pages)
+    monkeypatch.setattr(ingestion_pipeline, "extract_pdf_pages", fake_extract_pages)
+    for name in ("a.pdf", "b.pdf"):
+        (tmp_path / name).write_bytes(b"%PDF")
+
+    index = LocalVectorIndex(dimension=8)
+    sparse_index = BM25Index()
+    pipeline = IngestionPipeline(
+        index, FakeEmbedder(), str(tmp_path), pages_per_task=7, queue_size=4,
+        embed_batch_size=5, upsert_batch_size=3, upsert_concurrency=2, sparse_index=sparse_index
+    )
+    pipeline.extractor = InferenceExecutor("test_extraction", kind="thread", max_workers=2)
+
+    results = asyncio.run(pipeline.run(["a.pdf", "b.pdf"]))
+
+    assert results == {"a.pdf": 40, "b.pdf": 40}
+    assert index.describe_index_stats()["total_vector_count"] == 80
+    assert sparse_index.describe_index_stats()["total_document_count"] == 80
+    assert sparse_index.query("página 17 de b.pdf")["matches"][0]["id"] == "b.pdf_p17"
+    assert not list(tmp_path.iterdir())
+    assert pipeline.last_run["stages"]["upsert"]["items"] == 80
+
+
+class HashingEmbedder:
+    """Bolsa de palabras por hashing: textos iguales dan el mismo vector."""
+
+    async def aencode(self, texts):
+        single = isinstance(texts, str)
+        vectors = np.zeros((1 if single else len(texts), 384), dtype=np.float32)
+        for row, text in enumerate([texts] if single else texts):
+            for word in text.split():
+                vectors[row, zlib.crc32(word.encode("utf-8")) % 384] += 1.0
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors[0] if single else vectors
+
+
+def test_ingested_pages_are_retrieved_by_the_assistant(tmp_path, monkeypatch):
+    pytest.importorskip("transformers")
+    from config.config import settings
+    from models.language_model import EnhancedAIAssistant
+    from pdf_processing.ingestion_pipeline import create_pipeline
+    from utils.inference_executor import get_vector_io_executor
+    from vector_db import backends
+
+    # Índices en memoria nuevos para no compartir estado con otros tests
+    monkeypatch.setattr(backends, "_indexes", {})
+    monkeypatch.setattr(backends, "_sparse_indexes", {})
+    monkeypatch.setattr(ingestion_pipeline, "count_pdf_pages", fake_count_pages)
+    monkeypatch.setattr(ingestion_pipeline, "extract_pdf_pages", fake_extract_pages)
+    (tmp_path / "a.pdf").write_bytes(b"%PDF")
+    embedder = HashingEmbedder()
+
+    # Mismo índice y namespace que usa la ruta /process-pdfs
+    pipeline = create_pipeline(
+        backends.get_vector_index(settings.KNOWLEDGE_INDEX_NAME), embedder, str(tmp_path),
+        sparse_index=backends.get_sparse_index(settings.KNOWLEDGE_INDEX_NAME)
+    )
+    pipeline.extractor = InferenceExecutor("test_extraction", kind="thread", max_workers=2)
+    assert asyncio.run(pipeline.run(["a.pdf"])) == {"a.pdf": 40}
+
+    assistant = object.__new__(EnhancedAIAssistant)
+    assistant.embedder = embedder
+    assistant.index_executor = get_vector_io_executor()
+    assistant._setup_vector_db()
+    state = {"input": "página 17 de a.pdf", "user_id": "573000000001"}
+    context = asyncio.run(assistant.retrieve_context(state))["context"]
+
+    assert context.splitlines()[0] == "- página 17 de a.pdf"
+    # Las dos búsquedas contribuyeron: la léxica también encuentra las páginas ingeridas
+    sparse_matches = backends.get_sparse_index(settings.KNOWLEDGE_INDEX_NAME).query(
+        "página 17", namespace=settings.KNOWLEDGE_NAMESPACE
+    )["matches"]
+    assert sparse_matches[0]["id"] == "a.pdf_p17"
+    assert assistant.retriever.stats()["errors"] == 0
@@ -0,0 +1,58 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from models.llm_loader import load_causal_lm, load_draft_model
+
+
+def _save_tiny_llama(path, vocab_size=100, num_hidden_layers=2):
+    torch.manual_seed(0)
+    config = transformers.LlamaConfig(
+        vocab_size=vocab_size, hidden_size=32, intermediate_size=64, num_hidden_layers=num_hidden_layers,
+        num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=256,
+        bos_token_id=1, eos_token_id=99, pad_token_id=0
+    )
+    transformers.LlamaForCausalLM(config).save_pretrained(path)
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def tiny_model_path(tmp_path_factory):
+    return _save_tiny_llama(tmp_path_factory.mktemp("tiny-llama"))
+
+
+def test_precision_modes(tiny_model_path):
+    input_ids = torch.tensor([[1, 5, 6, 7, 8]])
+
+    bf16 = load_causal_lm(tiny_model_path, precision="bf16")
+    assert next(bf16.parameters()).dtype == torch.bfloat16
+
+    int8 = load_causal_lm(tiny_model_path, precision="int8")
+    assert isinstance(int8.model.layers[0].mlp.up_proj, torch.ao.nn.quantized.dynamic.Linear)
+
+    for model in (load_causal_lm(tiny_model_path), bf16, int8):
+        output = model.generate(input_ids, max_new_tokens=4, min_new_tokens=4, do_sample=False)
+        assert output.shape == (1, 9)
+
+
+def test_unknown_precision_is_rejected(tiny_model_path):
+    with pytest.raises(ValueError):
+        load_causal_lm(tiny_model_path, precision="fp8")
+
+
+def test_draft_model_speculative_greedy_matches_target(tiny_model_path, tmp_path):
+    target = load_causal_lm(tiny_model_path)
+    draft = load_draft_model(target, _save_tiny_llama(tmp_path / "draft", num_hidden_layers=1), num_assistant_tokens=3)
+    assert draft.generation_config.num_assistant_tokens == 3
+
+    input_ids = torch.tensor([[1, 5, 6, 7, 8]])
+    kwargs = dict(attention_mask=torch.ones_like(input_ids), max_new_tokens=12, do_sample=False)
+    expected = target.generate(input_ids, **kwargs)
+    assert torch.equal(target.generate(input_ids, assistant_model=draft, **kwargs), expected)
+
+
+def test_draft_model_with_other_vocabulary_is_rejected(tiny_model_path, tmp_path):
+    target = load_causal_lm(tiny_model_path)
+    with pytest.raises(ValueError):
+        load_draft_model(target, _save_tiny_llama(tmp_path / "draft", vocab_size=120))
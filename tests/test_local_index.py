@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+from vector_db.local_index import LocalVectorIndex, matches_filter
+
+
+def _random_vectors(n, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def test_exact_query_returns_nearest_first():
+    index = LocalVectorIndex(dimension=16)
+    vectors = _random_vectors(50)
+    index.upsert(
+        vectors=[{"id": f"v{i}", "values": v.tolist(), "metadata": {"page": i}} for i, v in enumerate(vectors)],
+        namespace="courses"
+    )
+
+    results = index.query(vector=vectors[7].tolist(), top_k=3, include_metadata=True, namespace="courses")
+
+    assert results["matches"][0]["id"] == "v7"
+    assert results["matches"][0]["metadata"] == {"page": 7}
+    assert results["matches"][0]["score"] == pytest.approx(1.0, abs=1e-5)
+    assert len(results["matches"]) == 3
+
+
+def test_upsert_replaces_and_delete_removes():
+    index = LocalVectorIndex(dimension=16)
+    vectors = _random_vectors(3)
+    index.upsert(vectors=[("a", vectors[0].tolist()), ("b", vectors[1].tolist())])
+    index.upsert(vectors=[("a", vectors[2].tolist(), {"v": 2})])
+    index.delete(ids=["b"])
+
+    results = index.query(vector=vectors[2].tolist(), top_k=5, include_metadata=True)
+
+    assert [m["id"] for m in results["matches"]] == ["a"]
+    assert results["matches"][0]["metadata"] == {"v": 2}
+    assert index.describe_index_stats()["total_vector_count"] == 1
+
+
+def test_metadata_filter():
+    assert matches_filter({"page": 3, "source": "a.pdf"}, {"page": {"$gte": 2}, "source": "a.pdf"})
+    assert not matches_filter({"page": 1}, {"page": {"$gt": 1}})
+    assert matches_filter({"tag": "x"}, {"$or": [{"tag": "y"}, {"tag": {"$in": ["x"]}}]})
+
+
+def test_memmap_persistence(tmp_path):
+    vectors = _random_vectors(2000, seed=1)
+    index = LocalVectorIndex(dimension=16, path=str(tmp_path))
+    index.upsert(vectors=[(f"v{i}", v.tolist()) for i, v in enumerate(vectors)])
+
+    reopened = LocalVectorIndex(dimension=16, path=str(tmp_path))
+    results = reopened.query(vector=vectors[1999].tolist(), top_k=1)
+
+    assert results["matches"][0]["id"] == "v1999"
+
+
+def test_persistence_appends_only_each_batch(tmp_path):
+    vectors = _random_vectors(30, seed=3)
+    index = LocalVectorIndex(dimension=16, path=str(tmp_path))
+    for start in range(0, 30, 10):
+        index.upsert(vectors=[(f"v{i}", vectors[i].tolist(), {"page": i}) for i in range(start, start + 10)])
+    log_file = tmp_path / "_default.jsonl"
+    assert len(log_file.read_text().splitlines()) == 30
+
+    index.upsert(vectors=[("v0", vectors[0].tolist(), {"page": 100})])
+    index.delete(ids=["v1"])
+    assert len(log_file.read_text().splitlines()) == 32
+
+    reopened = LocalVectorIndex(dimension=16, path=str(tmp_path))
+    results = reopened.query(vector=vectors[0].tolist(), top_k=1, include_metadata=True)
+    assert results["matches"][0]["metadata"] == {"page": 100}
+    assert reopened.query(vector=vectors[1].tolist(), top_k=1)["matches"][0]["id"] != "v1"
+    assert reopened.describe_index_stats()["total_vector_count"] == 29
+
+
+def test_partially_written_index_loads(tmp_path):
+    vectors = _random_vectors(4, seed=4)
+    index = LocalVectorIndex(dimension=16, path=str(tmp_path))
+    index.upsert(vectors=[(f"v{i}", vectors[i].tolist()) for i in range(3)])
+    # Caída a mitad de anexar un registro
+    with open(tmp_path / "_default.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"id": "v3", "meta')
+
+    reopened = LocalVectorIndex(dimension=16, path=str(tmp_path))
+    assert reopened.describe_index_stats()["total_vector_count"] == 3
+    reopened.upsert(vectors=[("v3", vectors[3].tolist())])
+    assert LocalVectorIndex(dimension=16, path=str(tmp_path)).describe_index_stats()["total_vector_count"] == 4
+
+    # Log sin matriz: el namespace arranca vacío en lugar de fallar
+    (tmp_path / "_default.f32").unlink()
+    empty = LocalVectorIndex(dimension=16, path=str(tmp_path))
+    assert empty.describe_index_stats()["total_vector_count"] == 0
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_ivf_recall_matches_exact():
+    vectors = _random_vectors(4096, seed=2)
+    exact = LocalVectorIndex(dimension=16)
+    ivf = LocalVectorIndex(dimension=16, mode="ivf", nprobe=16)
+    payload = [(f"v{i}", v.tolist()) for i, v in enumerate(vectors)]
+    exact.upsert(vectors=payload)
+    ivf.upsert(vectors=payload)
+
+    hits = 0
+    for q in vectors[:20]:
+        expected = {m["id"] for m in exact.query(vector=q.tolist(), top_k=10)["matches"]}
+        found = {m["id"] for m in ivf.query(vector=q.tolist(), top_k=10)["matches"]}
+        hits += len(expected & found)
+
+    assert hits / 200 >= 0.8
+
+
+def test_ivf_reupsert_moves_row_to_its_new_list():
+    vectors = _random_vectors(4096, seed=5)
+    index = LocalVectorIndex(dimension=16, mode="ivf", nprobe=1)
+    index.upsert(vectors=[(f"v{i}", v.tolist()) for i, v in enumerate(vectors)])
+    searcher = index._searchers[""]
+    row = index._namespaces[""].rows["v0"]
+
+    moved = -vectors[0]
+    index.upsert(vectors=[("v0", moved.tolist())])
+
+    assert sum(row in members for members in searcher.lists) == 1
+    assert row in searcher.lists[searcher.assignment[row]]
+    assert index.query(vector=moved.tolist(), top_k=1)["matches"][0]["id"] == "v0"
+    assert "v0" not in {m["id"] for m in index.query(vector=vectors[0].tolist(), top_k=10)["matches"]}
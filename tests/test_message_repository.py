@@ -0,0 +1,55 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from bson import ObjectId
+
+from repositories.message_repository import HISTORY_PROJECTION, MessageRepository
+
+
+def _repository(documents):
+    cursor = MagicMock()
+    cursor.sort.return_value = cursor
+    cursor.limit.return_value = cursor
+    cursor.to_list = AsyncMock(return_value=documents)
+    collection = MagicMock()
+    collection.find.return_value = cursor
+    collection.create_index = AsyncMock()
+    database = MagicMock()
+    database.__getitem__.return_value = collection
+    return MessageRepository(database), collection, cursor
+
+
+def test_keyset_page_uses_projection_and_skips_models():
+    newest, oldest = ObjectId(), ObjectId()
+    documents = [
+        {"_id": newest, "role": "assistant", "text": {"body": "Hola, ¿en qué te ayudo?"}, "timestamp": "1700000001"},
+        {"_id": oldest, "role": "user", "text": {"body": "Hola"}, "timestamp": "1700000000"},
+    ]
+    repository, collection, cursor = _repository(documents)
+
+    page = asyncio.run(repository.get_messages_by_number("573001", limit=2, raw=True))
+    assert page is documents
+
+    cursor_value = repository.page_cursor(page[-1])
+    asyncio.run(repository.get_messages_by_number("573001", limit=2, before=cursor_value, raw=True))
+    query, projection = collection.find.call_args.args
+    assert projection == HISTORY_PROJECTION
+    assert query["from_number"] == "573001"
+    assert query["$or"] == [
+        {"timestamp": {"$lt": "1700000000"}},
+        {"timestamp": "1700000000", "_id": {"$lt": oldest}},
+    ]
+    cursor.sort.assert_called_with([("timestamp", -1), ("_id", -1)])
+
+    history = asyncio.run(repository.get_history("573001", limit=2))
+    assert history == [
+        {"role": "user", "text": "Hola"},
+        {"role": "assistant", "text": "Hola, ¿en qué te ayudo?"},
+    ]
+
+
+def test_history_index_matches_query_shape():
+    repository, collection, _ = _repository([])
+    asyncio.run(repository.ensure_indexes())
+    keys = collection.create_index.await_args.args[0]
+    assert keys == [("from_number", 1), ("timestamp", -1), ("_id", -1)]
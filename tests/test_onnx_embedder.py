@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+
+from models.onnx_embedder import OnnxSentenceEncoder
+
+TEXTS = [
+    "hola, ¿cuál es el precio del curso?",
+    "horario de atención",
+    "necesito ayuda con mi pedido de python y datos",
+    "a",
+]
+
+
+@pytest.fixture(scope="module")
+def tiny_bert_path(tmp_path_factory):
+    """BERT aleatorio pequeño con vocabulario propio (sin acceso al hub)."""
+    path = tmp_path_factory.mktemp("tiny-bert")
+    words = "hola cuál es el precio del curso horario de atención necesito ayuda con mi pedido python y datos a".split()
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", ",", "¿", "?"] + words
+    (path / "vocab.txt").write_text("\n".join(vocab), encoding="utf-8")
+    transformers.BertTokenizerFast(vocab_file=str(path / "vocab.txt")).save_pretrained(path)
+
+    torch.manual_seed(0)
+    config = transformers.BertConfig(
+        vocab_size=len(vocab), hidden_size=32, intermediate_size=64, num_hidden_layers=2,
+        num_attention_heads=4, max_position_embeddings=64
+    )
+    transformers.BertModel(config).save_pretrained(path)
+    return str(path)
+
+
+def _torch_reference(model_path, texts):
+    """Embeddings de PyTorch con el pooling de SentenceTransformer (media + normalización)."""
+    tokenizer = transformers.AutoTokenizer.from_pretrained(model_path)
+    model = transformers.AutoModel.from_pretrained(model_path).eval()
+    encoded = tokenizer(texts, padding=True, truncation=True, return_tensors="pt")
+    with torch.no_grad():
+        hidden = model(**encoded).last_hidden_state
+    mask = encoded["attention_mask"].unsqueeze(-1).float()
+    pooled = (hidden * mask).sum(1) / mask.sum(1)
+    return torch.nn.functional.normalize(pooled, dim=-1).numpy()
+
+
+@pytest.mark.parametrize("quantize, min_cosine", [(False, 0.9999), (True, 0.98)])
+def test_onnx_matches_pytorch(tiny_bert_path, tmp_path, quantize, min_cosine):
+    encoder = OnnxSentenceEncoder(tiny_bert_path, export_dir=str(tmp_path), quantize=quantize, num_threads=1)
+    reference = _torch_reference(tiny_bert_path, TEXTS)
+
+    # Lotes pequeños: el padding distinto por lote no debe alterar los vectores
+    vectors = encoder.encode(TEXTS, batch_size=3)
+
+    assert vectors.shape == reference.shape and vectors.dtype == np.float32
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-5)
+    cosines = (vectors * reference).sum(axis=1)
+    assert cosines.min() >= min_cosine
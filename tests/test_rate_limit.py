@@ -0,0 +1,41 @@
+import asyncio
+import pytest
+from api.rate_limit import SlidingWindowRateLimiter
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # fakeredis necesita lupa para ejecutar scripts Lua
+
+
+def test_sliding_window_limit_is_enforced_and_expires():
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    limiter = SlidingWindowRateLimiter(redis, limit=3, window_seconds=0.2)
+
+    async def run():
+        results = await asyncio.gather(*(limiter.admit("573001") for _ in range(5)))
+        assert [r.allowed for r in results].count(True) == 3
+        assert await redis.pttl(limiter.key("573001")) > 0
+
+        await asyncio.sleep(0.25)
+        assert (await limiter.admit("573001")).allowed
+        assert (await limiter.admit("otro")).allowed
+
+    asyncio.run(run())
+
+
+def test_cache_probe_in_same_round_trip():
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    limiter = SlidingWindowRateLimiter(redis, limit=10)
+
+    async def run():
+        miss = await limiter.admit("573001", exact_key="exact", semantic_key="semantic")
+        assert miss.allowed and miss.cached_response is None and miss.semantic_entries == []
+
+        await redis.lpush("semantic", "a", "b")
+        semantic = await limiter.admit("573001", exact_key="exact", semantic_key="semantic")
+        assert semantic.semantic_entries == ["b", "a"]
+
+        await redis.set("exact", "respuesta")
+        exact = await limiter.admit("573001", exact_key="exact", semantic_key="semantic")
+        assert exact.cached_response == "respuesta"
+
+    asyncio.run(run())
@@ -0,0 +1,52 @@
+import asyncio
+import numpy as np
+import pytest
+from api.response_cache import SemanticResponseCache
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+class KeywordEmbedder:
+    """Embeddings deterministas: un eje por palabra clave conocida."""
+    vocabulary = ["precio", "curso", "horario", "python"]
+
+    async def aencode(self, text):
+        words = text.lower().replace("?", "").replace("¿", "").split()
+        vector = np.array([float(word in words) for word in self.vocabulary], dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+
+def _cache(**kwargs):
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    return SemanticResponseCache(redis, KeywordEmbedder(), **kwargs)
+
+
+def test_exact_and_semantic_hits():
+    cache = _cache(similarity_threshold=0.9)
+
+    async def run():
+        await cache.set("¿Precio del curso python?", "prompt", "573001", "Cuesta 100 USD")
+        exact = await cache.get("¿precio del  curso PYTHON?", "prompt", "573001")
+        semantic = await cache.get("curso python precio", "prompt", "573001")
+        miss = await cache.get("horario del curso", "prompt", "573001")
+        return exact, semantic, miss
+
+    exact, semantic, miss = asyncio.run(run())
+
+    assert exact == "Cuesta 100 USD"
+    assert semantic == "Cuesta 100 USD"
+    assert miss is None
+    assert cache.stats() == {"exact_hits": 1, "semantic_hits": 1, "misses": 1, "hit_ratio": 2 / 3}
+
+
+def test_entries_are_scoped_by_prompt_and_user():
+    cache = _cache()
+
+    async def run():
+        await cache.set("precio curso", "prompt A", "1", "respuesta A")
+        return (
+            await cache.get("precio curso", "prompt B", "1"),
+            await cache.get("precio curso", "prompt A", "2"),
+        )
+
+    assert asyncio.run(run()) == (None, None)
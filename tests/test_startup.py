@@ -0,0 +1,48 @@
+import json
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_BUDGET_SECONDS = 3.0
+HEAVY_MODULES = ["torch", "transformers", "sentence_transformers", "pinecone", "langgraph", "pdfplumber"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import backend.main
+elapsed = time.perf_counter() - start
+from config.config import get_settings
+print(json.dumps({
+    "elapsed": elapsed,
+    "heavy": [m for m in %r if m in sys.modules],
+    "settings_loaded": get_settings.cache_info().currsize > 0,
+}))
+""" % (HEAVY_MODULES,)
+
+
+def test_import_is_fast_and_side_effect_free():
+    # Sin variables de entorno: importar la aplicación no debe validar configuración ni cargar modelos
+    env = {"PATH": os.environ.get("PATH", ""), "PYTHONPATH": ROOT}
+    result = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=env, capture_output=True, text=True,
+                            timeout=60)
+    assert result.returncode == 0, result.stderr
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert probe["heavy"] == []
+    assert not probe["settings_loaded"]
+    assert probe["elapsed"] < IMPORT_BUDGET_SECONDS
+
+
+def test_ready_reports_warm_up_state():
+    from backend.main import app
+
+    client = TestClient(app)  # Sin `with`: no se ejecuta el lifespan
+    assert client.get("/ready").status_code == 503
+    app.state.ready = True
+    try:
+        assert client.get("/ready").json() == {"status": "ready"}
+    finally:
+        app.state.ready = False
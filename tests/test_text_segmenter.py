@@ -0,0 +1,61 @@
+import asyncio
+import pytest
+
+from utils.text_segmenter import SentenceSegmenter
+
+
+def _segment(chunks, **kwargs):
+    segmenter = SentenceSegmenter(**kwargs)
+    segments = []
+    for chunk in chunks:
+        segments.extend(segmenter.feed(chunk))
+    last = segmenter.flush()
+    return segments + ([last] if last else [])
+
+
+def test_segmenter_splits_sentences_and_paragraphs_as_they_complete():
+    segmenter = SentenceSegmenter(min_chars=10)
+    assert segmenter.feed("El curso dura ocho sem") == []
+    assert segmenter.feed("anas. Cuesta") == ["El curso dura ocho semanas."]
+    assert segmenter.feed(" 200 USD\n\nIncluye") == ["Cuesta 200 USD"]
+    assert segmenter.flush() == "Incluye"
+
+
+def test_segmenter_merges_short_sentences_and_keeps_decimals():
+    text = "Sí. Claro. El precio es 3.5 millones. ¿Algo más?"
+    words = [w + " " for w in text.split(" ")]
+    assert _segment(words, min_chars=20) == ["Sí. Claro. El precio es 3.5 millones.", "¿Algo más?"]
+
+
+def test_segmenter_forces_cut_on_long_text_without_punctuation():
+    segments = _segment(["palabra " * 50], min_chars=10, max_chars=60)
+    assert all(len(s) <= 60 for s in segments)
+    assert " ".join(segments).split() == ["palabra"] * 50
+
+
+def test_async_streamer_yields_words_and_propagates_errors():
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("transformers")
+    from models.streaming import AsyncTextStreamer
+
+    class SpaceTokenizer:
+        def decode(self, ids, **kwargs):
+            return " ".join(f"t{i}" for i in ids)
+
+    async def run():
+        streamer = AsyncTextStreamer(SpaceTokenizer())
+        for token in range(3):
+            streamer.put(torch.tensor([token]))
+        streamer.end()
+        texts = [text async for text in streamer]
+
+        failing = AsyncTextStreamer(SpaceTokenizer())
+        failing.fail(RuntimeError("sin memoria"))
+        with pytest.raises(RuntimeError):
+            async for _ in failing:
+                pass
+        return texts
+
+    texts = asyncio.run(run())
+    assert "".join(texts) == "t0 t1 t2"
+    assert len(texts) > 1
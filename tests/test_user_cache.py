@@ -0,0 +1,118 @@
+import asyncio
+import pytest
+from models.model import SystemPromptModel
+from models.user_cache import UserCache
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+class FakeUserDB:
+    def __init__(self):
+        self.prompts = {"573001": "Responde en inglés"}
+        self.calls = 0
+
+    async def get_system_prompt(self, user_id):
+        self.calls += 1
+        await asyncio.sleep(0)
+        instruction = self.prompts.get(user_id)
+        return SystemPromptModel(user_id=user_id, instruction=instruction) if instruction else None
+
+
+def test_hits_skip_mongo_and_stale_entries_refresh_in_background():
+    user_db = FakeUserDB()
+    cache = UserCache(user_db, ttl=60)
+
+    async def run():
+        first, second, missing = await asyncio.gather(
+            cache.get_system_prompt("573001"),
+            cache.get_system_prompt("573001"),
+            cache.get_system_prompt("otro")
+        )
+        assert first.instruction == second.instruction == "Responde en inglés"
+        assert missing is None
+        assert user_db.calls == 2  # Consultas concurrentes de la misma clave se agrupan
+
+        await cache.get_system_prompt("otro")
+        assert user_db.calls == 2
+
+        cache.ttl = 0
+        cache._store(cache.prompt_key("573001"), first)
+        user_db.prompts["573001"] = "Nuevo prompt"
+        stale = await cache.get_system_prompt("573001")
+        assert stale.instruction == "Responde en inglés"
+        await asyncio.sleep(0.01)
+        assert cache._entries[cache.prompt_key("573001")][1].instruction == "Nuevo prompt"
+
+    asyncio.run(run())
+
+
+def test_invalidation_reaches_other_workers():
+    server = fakeredis.FakeServer()
+    user_db = FakeUserDB()
+    writer, reader = UserCache(user_db), UserCache(user_db)
+
+    async def run():
+        redis = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+        await reader.start(fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+        await asyncio.sleep(0.05)
+
+        assert (await reader.get_system_prompt("573001")).instruction == "Responde en inglés"
+        user_db.prompts["573001"] = "Nuevo prompt"
+        await writer.publish_invalidation(redis, writer.prompt_key("573001"))
+        await asyncio.sleep(0.05)
+
+        assert (await reader.get_system_prompt("573001")).instruction == "Nuevo prompt"
+        assert reader.stats()["invalidations"] == 1
+        await reader.stop()
+
+    asyncio.run(run())
+
+
+def test_invalidation_during_load_discards_the_stale_result():
+    user_db = FakeUserDB()
+    cache = UserCache(user_db, ttl=60)
+    release = asyncio.Event()
+    original = user_db.get_system_prompt
+
+    async def slow_get_system_prompt(user_id):
+        instruction = user_db.prompts.get(user_id)
+        await release.wait()
+        return SystemPromptModel(user_id=user_id, instruction=instruction)
+
+    async def run():
+        user_db.get_system_prompt = slow_get_system_prompt
+        in_flight = asyncio.ensure_future(cache.get_system_prompt("573001"))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+        # La escritura llega mientras la consulta anterior sigue en curso
+        user_db.prompts["573001"] = "Nuevo prompt"
+        cache.invalidate(cache.prompt_key("573001"))
+        release.set()
+        assert (await in_flight).instruction == "Responde en inglés"
+        assert cache.prompt_key("573001") not in cache._entries
+
+        user_db.get_system_prompt = original
+        assert (await cache.get_system_prompt("573001")).instruction == "Nuevo prompt"
+        assert (await cache.get_system_prompt("573001")).instruction == "Nuevo prompt"
+        assert cache._generations == {} and cache._fetching == {}
+
+    asyncio.run(run())
+
+
+def test_resubscribing_tells_listeners_to_drop_everything():
+    server = fakeredis.FakeServer()
+    cache = UserCache(FakeUserDB())
+    dropped = []
+    cache.add_listener(dropped.append)
+
+    async def run():
+        await cache.get_system_prompt("573001")
+        # Al (re)suscribirse pudo perderse cualquier invalidación
+        await cache.start(fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+        await asyncio.sleep(0.05)
+        await cache.stop()
+
+    asyncio.run(run())
+    assert dropped == ["*"]
+    assert cache.stats()["entries"] == 0 and cache.stats()["invalidations"] == 0
@@ -0,0 +1,45 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from config.database import MongoDB
+from models.user_model import UserDB
+from repositories.message_repository import MessageRepository
+
+
+def _fake_database():
+    collections = {}
+
+    def get_collection(name):
+        if name not in collections:
+            collection = MagicMock()
+            collection.update_one = AsyncMock()
+            collection.find_one = AsyncMock(return_value=None)
+            collections[name] = collection
+        return collections[name]
+
+    database = MagicMock()
+    database.__getitem__.side_effect = get_collection
+    return database, collections
+
+
+def test_user_db_awaits_writes_on_separate_collections():
+    database, collections = _fake_database()
+    user_db = UserDB(database)
+
+    asyncio.run(user_db.save_user({"name": "Ana", "email": "ana@example.com", "phone": "+573001234567"}))
+    asyncio.run(user_db.save_system_prompt({"user_id": "573001234567", "instruction": "Sé breve"}))
+
+    collections["users"].update_one.assert_awaited_once()
+    collections["system_promt"].update_one.assert_awaited_once()
+    assert asyncio.run(user_db.get_system_prompt("otro")) is None
+
+
+def test_repositories_share_one_client():
+    mongo = MongoDB()
+    database = mongo.get_database()
+
+    assert MessageRepository(mongo.get_database()).db is database
+    assert UserDB(mongo.get_database()).db is database
+    assert mongo.client.options.pool_options.max_pool_size == 50
+    asyncio.run(mongo.close_database_connection())
+    assert mongo.client is None
@@ -0,0 +1,177 @@
+import asyncio
+import numpy as np
+import pytest
+
+from api import whatsapp
+from api.rate_limit import SlidingWindowRateLimiter
+from api.response_cache import SemanticResponseCache
+from api.whatsapp import WhatsAppService
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+class FakeResponse:
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"messages": [{"id": "wamid.out"}]}
+
+
+class RecordingClient:
+    def __init__(self):
+        self.bodies = []
+
+    async def post(self, url, headers=None, json=None):
+        self.bodies.append(json["text"]["body"])
+        return FakeResponse()
+
+
+def test_identical_replies_to_different_messages_are_all_sent(monkeypatch):
+    client = RecordingClient()
+    monkeypatch.setattr(whatsapp, "get_http_client", lambda: client)
+    service = object.__new__(WhatsAppService)
+    service.redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    service.base_url = "http://graph.test/messages"
+    service.headers = {}
+
+    async def run():
+        # Misma respuesta (p. ej. de la caché) a dos mensajes distintos del mismo usuario
+        await service.send_message("573001", "El horario es de 8 a 18.", reply_key="wamid.1:0")
+        await service.send_message("573001", "El horario es de 8 a 18.", reply_key="wamid.2:0")
+        # Redelivery del primer mensaje: su segmento 0 ya se envió
+        repeated = await service.send_message("573001", "El horario es de 8 a 18.", reply_key="wamid.1:0")
+        # Frases repetidas dentro de una misma respuesta son segmentos distintos
+        await service.send_message("573001", "Gracias.", reply_key="wamid.3:0")
+        await service.send_message("573001", "Gracias.", reply_key="wamid.3:1")
+        return repeated
+
+    repeated = asyncio.run(run())
+
+    assert repeated == {"status": "already_sent"}
+    assert client.bodies == ["El horario es de 8 a 18."] * 2 + ["Gracias."] * 2
+
+
+class KeywordEmbedder:
+    vocabulary = ["precio", "curso", "horario", "python"]
+
+    async def aencode(self, text):
+        words = text.lower().replace("?", "").replace("¿", "").split()
+        vector = np.array([float(word in words) for word in self.vocabulary], dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+
+class FakeAssistant:
+    """Asistente falso: responde siempre `response` con la validez indicada."""
+
+    def __init__(self, response, valid=True, timed_out=False):
+        self.response = response
+        self.valid = valid
+        self.timed_out = timed_out
+        self.calls = 0
+
+    async def resolve_system_prompt(self, user_id):
+        return "Eres un asistente"
+
+    async def process_query(self, user_input, user_id, system_prompt=None, outcome=None):
+        self.calls += 1
+        outcome.response, outcome.valid, outcome.timed_out = self.response, self.valid, self.timed_out
+        return self.response
+
+    async def stream_query(self, user_input, user_id, system_prompt=None, outcome=None):
+        self.calls += 1
+        for word in self.response.split(" "):
+            yield word + " "
+        outcome.response, outcome.valid, outcome.timed_out = self.response, self.valid, self.timed_out
+
+
+class NullRepository:
+    def __init__(self):
+        self.messages = []
+
+    async def add_message(self, message):
+        self.messages.append(message)
+
+
+def _service(assistant):
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    service = object.__new__(WhatsAppService)
+    service.redis = redis
+    service.response_generator = assistant
+    service.message_repository = NullRepository()
+    service.response_cache = SemanticResponseCache(redis, KeywordEmbedder(), similarity_threshold=0.9)
+    service.rate_limiter = SlidingWindowRateLimiter(redis, limit=100)
+    return service
+
+
+def _ask(service, body, message_id):
+    return service.process_incoming_message({"from": "573001", "id": message_id, "text": {"body": body}})
+
+
+@pytest.mark.parametrize("assistant", [
+    FakeAssistant("No se pudo generar respuesta", valid=False),
+    FakeAssistant("no sé la respuesta, pregunta de nuevo más tarde", valid=False),
+    FakeAssistant("El curso de python cuesta 100 USD y dura 40 horas", valid=False, timed_out=True),
+])
+def test_fallback_and_invalid_answers_are_not_cached(assistant):
+    service = _service(assistant)
+
+    async def run():
+        await _ask(service, "¿Precio del curso python?", "wamid.1")
+        await _ask(service, "¿Precio del curso python?", "wamid.2")
+        await _ask(service, "curso python precio", "wamid.3")
+
+    asyncio.run(run())
+    assert assistant.calls == 3
+
+
+def test_valid_answers_are_cached():
+    assistant = FakeAssistant("El curso de python cuesta 100 USD y dura 40 horas")
+    service = _service(assistant)
+
+    async def run():
+        first = await _ask(service, "¿Precio del curso python?", "wamid.1")
+        second = await _ask(service, "curso python precio", "wamid.2")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second == assistant.response
+    assert assistant.calls == 1
+
+
+def test_stream_cut_by_deadline_is_sent_but_not_cached():
+    # El stream se cortó tras la primera frase: lo enviado queda, pero no se cachea
+    assistant = FakeAssistant("El curso de python dura 40 horas.", valid=False, timed_out=True)
+    service = _service(assistant)
+    sent = []
+
+    async def on_segment(segment):
+        sent.append(segment)
+
+    async def run():
+        for message_id in ("wamid.1", "wamid.2"):
+            await service.process_incoming_message(
+                {"from": "573001", "id": message_id, "text": {"body": "¿horario del curso python?"}},
+                on_segment=on_segment
+            )
+
+    asyncio.run(run())
+    assert assistant.calls == 2
+    assert " ".join(sent).count("40 horas") == 2
+    assert [m["role"] for m in service.message_repository.messages] == ["user", "assistant"] * 2
+
+
+def test_empty_answer_is_not_recorded_as_assistant_turn():
+    assistant = FakeAssistant("", valid=False)
+    service = _service(assistant)
+
+    async def on_segment(segment):
+        raise AssertionError("no hay texto que enviar")
+
+    async def run():
+        return await service.process_incoming_message(
+            {"from": "573001", "id": "wamid.1", "text": {"body": "hola"}}, on_segment=on_segment
+        )
+
+    assert asyncio.run(run()) == "No se pudo generar respuesta"
+    assert [m["role"] for m in service.message_repository.messages] == ["user"]
@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+from api.work_queue import MessageQueue
+from api.worker import handle_message
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def _queue(**kwargs):
+    return MessageQueue(fakeredis.FakeAsyncRedis(decode_responses=True), **kwargs)
+
+
+def test_enqueue_discards_meta_retries():
+    queue = _queue()
+
+    async def run():
+        await queue.ensure_group()
+        first = await queue.enqueue({"id": "wamid.1", "from": "573001", "text": {"body": "hola"}})
+        retry = await queue.enqueue({"id": "wamid.1", "from": "573001", "text": {"body": "hola"}})
+        messages = await queue.read("c1", count=10, block_ms=10)
+        return first, retry, messages
+
+    first, retry, messages = asyncio.run(run())
+
+    assert first is not None
+    assert retry is None
+    assert [m.payload["id"] for m in messages] == ["wamid.1"]
+
+
+def test_failed_enqueue_does_not_mark_message_as_seen():
+    queue = _queue()
+
+    async def run():
+        # El XADD falla (la clave del stream tiene otro tipo): el reintento de Meta debe encolarse
+        await queue.redis.set(queue.stream, "no es un stream")
+        with pytest.raises(Exception):
+            await queue.enqueue({"id": "wamid.9", "from": "573001", "text": {"body": "hola"}})
+        seen = await queue.redis.exists("whatsapp:seen:wamid.9")
+        await queue.redis.delete(queue.stream)
+        await queue.ensure_group()
+        retry = await queue.enqueue({"id": "wamid.9", "from": "573001", "text": {"body": "hola"}})
+        return seen, retry
+
+    seen, retry = asyncio.run(run())
+
+    assert seen == 0
+    assert retry is not None
+
+
+def test_unacked_message_is_redelivered_then_dead_lettered():
+    queue = _queue(visibility_timeout_ms=0, max_deliveries=2)
+
+    class FailingService:
+        sent = []
+
+        async def reply(self, msg):
+            raise RuntimeError("modelo no disponible")
+
+        async def send_message(self, to, message):
+            self.sent.append((to, message))
+
+    service = FailingService()
+
+    async def run():
+        await queue.ensure_group()
+        await queue.enqueue({"id": "wamid.2", "from": "573001", "text": {"body": "hola"}})
+        first = (await queue.read("c1", block_ms=10))[0]
+        await handle_message(first, queue, service)
+        second = (await queue.read("c2", block_ms=10))[0]
+        await handle_message(second, queue, service)
+        return first, second, await queue.stats()
+
+    first, second, stats = asyncio.run(run())
+
+    assert (first.deliveries, second.deliveries) == (1, 2)
+    assert stats["pending"] == 0
+    assert stats["dead_letter"] == 1
+    assert len(service.sent) == 1
+
+
+def test_queue_stats_are_exposed_through_metrics(monkeypatch):
+    from utils import metrics
+
+    monkeypatch.setattr(metrics, "_providers", {})
+    queue = _queue()
+
+    async def run():
+        await queue.ensure_group()
+        metrics.register_metrics("message_queue", queue.stats)
+        metrics.register_metrics("sync", lambda: {"ok": True})
+        await queue.enqueue({"id": "wamid.1", "from": "573001", "text": {"body": "hola"}})
+        await queue.enqueue({"id": "wamid.2", "from": "573001", "text": {"body": "hola"}})
+        await queue.read("c1", count=1, block_ms=10)
+        return await metrics.collect_metrics()
+
+    collected = asyncio.run(run())
+
+    assert collected["message_queue"] == {"length": 2, "pending": 1, "dead_letter": 0}
+    assert collected["sync"] == {"ok": True}
@@ -0,0 +1,54 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from repositories.write_behind import WriteBehindBuffer
+
+
+def _collection(side_effect=None):
+    collection = MagicMock()
+    collection.insert_many = AsyncMock(side_effect=side_effect)
+    return collection
+
+
+def test_flushes_by_size_time_and_on_close():
+    collection = _collection()
+    buffer = WriteBehindBuffer(collection, max_batch_size=3, flush_interval=0.05)
+
+    async def run():
+        ids = [await buffer.add({"text": str(i)}) for i in range(3)]
+        await asyncio.sleep(0.01)
+        assert collection.insert_many.await_count == 1  # Lote lleno
+        assert len(set(ids)) == 3
+
+        await buffer.add({"text": "tarde"})
+        await asyncio.sleep(0.1)
+        assert collection.insert_many.await_count == 2  # Por tiempo
+
+        await buffer.add({"text": "último"})
+        await buffer.close()
+        assert collection.insert_many.await_count == 3  # Al cerrar
+
+    asyncio.run(run())
+    batches = [call.args[0] for call in collection.insert_many.await_args_list]
+    assert [len(batch) for batch in batches] == [3, 1, 1]
+    assert all(call.kwargs["ordered"] is False for call in collection.insert_many.await_args_list)
+    assert buffer.stats()["written"] == 5 and buffer.stats()["pending"] == 0
+
+
+def test_connection_errors_keep_documents_pending():
+    collection = _collection(side_effect=[ConnectionError("mongo caído"), None])
+    buffer = WriteBehindBuffer(collection, max_batch_size=10, flush_interval=10)
+
+    async def run():
+        await buffer.add({"text": "a"})
+        await buffer.add({"text": "b"})
+        try:
+            await buffer.flush()
+        except ConnectionError:
+            pass
+        assert buffer.stats()["pending"] == 2
+        await buffer.close()
+
+    asyncio.run(run())
+    assert [d["text"] for d in collection.insert_many.await_args_list[-1].args[0]] == ["a", "b"]
+    assert buffer.stats()["written"] == 2
@@ -0,0 +1,151 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _timed_call(func: Callable, args: tuple, kwargs: dict):
+    """Ejecuta `func` en el worker y devuelve (inicio, fin, resultado) para medir la espera."""
+    started = time.time()
+    result = func(*args, **kwargs)
+    return started, time.time(), result
+
+
+class InferenceExecutor:
+    """
+    Pool dedicado para trabajo de CPU (modelos, búsquedas vectoriales),
+    separado del executor por defecto del event loop que usa la I/O.
+
+    Con `kind="thread"` las funciones comparten los modelos cargados en el
+    proceso (PyTorch libera el GIL). Con `kind="process"` las funciones y
+    sus argumentos deben ser serializables (funciones de módulo); solo lo usa
+    la extracción de PDFs, nunca el pool "inference".
+    """
+
+    def __init__(self, name: str, kind: str = "thread", max_workers: int = 2):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Tipo de executor no soportado: {kind}")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+
+    @property
+    def executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix=f"{self.name}-worker"
+                    )
+            return self._executor
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Ejecuta `func(*args, **kwargs)` en el pool sin bloquear el event loop.
+        Returns:
+            Any: Resultado de la función.
+        """
+        loop = asyncio.get_running_loop()
+        submitted = time.time()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            started, finished, result = await loop.run_in_executor(
+                self.executor, functools.partial(_timed_call, func, args, kwargs)
+            )
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+        wait = max(0.0, started - submitted)
+        with self._lock:
+            self.completed += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.total_run += finished - started
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "in_flight": self.in_flight,
+                "queue_depth": max(0, self.in_flight - self.max_workers),
+                "completed": self.completed,
+                "failed": self.failed,
+                "avg_wait_ms": 1000 * self.total_wait / self.completed if self.completed else 0.0,
+                "max_wait_ms": 1000 * self.max_wait,
+                "avg_run_ms": 1000 * self.total_run / self.completed if self.completed else 0.0,
+            }
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+_executors: Dict[str, InferenceExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_inference_executor(name: str = "inference", kind: Optional[str] = None,
+                           max_workers: Optional[int] = None) -> InferenceExecutor:
+    """
+    Devuelve (creándolo si hace falta) el pool con nombre `name`.
+    El pool "inference" es siempre de hilos (recibe métodos ligados a modelos,
+    que no se pueden serializar) y usa INFERENCE_EXECUTOR_WORKERS.
+    Pools del proceso: "inference" (embeddings y tokenización), "generation"
+    (generate fuera del planificador) y "vector_io" (llamadas al índice); la
+    ingesta de PDFs añade "pdf_extraction" (procesos) y "pdf_upsert".
+    """
+    from config.config import settings
+
+    with _executors_lock:
+        executor = _executors.get(name)
+        if executor is None:
+            if name == "inference":
+                kind = "thread"
+                max_workers = max_workers or settings.INFERENCE_EXECUTOR_WORKERS
+            executor = InferenceExecutor(name, kind=kind or "thread", max_workers=max_workers or 2)
+            _executors[name] = executor
+            register_metrics(f"executor_{name}", executor.stats)
+        return executor
+
+
+def shutdown_executors():
+    """Cierra todos los pools (evento de apagado de la aplicación)."""
+    with _executors_lock:
+        executors = list(_executors.values())
+    for executor in executors:
+        executor.shutdown(wait=False)
+
+
+def get_vector_io_executor() -> InferenceExecutor:
+    """Pool de hilos para el índice vectorial: la latencia de red de Pinecone no ocupa el pool de CPU."""
+    from config.config import settings
+
+    return get_inference_executor("vector_io", kind="thread", max_workers=settings.VECTOR_IO_WORKERS)
@@ -0,0 +1,37 @@
+import inspect
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Union
+
+logger = logging.getLogger(__name__)
+
+_providers: Dict[str, Callable[[], Union[Dict[str, Any], Awaitable[Dict[str, Any]]]]] = {}
+_lock = threading.Lock()
+
+
+def register_metrics(name: str, provider: Callable[[], Union[Dict[str, Any], Awaitable[Dict[str, Any]]]]):
+    """
+    Registra una fuente de métricas que se expone en GET /api/metrics.
+    Args:
+        name (str): Nombre de la sección (ej. "embedding_cache").
+        provider (Callable): Función sin argumentos que devuelve un dict serializable
+            (o corrutina que lo devuelve, p. ej. si consulta Redis).
+    """
+    with _lock:
+        _providers[name] = provider
+
+
+async def collect_metrics() -> Dict[str, Any]:
+    """Recoge las métricas de todas las fuentes registradas."""
+    with _lock:
+        providers = dict(_providers)
+
+    metrics = {}
+    for name, provider in providers.items():
+        try:
+            result = provider()
+            metrics[name] = await result if inspect.isawaitable(result) else result
+        except Exception as e:
+            logger.error(f"Error obteniendo métricas de {name}: {str(e)}")
+            metrics[name] = {"error": str(e)}
+    return metrics
@@ -0,0 +1,52 @@
+import re
+from typing import List, Optional
+
+# Fin de frase (con comillas o paréntesis de cierre) seguido de espacio, o salto de línea
+_BOUNDARY = re.compile(r"[.!?…]+[\"'”»)\]]*\s+|\n+")
+
+
+class SentenceSegmenter:
+    """
+    Agrupa el texto que llega en streaming en mensajes listos para enviar:
+    corta en fin de frase o de párrafo cuando el segmento tiene al menos
+    `min_chars` (evita ráfagas de mensajes de una palabra) y fuerza un corte
+    en el último espacio si se acumulan `max_chars` sin fin de frase.
+    """
+
+    def __init__(self, min_chars: int = 60, max_chars: int = 1200):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """
+        Args:
+            text (str): Fragmento nuevo del texto generado.
+        Returns:
+            list: Segmentos completos (puede estar vacía).
+        """
+        self._buffer += text
+        segments = []
+        while True:
+            cut = self._next_cut()
+            if cut is None:
+                return segments
+            segment = self._buffer[:cut].strip()
+            self._buffer = self._buffer[cut:]
+            if segment:
+                segments.append(segment)
+
+    def flush(self) -> Optional[str]:
+        """Devuelve lo que quede pendiente al terminar la generación."""
+        segment = self._buffer.strip()
+        self._buffer = ""
+        return segment or None
+
+    def _next_cut(self) -> Optional[int]:
+        for match in _BOUNDARY.finditer(self._buffer):
+            if len(self._buffer[:match.end()].strip()) >= self.min_chars:
+                return match.end()
+        if len(self._buffer) > self.max_chars:
+            space = self._buffer.rfind(" ", 0, self.max_chars)
+            return space + 1 if space > 0 else self.max_chars
+        return None
@@ -0,0 +1,80 @@
+import logging
+import os
+import threading
+from typing import Dict
+
+from config.config import settings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 384  # Dimensión de all-MiniLM-L6-v2
+
+_indexes: Dict[str, object] = {}
+_sparse_indexes: Dict[str, object] = {}
+_lock = threading.Lock()
+
+
+def get_vector_index(index_name: str, dimension: int = EMBEDDING_DIM, region: str = "us-west-2"):
+    """
+    Devuelve el índice vectorial configurado en `settings.VECTOR_BACKEND`.
+
+    Con "pinecone" se crea el índice remoto si no existe y se devuelve
+    `pc.Index(index_name)`; con "local" se devuelve un `LocalVectorIndex`
+    embebido con la misma interfaz upsert/query. Las instancias se
+    reutilizan por nombre de índice dentro del proceso.
+    Args:
+        index_name (str): Nombre del índice.
+        dimension (int): Dimensión de los vectores.
+        region (str): Región AWS para índices serverless de Pinecone.
+    Returns:
+        Index | LocalVectorIndex: Índice listo para usar.
+    """
+    with _lock:
+        index = _indexes.get(index_name)
+        if index is None:
+            if settings.VECTOR_BACKEND == "local":
+                index = _create_local_index(index_name, dimension)
+            elif settings.VECTOR_BACKEND == "pinecone":
+                index = _create_pinecone_index(index_name, dimension, region)
+            else:
+                raise ValueError(f"Backend vectorial no soportado: {settings.VECTOR_BACKEND}")
+            _indexes[index_name] = index
+        return index
+
+
+def get_sparse_index(index_name: str):
+    """
+    Índice BM25 local que acompaña al índice vectorial `index_name`
+    (se usa con cualquier VECTOR_BACKEND). Se reutiliza por nombre.
+    """
+    from vector_db.bm25_index import BM25Index
+
+    with _lock:
+        index = _sparse_indexes.get(index_name)
+        if index is None:
+            path = os.path.join(settings.BM25_INDEX_PATH, index_name) if settings.BM25_INDEX_PATH else None
+            index = BM25Index(path=path)
+            _sparse_indexes[index_name] = index
+        return index
+
+
+def _create_local_index(index_name: str, dimension: int):
+    from vector_db.local_index import LocalVectorIndex
+
+    path = os.path.join(settings.LOCAL_INDEX_PATH, index_name) if settings.LOCAL_INDEX_PATH else None
+    logger.info(f"Usando índice vectorial local '{index_name}' (modo {settings.LOCAL_INDEX_MODE})")
+    return LocalVectorIndex(dimension=dimension, path=path, mode=settings.LOCAL_INDEX_MODE)
+
+
+def _create_pinecone_index(index_name: str, dimension: int, region: str):
+    from pinecone import Pinecone, ServerlessSpec
+
+    pc = Pinecone(api_key=settings.PINECONE_API_KEY)
+    if index_name not in pc.list_indexes().names():
+        pc.create_index(
+            name=index_name,
+            dimension=dimension,
+            metric="cosine",
+            spec=ServerlessSpec(cloud="aws", region=region)
+        )
+    return pc.Index(index_name)
@@ -0,0 +1,233 @@
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from vector_db.local_index import matches_filter
+
+# Palabras vacías frecuentes en español: no aportan al ranking y alargan las listas invertidas
+STOPWORDS = frozenset(
+    "a al algo como con de del donde el en es esta este hay la las lo los me mi no o para pero por que se "
+    "si sin su sus te tu un una uno y ya".split()
+)
+# Términos alfanuméricos; los unidos por - _ . / (códigos como PY-101 o 3.5) se indexan enteros y por partes
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Minúsculas, sin tildes ni palabras vacías; los códigos compuestos se conservan además de sus partes."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    tokens = []
+    for match in _TOKEN.finditer(text):
+        term = match.group()
+        parts = re.split(r"[-_./]", term)
+        if len(parts) > 1:
+            tokens.append(term)
+        tokens.extend(part for part in parts if part not in STOPWORDS)
+    return tokens
+
+
+class _Corpus:
+    """
+    Documentos de un namespace: frecuencias por documento y listas invertidas
+    término -> {id: tf}. En disco es un log JSONL de solo anexado
+    ({"id", "terms", "metadata"} o {"delete": id}) que se compacta al cargar.
+    """
+
+    def __init__(self, name: str, path: Optional[str]):
+        self.name = name
+        self.path = path
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.total_length = 0
+        self._load()
+
+    @property
+    def _file(self) -> Optional[str]:
+        return os.path.join(self.path, f"{self.name or '_default'}.bm25.jsonl") if self.path else None
+
+    def _load(self):
+        if self._file is None or not os.path.exists(self._file):
+            return
+        entries, truncated = 0, False
+        with open(self._file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    truncated = True  # Último registro a medio escribir
+                    break
+                entries += 1
+                if "delete" in entry:
+                    self.remove(entry["delete"])
+                else:
+                    self.remove(entry["id"])
+                    self._add(entry["id"], entry["terms"], entry["metadata"])
+        if truncated or entries > 2 * len(self.docs):
+            self._compact()
+
+    def _compact(self):
+        tmp_file = f"{self._file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            for doc_id, doc in self.docs.items():
+                f.write(json.dumps({"id": doc_id, "terms": doc["terms"], "metadata": doc["metadata"]}) + "\n")
+        os.replace(tmp_file, self._file)
+
+    def append(self, entries: List[Dict[str, Any]]):
+        """Anexa al log los registros de un lote (solo ese lote, no todo el corpus)."""
+        if self._file is None or not entries:
+            return
+        with open(self._file, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+
+    def upsert(self, doc_id: str, terms: Dict[str, int], metadata: Dict[str, Any]):
+        self.remove(doc_id)
+        self._add(doc_id, terms, metadata)
+
+    def _add(self, doc_id: str, terms: Dict[str, int], metadata: Dict[str, Any]):
+        length = sum(terms.values())
+        self.docs[doc_id] = {"terms": terms, "length": length, "metadata": metadata}
+        self.total_length += length
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+
+    def remove(self, doc_id: str) -> bool:
+        doc = self.docs.pop(doc_id, None)
+        if doc is None:
+            return False
+        self.total_length -= doc["length"]
+        for term in doc["terms"]:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+        return True
+
+
+class BM25Index:
+    """
+    Índice invertido local con ranking BM25 para búsqueda léxica (códigos de
+    curso, nombres de producto, números) que complementa al índice vectorial.
+
+    Misma interfaz upsert/query/delete por namespace que `LocalVectorIndex`,
+    pero recibe texto en lugar de vectores. Las actualizaciones son
+    incrementales (solo se tocan las listas de los términos del documento) y
+    con `path` cada lote se anexa al log del namespace. La escritura en disco
+    se hace fuera del lock de las consultas; `_write_lock` solo ordena a los
+    escritores entre sí.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._corpora: Dict[str, _Corpus] = {}
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        if path:
+            os.makedirs(path, exist_ok=True)
+            for file_name in os.listdir(path):
+                if file_name.endswith(".bm25.jsonl"):
+                    name = file_name[: -len(".bm25.jsonl")]
+                    self._corpus("" if name == "_default" else name)
+
+    def _corpus(self, namespace: str) -> _Corpus:
+        corpus = self._corpora.get(namespace)
+        if corpus is None:
+            corpus = _Corpus(namespace, self.path)
+            self._corpora[namespace] = corpus
+        return corpus
+
+    def upsert(self, documents: List[Dict[str, Any]], namespace: str = "", **kwargs) -> Dict[str, int]:
+        """
+        Inserta o reemplaza documentos.
+        Args:
+            documents (list): Dicts con "id", "text" y opcionalmente "metadata".
+            namespace (str): Namespace de destino.
+        Returns:
+            dict: {"upserted_count": n}
+        """
+        if not documents:
+            return {"upserted_count": 0}
+        # Tokenizar tampoco necesita el lock
+        entries = [
+            {"id": str(document["id"]), "terms": dict(Counter(tokenize(document["text"]))),
+             "metadata": dict(document.get("metadata") or {})}
+            for document in documents
+        ]
+        with self._write_lock:
+            with self._lock:
+                corpus = self._corpus(namespace)
+                for entry in entries:
+                    corpus.upsert(entry["id"], entry["terms"], entry["metadata"])
+            corpus.append(entries)
+        return {"upserted_count": len(documents)}
+
+    def query(self, text: str, top_k: int = 10, namespace: str = "", include_metadata: bool = False,
+              filter: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        """
+        Busca los `top_k` documentos con mayor puntuación BM25 para `text`.
+        Returns:
+            dict: {"matches": [{"id", "score", "metadata"?}], "namespace": str}
+        """
+        terms = Counter(tokenize(text))
+        with self._lock:
+            corpus = self._corpora.get(namespace)
+            if corpus is None or not corpus.docs or not terms or top_k <= 0:
+                return {"matches": [], "namespace": namespace}
+            n = len(corpus.docs)
+            avg_length = corpus.total_length / n or 1.0
+            scores: Dict[str, float] = {}
+            # Solo se recorren las listas de los términos de la consulta
+            for term, query_tf in terms.items():
+                posting = corpus.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, tf in posting.items():
+                    length = corpus.docs[doc_id]["length"]
+                    weight = tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avg_length))
+                    scores[doc_id] = scores.get(doc_id, 0.0) + query_tf * idf * weight
+
+            if filter:
+                scores = {
+                    doc_id: score for doc_id, score in scores.items()
+                    if matches_filter(corpus.docs[doc_id]["metadata"], filter)
+                }
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+            matches = []
+            for doc_id, score in ranked:
+                match = {"id": doc_id, "score": score}
+                if include_metadata:
+                    match["metadata"] = corpus.docs[doc_id]["metadata"]
+                matches.append(match)
+        return {"matches": matches, "namespace": namespace}
+
+    def delete(self, ids: Optional[List[str]] = None, namespace: str = "", delete_all: bool = False, **kwargs):
+        """Elimina documentos por id (o todo el namespace con `delete_all`)."""
+        with self._write_lock:
+            with self._lock:
+                corpus = self._corpora.get(namespace)
+                if corpus is None:
+                    return {}
+                targets = list(corpus.docs) if delete_all else ids or []
+                removed = [doc_id for doc_id in targets if corpus.remove(doc_id)]
+            corpus.append([{"delete": doc_id} for doc_id in removed])
+        return {}
+
+    def describe_index_stats(self, **kwargs) -> Dict[str, Any]:
+        with self._lock:
+            namespaces = {
+                name: {"document_count": len(corpus.docs), "term_count": len(corpus.postings)}
+                for name, corpus in self._corpora.items()
+            }
+        return {
+            "namespaces": namespaces,
+            "total_document_count": sum(ns["document_count"] for ns in namespaces.values()),
+        }
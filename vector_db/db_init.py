@@ -1,15 +1,14 @@
 from .pinecone_utils import create_collection, add_embeddings_to_collection
-from models.embedding_model import EmbeddingModel
+from models.embedding_model import get_embedding_model
 from pdf_processing.pdf_loader import load_pdf
 from models.model_utils import split_text_into_chunks
 
-# Inicialización del modelo de embeddings
-embedding_model = EmbeddingModel()
-
 def initialize_vector_db():
     """
     Inicializa la base de datos vectorial con datos de ejemplo.
     """
+    embedding_model = get_embedding_model()
+
     # Crear una colección predeterminada
     collection_name = "pdf_embeddings"
     create_collection(collection_name)
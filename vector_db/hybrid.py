@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict[str, Any]]], top_k: int, k: int = 60) -> List[Dict[str, Any]]:
+    """
+    Combina rankings con Reciprocal Rank Fusion: score = Σ 1 / (k + posición).
+    Solo usa posiciones, así que no hace falta calibrar coseno frente a BM25.
+    Args:
+        result_lists (list): Listas de matches ({"id", "metadata"?}) ordenadas por relevancia.
+        top_k (int): Resultados a devolver.
+        k (int): Constante de suavizado (60 es el valor habitual).
+    Returns:
+        list: Matches fusionados {"id", "score", "metadata"} ordenados por score.
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    for matches in result_lists:
+        for rank, match in enumerate(matches, start=1):
+            entry = fused.setdefault(match["id"], {"id": match["id"], "score": 0.0, "metadata": None})
+            entry["score"] += 1.0 / (k + rank)
+            if entry["metadata"] is None:
+                entry["metadata"] = match.get("metadata")
+    return sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)[:top_k]
+
+
+class HybridRetriever:
+    """
+    Recuperación híbrida: la búsqueda densa (embedding + índice vectorial) y
+    la léxica (BM25) se lanzan a la vez y sus rankings se fusionan con RRF.
+    Si una de las dos falla se usa la otra.
+    """
+
+    def __init__(self, dense_index, sparse_index, embedder, executor, candidates: int = 20, rrf_k: int = 60):
+        self.dense_index = dense_index
+        self.sparse_index = sparse_index
+        self.embedder = embedder
+        self.executor = executor
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.queries = 0
+        self.dense_seconds = 0.0
+        self.sparse_seconds = 0.0
+        self.sparse_only_hits = 0  # Resultados finales que la búsqueda densa no encontró
+        self.errors = 0
+
+    async def search(self, query: str, top_k: int = 3, namespace: str = "") -> Dict[str, Any]:
+        """
+        Args:
+            query (str): Texto de la consulta.
+            top_k (int): Resultados finales tras la fusión.
+            namespace (str): Namespace en ambos índices.
+        Returns:
+            dict: {"matches": [{"id", "score", "metadata"}]} como el índice vectorial.
+        """
+        dense, sparse = await asyncio.gather(
+            self._dense(query, namespace), self._sparse(query, namespace), return_exceptions=True
+        )
+        rankings = []
+        for name, result in (("densa", dense), ("léxica", sparse)):
+            if isinstance(result, Exception):
+                self.errors += 1
+                logger.error(f"Error en la búsqueda {name}: {str(result)}")
+            else:
+                rankings.append(result)
+        if not rankings:
+            raise dense if isinstance(dense, Exception) else sparse
+
+        matches = reciprocal_rank_fusion(rankings, top_k, self.rrf_k)
+        self.queries += 1
+        if not isinstance(dense, Exception):
+            dense_ids = {match["id"] for match in dense}
+            self.sparse_only_hits += sum(1 for match in matches if match["id"] not in dense_ids)
+        return {"matches": matches}
+
+    async def _dense(self, query: str, namespace: str) -> List[Dict[str, Any]]:
+        started = time.monotonic()
+        embedding = (await self.embedder.aencode(query)).tolist()
+        results = await self.executor.run(
+            self.dense_index.query,
+            vector=embedding,
+            top_k=self.candidates,
+            include_metadata=True,
+            namespace=namespace
+        )
+        self.dense_seconds += time.monotonic() - started
+        return results.get("matches", [])
+
+    async def _sparse(self, query: str, namespace: str) -> List[Dict[str, Any]]:
+        started = time.monotonic()
+        results = await self.executor.run(
+            self.sparse_index.query,
+            query,
+            top_k=self.candidates,
+            include_metadata=True,
+            namespace=namespace
+        )
+        self.sparse_seconds += time.monotonic() - started
+        return results.get("matches", [])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queries": self.queries,
+            "avg_dense_ms": 1000 * self.dense_seconds / self.queries if self.queries else 0.0,
+            "avg_sparse_ms": 1000 * self.sparse_seconds / self.queries if self.queries else 0.0,
+            "sparse_only_hits": self.sparse_only_hits,
+            "errors": self.errors,
+        }
@@ -0,0 +1,501 @@
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+try:  # Dependencia opcional: solo necesaria para el modo "hnsw"
+    import hnswlib
+except ImportError:  # pragma: no cover - depende del entorno
+    hnswlib = None
+
+INITIAL_CAPACITY = 1024  # Filas reservadas al crear un namespace
+IVF_MIN_VECTORS = 2048  # Por debajo de este tamaño la búsqueda exacta es más rápida
+IVF_KMEANS_ITERATIONS = 10
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Normaliza filas a norma L2 unitaria (similitud coseno = producto punto)."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _match_condition(value: Any, condition: Any) -> bool:
+    """Evalúa una condición de filtro estilo Pinecone sobre un valor de metadata."""
+    if not isinstance(condition, dict):
+        return value == condition
+
+    for operator, expected in condition.items():
+        if operator == "$eq" and not value == expected:
+            return False
+        if operator == "$ne" and not value != expected:
+            return False
+        if operator == "$in" and value not in expected:
+            return False
+        if operator == "$nin" and value in expected:
+            return False
+        if operator in ("$gt", "$gte", "$lt", "$lte"):
+            if value is None:
+                return False
+            if operator == "$gt" and not value > expected:
+                return False
+            if operator == "$gte" and not value >= expected:
+                return False
+            if operator == "$lt" and not value < expected:
+                return False
+            if operator == "$lte" and not value <= expected:
+                return False
+    return True
+
+
+def matches_filter(metadata: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+    """
+    Comprueba si una metadata cumple un filtro con la sintaxis de Pinecone.
+    Args:
+        metadata (dict): Metadata del vector.
+        filter (dict): Filtro ({"campo": valor} o {"campo": {"$gte": 1}}, "$and", "$or").
+    Returns:
+        bool: True si la metadata cumple el filtro.
+    """
+    if not filter:
+        return True
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif not _match_condition(metadata.get(key), condition):
+            return False
+    return True
+
+
+class _Namespace:
+    """
+    Vectores de un namespace: matriz float32 (memmap en disco o en memoria) + metadata.
+
+    En disco la matriz se escribe en su sitio y ids/metadata van a un log JSONL
+    de solo anexado ({"id", "metadata"} o {"delete": id}): cada lote escribe
+    solo sus propios registros. El log se compacta al cargar si creció mucho.
+    """
+
+    def __init__(self, name: str, dimension: int, path: Optional[str]):
+        self.name = name
+        self.dimension = dimension
+        self.path = path
+        self.ids: List[str] = []
+        self.metadata: List[Dict[str, Any]] = []
+        self.rows: Dict[str, int] = {}
+        self.deleted: set = set()
+        self._pending: List[Dict[str, Any]] = []  # Registros del log aún no escritos
+        if not self._load():
+            self.matrix = self._allocate(INITIAL_CAPACITY)
+
+    # --- Almacenamiento -------------------------------------------------
+    @property
+    def _matrix_file(self) -> Optional[str]:
+        return os.path.join(self.path, f"{self.name or '_default'}.f32") if self.path else None
+
+    @property
+    def _log_file(self) -> Optional[str]:
+        return os.path.join(self.path, f"{self.name or '_default'}.jsonl") if self.path else None
+
+    def _allocate(self, capacity: int, copy_from: Optional[np.ndarray] = None) -> np.ndarray:
+        if self._matrix_file is None:
+            matrix = np.zeros((capacity, self.dimension), dtype=np.float32)
+            if copy_from is not None:
+                matrix[: len(copy_from)] = copy_from
+            return matrix
+
+        size = capacity * self.dimension * 4
+        if os.path.exists(self._matrix_file):
+            # Crecer el archivo y volver a mapearlo; los datos existentes se conservan
+            with open(self._matrix_file, "r+b") as f:
+                f.truncate(size)
+        else:
+            # Se crea con otro nombre y se renombra: nunca queda un .f32 a medio crear
+            tmp_file = f"{self._matrix_file}.tmp"
+            with open(tmp_file, "wb") as f:
+                f.truncate(size)
+            os.replace(tmp_file, self._matrix_file)
+        return np.memmap(self._matrix_file, dtype=np.float32, mode="r+", shape=(capacity, self.dimension))
+
+    def _load(self) -> bool:
+        """Reconstruye ids y metadata desde el log y mapea la matriz. Devuelve False si no hay datos."""
+        if self._log_file is None or not os.path.exists(self._log_file):
+            return False
+        if not os.path.exists(self._matrix_file):
+            logger.warning(f"Namespace '{self.name}' sin matriz de vectores en {self.path}; se descarta su log")
+            os.remove(self._log_file)
+            return False
+        entries, truncated = 0, False
+        with open(self._log_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Último registro a medio escribir (caída durante un anexado)
+                    truncated = True
+                    break
+                entries += 1
+                if "delete" in entry:
+                    self.delete([entry["delete"]])
+                else:
+                    self._assign(entry["id"], entry["metadata"])
+        self._pending.clear()
+
+        stored_rows = os.path.getsize(self._matrix_file) // (self.dimension * 4)
+        if self.size > stored_rows:
+            # Filas referenciadas por el log que no llegaron a la matriz
+            logger.warning(f"Namespace '{self.name}': se descartan {self.size - stored_rows} filas sin vector")
+            for vector_id in self.ids[stored_rows:]:
+                if self.rows.get(vector_id, -1) >= stored_rows:
+                    del self.rows[vector_id]
+            del self.ids[stored_rows:], self.metadata[stored_rows:]
+            self.deleted = {row for row in self.deleted if row < stored_rows}
+            truncated = True
+        self.matrix = self._allocate(max(INITIAL_CAPACITY, stored_rows))
+        # Actualizaciones y borrados dejan registros obsoletos: se reescribe si el log dobla el tamaño útil
+        if truncated or entries > 2 * (self.size + len(self.deleted)):
+            self._compact()
+        return True
+
+    def _compact(self):
+        """Reescribe el log con un registro por fila (y el borrado de las filas eliminadas)."""
+        tmp_file = f"{self._log_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            for row, (vector_id, meta) in enumerate(zip(self.ids, self.metadata)):
+                f.write(json.dumps({"id": vector_id, "metadata": meta}) + "\n")
+                if row in self.deleted:
+                    f.write(json.dumps({"delete": vector_id}) + "\n")
+        os.replace(tmp_file, self._log_file)
+
+    def persist(self):
+        """Vuelca la matriz y anexa al log los registros del último lote."""
+        if self._log_file is None:
+            self._pending.clear()
+            return
+        if isinstance(self.matrix, np.memmap):
+            self.matrix.flush()
+        # Las filas ya están en disco antes de que el log las referencie
+        with open(self._log_file, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in self._pending))
+        self._pending.clear()
+
+    # --- Operaciones ----------------------------------------------------
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    @property
+    def count(self) -> int:
+        return len(self.rows)
+
+    def upsert(self, ids: List[str], values: np.ndarray, metadata: List[Dict[str, Any]]) -> np.ndarray:
+        """Inserta o reemplaza vectores. Devuelve las filas escritas."""
+        needed = self.size + len(ids)
+        if needed > len(self.matrix):
+            capacity = len(self.matrix)
+            while capacity < needed:
+                capacity *= 2
+            self.matrix = self._allocate(capacity, copy_from=self.matrix[: self.size])
+
+        rows = np.array([self._assign(vector_id, meta) for vector_id, meta in zip(ids, metadata)], dtype=np.int64)
+        self.matrix[rows] = values
+        return rows
+
+    def _assign(self, vector_id: str, meta: Dict[str, Any]) -> int:
+        """Fila de `vector_id` (nueva al final si no existe) con su metadata."""
+        row = self.rows.get(vector_id)
+        if row is None:
+            row = len(self.ids)
+            self.ids.append(vector_id)
+            self.metadata.append(meta)
+            self.rows[vector_id] = row
+        else:
+            self.metadata[row] = meta
+        self._pending.append({"id": vector_id, "metadata": meta})
+        return row
+
+    def delete(self, ids: List[str]) -> List[int]:
+        removed = []
+        for vector_id in ids:
+            row = self.rows.pop(vector_id, None)
+            if row is not None:
+                self.deleted.add(row)
+                removed.append(row)
+                self._pending.append({"delete": vector_id})
+        return removed
+
+    def live_mask(self, filter: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Máscara booleana de filas válidas (no borradas y que cumplen el filtro)."""
+        if not filter and not self.deleted:
+            return None
+        mask = np.ones(self.size, dtype=bool)
+        if self.deleted:
+            mask[list(self.deleted)] = False
+        if filter:
+            for row in range(self.size):
+                if mask[row] and not matches_filter(self.metadata[row], filter):
+                    mask[row] = False
+        return mask
+
+
+class _IVFSearcher:
+    """Índice aproximado IVF (k-means + listas invertidas) implementado con NumPy."""
+
+    def __init__(self, nlist: int = 0, nprobe: int = 8):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: List[np.ndarray] = []
+        self.assignment = np.empty(0, dtype=np.int64)  # Lista de cada fila (-1 si no está en ninguna)
+        self.trained_size = 0
+
+    def needs_training(self, size: int) -> bool:
+        return size >= IVF_MIN_VECTORS and (self.centroids is None or size >= 2 * self.trained_size)
+
+    def train(self, matrix: np.ndarray, size: int):
+        nlist = self.nlist or max(16, int(np.sqrt(size)))
+        rng = np.random.default_rng(0)
+        data = np.asarray(matrix[:size])
+        centroids = data[rng.choice(size, nlist, replace=False)].copy()
+        for _ in range(IVF_KMEANS_ITERATIONS):
+            assignment = np.argmax(data @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = data[assignment == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+        self.centroids = centroids
+        assignment = np.argmax(data @ centroids.T, axis=1)
+        self.lists = [np.flatnonzero(assignment == c) for c in range(nlist)]
+        self.assignment = assignment.astype(np.int64)
+        self.trained_size = size
+
+    def add(self, rows: np.ndarray, values: np.ndarray):
+        if self.centroids is None:
+            return
+        assignment = np.argmax(values @ self.centroids.T, axis=1)
+        if len(rows) and rows.max() >= len(self.assignment):
+            grown = np.full(max(rows.max() + 1, 2 * len(self.assignment)), -1, dtype=np.int64)
+            grown[: len(self.assignment)] = self.assignment
+            self.assignment = grown
+        # Una fila reemplazada (upsert de un id existente) sale de su lista anterior
+        previous = self.assignment[rows]
+        for c in np.unique(previous[previous >= 0]):
+            self.lists[c] = np.setdiff1d(self.lists[c], rows[previous == c])
+        self.assignment[rows] = assignment
+        for row, c in zip(rows, assignment):
+            self.lists[c] = np.append(self.lists[c], row)
+
+    def candidates(self, query: np.ndarray) -> np.ndarray:
+        nprobe = min(self.nprobe, len(self.lists))
+        probes = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.unique(np.concatenate([self.lists[c] for c in probes]))
+
+
+class _HNSWSearcher:
+    """Índice aproximado HNSW basado en hnswlib (dependencia opcional)."""
+
+    def __init__(self, dimension: int):
+        if hnswlib is None:
+            raise ImportError("El modo 'hnsw' requiere el paquete hnswlib (pip install hnswlib)")
+        self.index = hnswlib.Index(space="ip", dim=dimension)
+        self.index.init_index(max_elements=INITIAL_CAPACITY, ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M)
+        self.index.set_ef(HNSW_EF_SEARCH)
+
+    def add(self, rows: np.ndarray, values: np.ndarray):
+        needed = self.index.get_current_count() + len(rows)
+        if needed > self.index.get_max_elements():
+            self.index.resize_index(max(needed, 2 * self.index.get_max_elements()))
+        self.index.add_items(values, rows)
+
+    def delete(self, rows: List[int]):
+        for row in rows:
+            self.index.mark_deleted(row)
+
+    def search(self, query: np.ndarray, k: int):
+        k = min(k, self.index.get_current_count())
+        if k == 0:
+            return np.empty(0, dtype=np.int64)
+        self.index.set_ef(max(HNSW_EF_SEARCH, k))
+        labels, _ = self.index.knn_query(query, k=k)
+        return labels[0].astype(np.int64)
+
+
+class LocalVectorIndex:
+    """
+    Índice vectorial embebido en el proceso, compatible con la interfaz
+    upsert/query/delete del `Index` de Pinecone.
+
+    Los vectores se guardan normalizados en una matriz float32 por namespace,
+    mapeada en memoria cuando se indica `path`. La búsqueda es exacta
+    (producto punto + top-k con NumPy) o aproximada (IVF o HNSW).
+    """
+
+    def __init__(self, dimension: int = 384, path: Optional[str] = None, mode: str = "exact",
+                 nlist: int = 0, nprobe: int = 8):
+        if mode not in ("exact", "ivf", "hnsw"):
+            raise ValueError(f"Modo de búsqueda no soportado: {mode}")
+        if mode == "hnsw" and hnswlib is None:
+            raise ImportError("El modo 'hnsw' requiere el paquete hnswlib (pip install hnswlib)")
+        self.dimension = dimension
+        self.path = path
+        self.mode = mode
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._searchers: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        if path:
+            os.makedirs(path, exist_ok=True)
+            for file_name in os.listdir(path):
+                if file_name.endswith(".jsonl"):
+                    name = file_name[: -len(".jsonl")]
+                    self._namespace("" if name == "_default" else name)
+
+    def _namespace(self, namespace: str) -> _Namespace:
+        ns = self._namespaces.get(namespace)
+        if ns is None:
+            ns = _Namespace(namespace, self.dimension, self.path)
+            self._namespaces[namespace] = ns
+            if self.mode == "hnsw":
+                searcher = _HNSWSearcher(self.dimension)
+                if ns.size:
+                    rows = np.array(sorted(ns.rows.values()), dtype=np.int64)
+                    searcher.add(rows, np.asarray(ns.matrix[rows]))
+                self._searchers[namespace] = searcher
+            elif self.mode == "ivf":
+                self._searchers[namespace] = _IVFSearcher(self.nlist, self.nprobe)
+        return ns
+
+    def upsert(self, vectors: List[Dict[str, Any]], namespace: str = "", **kwargs) -> Dict[str, int]:
+        """
+        Inserta o actualiza vectores.
+        Args:
+            vectors (list): Dicts con "id", "values" y opcionalmente "metadata"
+                (o tuplas (id, values[, metadata]) como en Pinecone).
+            namespace (str): Namespace de destino.
+        Returns:
+            dict: {"upserted_count": n}
+        """
+        if not vectors:
+            return {"upserted_count": 0}
+        ids, values, metadata = [], [], []
+        for vector in vectors:
+            if isinstance(vector, dict):
+                ids.append(str(vector["id"]))
+                values.append(vector["values"])
+                metadata.append(dict(vector.get("metadata") or {}))
+            else:
+                ids.append(str(vector[0]))
+                values.append(vector[1])
+                metadata.append(dict(vector[2]) if len(vector) > 2 else {})
+
+        matrix = np.asarray(values, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[1] != self.dimension:
+            raise ValueError(f"Dimensión inválida: se esperaba {self.dimension}, se recibió {matrix.shape[-1]}")
+        matrix = _normalize(matrix)
+
+        with self._lock:
+            ns = self._namespace(namespace)
+            rows = ns.upsert(ids, matrix, metadata)
+            searcher = self._searchers.get(namespace)
+            if isinstance(searcher, _IVFSearcher):
+                if searcher.needs_training(ns.size):
+                    searcher.train(ns.matrix, ns.size)
+                else:
+                    searcher.add(rows, matrix)
+            elif searcher is not None:
+                searcher.add(rows, matrix)
+            ns.persist()
+        return {"upserted_count": len(ids)}
+
+    def query(self, vector: List[float], top_k: int = 10, namespace: str = "",
+              include_metadata: bool = False, include_values: bool = False,
+              filter: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        """
+        Busca los `top_k` vectores más similares (coseno).
+        Returns:
+            dict: {"matches": [{"id", "score", "metadata"?, "values"?}], "namespace": str}
+        """
+        query = _normalize(np.asarray(vector, dtype=np.float32))
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None or ns.count == 0 or top_k <= 0:
+                return {"matches": [], "namespace": namespace}
+            mask = ns.live_mask(filter)
+            candidates = self._candidates(namespace, ns, query, top_k, mask)
+            if candidates is None:
+                scores = np.asarray(ns.matrix[: ns.size]) @ query
+                if mask is not None:
+                    scores = np.where(mask, scores, -np.inf)
+                rows = np.arange(ns.size)
+            else:
+                if mask is not None:
+                    candidates = candidates[mask[candidates]]
+                scores = np.asarray(ns.matrix[candidates]) @ query
+                rows = candidates
+
+            k = min(top_k, len(rows))
+            if k == 0:
+                return {"matches": [], "namespace": namespace}
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+
+            matches = []
+            for i in top:
+                if not np.isfinite(scores[i]):
+                    break
+                row = int(rows[i])
+                match = {"id": ns.ids[row], "score": float(scores[i])}
+                if include_metadata:
+                    match["metadata"] = ns.metadata[row]
+                if include_values:
+                    match["values"] = np.asarray(ns.matrix[row]).tolist()
+                matches.append(match)
+        return {"matches": matches, "namespace": namespace}
+
+    def _candidates(self, namespace: str, ns: _Namespace, query: np.ndarray, top_k: int,
+                    mask: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """Filas candidatas del índice aproximado; None indica búsqueda exacta."""
+        searcher = self._searchers.get(namespace)
+        if isinstance(searcher, _IVFSearcher) and searcher.centroids is not None:
+            return searcher.candidates(query)
+        if isinstance(searcher, _HNSWSearcher):
+            # Con filtros se sobre-muestrea para no quedarse sin resultados válidos
+            oversample = top_k if mask is None else top_k * 10
+            return searcher.search(query, oversample)
+        return None
+
+    def delete(self, ids: Optional[List[str]] = None, namespace: str = "", delete_all: bool = False, **kwargs):
+        """Elimina vectores por id (o todo el namespace con `delete_all`)."""
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None:
+                return {}
+            removed = ns.delete(list(ns.rows) if delete_all else ids or [])
+            searcher = self._searchers.get(namespace)
+            if isinstance(searcher, _HNSWSearcher):
+                searcher.delete(removed)
+            ns.persist()
+        return {}
+
+    def describe_index_stats(self, **kwargs) -> Dict[str, Any]:
+        with self._lock:
+            namespaces = {name: {"vector_count": ns.count} for name, ns in self._namespaces.items()}
+        return {
+            "dimension": self.dimension,
+            "namespaces": namespaces,
+            "total_vector_count": sum(ns["vector_count"] for ns in namespaces.values()),
+        }
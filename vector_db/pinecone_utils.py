@@ -1,15 +1,16 @@
 from typing import List, Dict, Optional, TypedDict, Any, AsyncGenerator
-import pinecone
+import uuid
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from langgraph.graph import StateGraph, END
 from pydantic import BaseModel, ValidationError
 import asyncio
 from loguru import logger
 from datetime import datetime
+from vector_db.backends import get_vector_index
+from models.embedding_model import get_embedding_model
+from utils.inference_executor import get_vector_io_executor
 
 # Configuración de modelos
-EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 EMBEDDING_DIM = 384  # Dimensión del modelo seleccionado
 INDEX_NAME = "chatbot"  # Nombre del índice en Pinecone
 BATCH_SIZE = 128  # Tamaño óptimo para embeddings
@@ -42,32 +43,12 @@ class PineconeManager:
     def _initialize_components(self):
         """Inicialización optimizada con validación Pydantic"""
         try:
-            # Configurar Pinecone
-            pinecone.init(
-                api_key=settings.PINECONE_API_KEY,
-                environment=settings.PINECONE_ENV
-            )
-            
-            # Crear índice si no existe
-            if INDEX_NAME not in pinecone.list_indexes():
-                pinecone.create_index(
-                    name=INDEX_NAME,
-                    dimension=EMBEDDING_DIM,
-                    metric="cosine",
-                    spec=pinecone.ServerlessSpec(
-                        cloud="aws",
-                        region="us-west-2"
-                    )
-                )
+            # Índice vectorial (Pinecone o local, se crea si no existe)
+            self.index = get_vector_index(INDEX_NAME, dimension=EMBEDDING_DIM, region="us-west-2")
             
-            self.index = pinecone.Index(INDEX_NAME)
-            
-            # Modelo de embeddings con caché
-            self.embedder = SentenceTransformer(
-                EMBEDDING_MODEL,
-                device="cuda" if torch.cuda.is_available() else "cpu"
-            )
-            self.embedder.max_seq_length = 512  # Longitud óptima
+            # Servicio de embeddings compartido (micro-batching)
+            self.embedder = get_embedding_model()
+            self.executor = get_vector_io_executor()  # Llamadas de red a Pinecone, fuera del pool de CPU
             
         except Exception as e:
             logger.error(f"Error de inicialización: {e}")
@@ -121,18 +102,10 @@ class PineconeManager:
         try:
             texts = [doc.content for doc in state["documents"]]
             
-            # Generar embeddings en batches
-            embeddings = []
-            for i in range(0, len(texts), BATCH_SIZE):
-                batch = texts[i:i+BATCH_SIZE]
-                embeddings.extend(self.embedder.encode(
-                    batch,
-                    show_progress_bar=True,
-                    convert_to_numpy=True,
-                    normalize_embeddings=True
-                ))
+            # El servicio agrupa los textos en lotes de EMBEDDING_MAX_BATCH_SIZE
+            embeddings = await self.embedder.aencode(texts)
             
-            return {**state, "embeddings": np.array(embeddings)}
+            return {**state, "embeddings": embeddings}
         except Exception as e:
             logger.error(f"Error generando embeddings: {e}")
             return {**state, "error": str(e)}
@@ -152,7 +125,8 @@ class PineconeManager:
             # Upsert en batches para mejor performance
             for i in range(0, len(vectors), BATCH_SIZE):
                 batch = vectors[i:i+BATCH_SIZE]
-                self.index.upsert(
+                await self.executor.run(
+                    self.index.upsert,
                     vectors=batch,
                     namespace=batch[0]["namespace"]
                 )
@@ -166,22 +140,17 @@ class PineconeManager:
         """Búsqueda semántica avanzada con filtros"""
         try:
             query = state["query"]
-            embedding = self.embedder.encode(
-                query.text,
-                show_progress_bar=False,
-                convert_to_numpy=True,
-                normalize_embeddings=True
-            ).tolist()
+            embedding = (await self.embedder.aencode(query.text)).tolist()
             
-            results = self.index.query(
+            results = await self.executor.run(
+                self.index.query,
                 vector=embedding,
                 top_k=query.top_k,
                 include_metadata=True,
-                namespace=query.namespace,
-                filter={"score": {"$gte": query.score_threshold}}
+                namespace=query.namespace
             )
             
-            # Mapear resultados a documentos
+            # Mapear resultados a documentos (el umbral se aplica sobre el score, no es metadata)
             documents = [
                 Document(
                     content=match["metadata"].get("content", ""),
@@ -189,6 +158,7 @@ class PineconeManager:
                     namespace=query.namespace
                 )
                 for match in results["matches"]
+                if match["score"] >= query.score_threshold
             ]
             
             return {**state, "results": documents, "timestamp": datetime.now().isoformat()}
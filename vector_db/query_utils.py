@@ -1,8 +1,5 @@
 from .pinecone_utils import query_collection
-from models.embedding_model import EmbeddingModel
-
-# Inicialización del modelo de embeddings
-embedding_model = EmbeddingModel()
+from models.embedding_model import get_embedding_model
 
 def find_relevant_context(user_message: str, collection_name: str = "pdf_embeddings") -> str:
     """
@@ -14,7 +11,7 @@ def find_relevant_context(user_message: str, collection_name: str = "pdf_embeddi
         str: Contexto relevante encontrado.
     """
     # Generar embedding del mensaje del usuario
-    query_embedding = embedding_model.generate_embeddings(user_message)
+    query_embedding = get_embedding_model().generate_embeddings(user_message)
 
     # Realizar la consulta en ChromaDB
     results = query_collection(collection_name, query_embedding)